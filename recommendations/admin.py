@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Product, UserInteraction, Recommendation
+from .models import CategoryStats, DescriptionGenerationJob, Product, ProductStats, RelatedProducts, UserInteraction, UserStats, Recommendation
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
@@ -19,4 +19,38 @@ class UserInteractionAdmin(admin.ModelAdmin):
 class RecommendationAdmin(admin.ModelAdmin):
     list_display = ['user', 'model_version', 'confidence_score', 'created_at']
     list_filter = ['model_version', 'created_at']
-    ordering = ['-created_at']
\ No newline at end of file
+    ordering = ['-created_at']
+
+@admin.register(ProductStats)
+class ProductStatsAdmin(admin.ModelAdmin):
+    list_display = ['product', 'view_count', 'wishlist_count', 'rating_count', 'average_rating', 'last_interaction_at']
+    search_fields = ['product__name']
+    ordering = ['-view_count']
+    readonly_fields = ['view_count', 'wishlist_count', 'rating_sum', 'rating_count', 'last_interaction_at']
+
+@admin.register(RelatedProducts)
+class RelatedProductsAdmin(admin.ModelAdmin):
+    list_display = ['product', 'updated_at']
+    search_fields = ['product__name']
+    readonly_fields = ['items', 'updated_at']
+
+@admin.register(UserStats)
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = ['user', 'total_views', 'wishlist_count', 'ratings_count', 'total_interactions', 'updated_at']
+    search_fields = ['user__username']
+    readonly_fields = [
+        'total_views', 'wishlist_count', 'ratings_count', 'total_interactions',
+        'category_counts', 'top_products', 'recent_interactions', 'updated_at',
+    ]
+
+@admin.register(CategoryStats)
+class CategoryStatsAdmin(admin.ModelAdmin):
+    list_display = ['name', 'product_count', 'average_price', 'total_views', 'updated_at']
+    search_fields = ['name']
+    readonly_fields = ['product_count', 'price_sum', 'total_views', 'updated_at']
+
+@admin.register(DescriptionGenerationJob)
+class DescriptionGenerationJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'status', 'processed', 'total', 'succeeded', 'failed', 'created_by', 'created_at', 'finished_at']
+    list_filter = ['status', 'created_at']
+    readonly_fields = ['total', 'processed', 'succeeded', 'failed', 'last_product_id', 'error', 'updated_at', 'finished_at']
@@ -1,25 +1,88 @@
+import asyncio
 import os
 import requests
 import json
 import random
+import threading
+import time
+
+import httpx
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InvalidHeader
+from urllib3.util.retry import Retry
+
+from . import generation_cache
+from .ai_providers import get_provider
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+class CappedRetry(Retry):
+    """Retry do urllib3 com o Retry-After limitado a backoff_max (o servidor não decide quanto o worker dorme)"""
+    
+    def parse_retry_after(self, retry_after):
+        return min(super().parse_retry_after(retry_after), self.backoff_max)
+
 
 class AIGenerator:
     """
     Serviço de IA Generativa usando DeepSeek API
     Versão melhorada para descrições únicas e criativas
+    
+    O endpoint vem do provedor (ai_providers): DeepSeek, um endpoint
+    compatível com a OpenAI ou o modelo fake para testes de carga.
+
+    Os métodos com prefixo "a" (agenerate_product_description, ...) são as
+    versões assíncronas, usadas pelas views async: a espera pela API não
+    prende um worker.
     """
     
-    def __init__(self):
-        # Configurações do .env
-        self.api_key = getattr(settings, 'DEEPSEEK_API_KEY', '')
-        self.api_url = getattr(settings, 'DEEPSEEK_API_URL', 'https://api.deepseek.com/v1/chat/completions')
-        self.model = getattr(settings, 'DEEPSEEK_MODEL', 'deepseek-chat')
+    # Timeout (s) das chamadas à API
+    API_TIMEOUT = 60
+    API_CONNECT_TIMEOUT = 10
+    
+    # Retentativas dos clientes síncrono e async (padrões de AI_MAX_RETRIES / AI_RETRY_BACKOFF)
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+    RETRY_BACKOFF_MAX = 30
+    
+    # Marcador do fim do stream da API ("data: [DONE]")
+    STREAM_DONE = object()
+    
+    # Tokens a mais na geração combinada (o JSON traz descrição + características)
+    COMBINED_EXTRA_TOKENS = 300
+    
+    # Geração em lote com vários produtos por chamada: teto de tokens da resposta
+    # e novas tentativas (só com os produtos que faltaram na resposta)
+    BATCH_MAX_TOKENS = 8000
+    BATCH_RETRIES = 1
+    
+    def __init__(self, provider=None):
+        # Provedor de settings.AI_PROVIDER (configurações do .env)
+        self.provider = provider or get_provider()
+        self.api_key = self.provider.api_key
+        self.api_url = self.provider.api_url
+        self.model = self.provider.model
         self.max_tokens = getattr(settings, 'AI_MAX_TOKENS', 1000)
         self.temperature = getattr(settings, 'AI_TEMPERATURE', 0.8)
         
+        # Timeouts separados de conexão e de leitura
+        self.connect_timeout = getattr(settings, 'AI_CONNECT_TIMEOUT', self.API_CONNECT_TIMEOUT)
+        self.read_timeout = getattr(settings, 'AI_READ_TIMEOUT', self.API_TIMEOUT)
+        self.pool_size = getattr(settings, 'AI_HTTP_POOL_SIZE', 10)
+        self.max_retries = getattr(settings, 'AI_MAX_RETRIES', 3)
+        self.retry_backoff = getattr(settings, 'AI_RETRY_BACKOFF', 0.5)
+        self.combined_generation = getattr(settings, 'AI_COMBINED_GENERATION', True)
+        
+        # Sessão requests compartilhada (keep-alive), criada na primeira chamada
+        self._session_instance = None
+        self._session_lock = threading.Lock()
+        
+        # Com o provedor fora do ar ou lento, responde com o fallback sem esperar o timeout
+        self.breaker = CircuitBreaker.from_settings()
+        
         print(f"🤖 IA Generativa Configurada:")
-        print(f"   Provider: {getattr(settings, 'AI_PROVIDER', 'deepseek')}")
+        print(f"   Provider: {self.provider.label}")
         print(f"   API Key: {'✅ Configurada' if self._is_configured() else '❌ Não configurada'}")
         print(f"   Model: {self.model}")
     
@@ -28,23 +91,44 @@ class AIGenerator:
         Gera uma descrição única e personalizada para cada produto
         """
         try:
-            # ✅ Seleciona um estilo criativo aleatório para variar
-            writing_style = self._get_random_writing_style()
-            tone = self._get_random_tone()
-            focus_angle = self._get_random_focus_angle()
-            
-            prompt = self._build_creative_prompt(
-                product_name, category, price, features, 
-                writing_style, tone, focus_angle
-            )
+            prompt, cache_key = self._description_prompt(product_name, category, price, features)
             
             # Verificar se a API key está configurada
             if not self._is_configured():
                 print("⚠️ API Key não configurada - usando fallback criativo")
                 return self._creative_fallback_description(product_name, category, price, features)
             
-            # Chamada para DeepSeek API
-            response = self._call_deepseek_api(prompt)
+            # Chamada para DeepSeek API (ou resultado em cache)
+            response = self._call_deepseek_api(prompt, cache_key)
+            
+            return response.strip()
+            
+        except Exception as e:
+            print(f"❌ Erro na geração de descrição: {e}")
+            return self._creative_fallback_description(product_name, category, price, features)
+    
+    def request_product_description(self, product_name, category, price, features=None):
+        """
+        Descrição vinda da IA (ou do cache de gerações), sem o fallback criativo:
+        levanta ImproperlyConfigured sem API key e Exception se a chamada falhar
+        (CircuitOpenError com o circuito aberto). Usada pela geração em lote, que
+        não pode gravar o texto do fallback como descrição do produto.
+        """
+        if not self._is_configured():
+            raise ImproperlyConfigured('API key da IA não configurada')
+        prompt, cache_key = self._description_prompt(product_name, category, price, features)
+        return self._cached_completion(prompt, cache_key).strip()
+    
+    async def agenerate_product_description(self, product_name, category, price, features=None):
+        """Versão assíncrona de generate_product_description"""
+        try:
+            prompt, cache_key = self._description_prompt(product_name, category, price, features)
+            
+            if not self._is_configured():
+                print("⚠️ API Key não configurada - usando fallback criativo")
+                return self._creative_fallback_description(product_name, category, price, features)
+            
+            response = await self._acall_deepseek_api(prompt, cache_key)
             
             return response.strip()
             
@@ -52,11 +136,38 @@ class AIGenerator:
             print(f"❌ Erro na geração de descrição: {e}")
             return self._creative_fallback_description(product_name, category, price, features)
     
+    def _description_prompt(self, product_name, category, price, features):
+        """
+        Prompt com estilo, tom e ângulo aleatórios para variar as descrições,
+        e a chave do cache de gerações (None com o cache desligado).
+        
+        Com o cache ligado a escolha é sorteada a partir das entradas: as mesmas
+        entradas repetem o estilo e caem na mesma chave.
+        """
+        inputs = (product_name, category, price, features)
+        rng = random.Random(generation_cache.digest(*inputs)) if generation_cache.is_enabled() else random
+        
+        # ✅ Seleciona um estilo criativo aleatório para variar
+        writing_style = self._get_random_writing_style(rng)
+        tone = self._get_random_tone(rng)
+        focus_angle = self._get_random_focus_angle(rng)
+        
+        prompt = self._build_creative_prompt(
+            product_name, category, price, features, 
+            writing_style, tone, focus_angle
+        )
+        return prompt, self._generation_cache_key('description', *inputs, writing_style, tone, focus_angle)
+    
+    def _generation_cache_key(self, kind, *parts):
+        if not generation_cache.is_enabled():
+            return None
+        return generation_cache.make_key(kind, self.model, self.max_tokens, *parts)
+    
     def _is_configured(self):
         """Verifica se a API está configurada corretamente"""
-        return bool(self.api_key and self.api_key != 'sua-chave-real-da-deepseek-aqui')
+        return self.provider.is_configured(self.api_key)
     
-    def _get_random_writing_style(self):
+    def _get_random_writing_style(self, rng=random):
         """Retorna um estilo de escrita aleatório para variar as descrições"""
         styles = [
             "storytelling",           # Conta uma história
@@ -70,9 +181,9 @@ class AIGenerator:
             "technical_expert",      # Especialista técnico
             "emotional_appeal"       # Apelo emocional
         ]
-        return random.choice(styles)
+        return rng.choice(styles)
     
-    def _get_random_tone(self):
+    def _get_random_tone(self, rng=random):
         """Retorna um tom de voz aleatório"""
         tones = [
             "entusiasmado e energético",
@@ -86,9 +197,9 @@ class AIGenerator:
             "urgente e exclusivo",
             "calmo e confiante"
         ]
-        return random.choice(tones)
+        return rng.choice(tones)
     
-    def _get_random_focus_angle(self):
+    def _get_random_focus_angle(self, rng=random):
         """Retorna um ângulo de foco diferente para cada produto"""
         angles = [
             "inovação e tecnologia",
@@ -102,7 +213,7 @@ class AIGenerator:
             "personalização e adaptação",
             "experiência do usuário"
         ]
-        return random.choice(angles)
+        return rng.choice(angles)
     
     def _build_creative_prompt(self, product_name, category, price, features, style, tone, focus_angle):
         """
@@ -197,52 +308,132 @@ class AIGenerator:
         
         return base_prompt
     
-    def _call_deepseek_api(self, prompt):
+    def _api_request(self, prompt, stream=False, json_mode=False, max_tokens=None):
+        """Headers e corpo da chamada à DeepSeek API (json_mode pede a resposta como objeto JSON)"""
+        headers = self.provider.headers(self.api_key)
+        
+        data = {
+            'model': self.model,
+            'messages': [
+                {
+                    'role': 'system', 
+                    'content': 'Você é um copywriter criativo e inovador. Sua especialidade é criar descrições únicas e memoráveis para produtos, sempre variando o estilo e abordagem.'
+                },
+                {
+                    'role': 'user', 
+                    'content': prompt
+                }
+            ],
+            'max_tokens': max_tokens or self.max_tokens,
+            'temperature': 0.9,  # ✅ Temperatura mais alta para mais criatividade
+            'top_p': 0.95,       # ✅ Mais variação nas respostas
+            'stream': stream
+        }
+        if json_mode:
+            data['response_format'] = {'type': 'json_object'}
+        return headers, data
+    
+    def _api_content(self, status_code, response):
+        """Extrai o texto gerado da resposta da API (levanta Exception se houver erro)"""
+        if status_code == 200:
+            result = response.json()
+            content = result['choices'][0]['message']['content']
+            print(f"✅ Descrição única gerada com sucesso!")
+            return content
+        
+        error_msg = f"DeepSeek API Error: {status_code} - {response.text}"
+        print(f"❌ {error_msg}")
+        raise Exception(error_msg)
+    
+    def _session(self):
         """
-        Faz a chamada para a DeepSeek API
+        Sessão requests com pool de conexões keep-alive (sem DNS/TCP/TLS a cada
+        chamada). Falhas de conexão e respostas 429/5xx são repetidas com backoff
+        exponencial com jitter, respeitando o header Retry-After (até
+        RETRY_BACKOFF_MAX). Timeouts de leitura não são repetidos: o provedor
+        pode estar só lento e cada nova tentativa esperaria o read_timeout de novo.
+        """
+        if self._session_instance is None:
+            with self._session_lock:
+                if self._session_instance is None:
+                    retry = CappedRetry(
+                        total=self.max_retries,
+                        read=0,
+                        status_forcelist=self.RETRY_STATUS_CODES,
+                        # A chamada só gera texto: repetir o POST não tem efeito colateral
+                        allowed_methods=frozenset({'POST'}),
+                        backoff_factor=self.retry_backoff,
+                        backoff_jitter=self.retry_backoff,
+                        backoff_max=self.RETRY_BACKOFF_MAX,
+                        respect_retry_after_header=True,
+                        # Esgotadas as tentativas, devolve a última resposta (vira fallback)
+                        raise_on_status=False,
+                    )
+                    adapter = self.provider.sync_adapter() or HTTPAdapter(
+                        pool_connections=self.pool_size,
+                        pool_maxsize=self.pool_size,
+                        max_retries=retry,
+                    )
+                    session = requests.Session()
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session_instance = session
+        return self._session_instance
+    
+    def _request_completion(self, prompt, json_mode=False, max_tokens=None):
+        """
+        Chamada à API sem cache nem fallback (levanta Exception se falhar),
+        passando pelo circuit breaker (CircuitOpenError com o circuito aberto)
         """
+        headers, data = self._api_request(prompt, json_mode=json_mode, max_tokens=max_tokens)
+        permit = self.breaker.check()
+        
+        print(f"🔗 Chamando DeepSeek API...")
+        start = time.monotonic()
         try:
-            headers = {
-                'Authorization': f'Bearer {self.api_key}',
-                'Content-Type': 'application/json'
-            }
-            
-            data = {
-                'model': self.model,
-                'messages': [
-                    {
-                        'role': 'system', 
-                        'content': 'Você é um copywriter criativo e inovador. Sua especialidade é criar descrições únicas e memoráveis para produtos, sempre variando o estilo e abordagem.'
-                    },
-                    {
-                        'role': 'user', 
-                        'content': prompt
-                    }
-                ],
-                'max_tokens': self.max_tokens,
-                'temperature': 0.9,  # ✅ Temperatura mais alta para mais criatividade
-                'top_p': 0.95,       # ✅ Mais variação nas respostas
-                'stream': False
-            }
-            
-            print(f"🔗 Chamando DeepSeek API...")
-            response = requests.post(
+            response = self._session().post(
                 self.api_url,
                 headers=headers,
                 json=data,
-                timeout=60
+                timeout=(self.connect_timeout, self.read_timeout)
             )
-            
-            if response.status_code == 200:
-                result = response.json()
-                content = result['choices'][0]['message']['content']
-                print(f"✅ Descrição única gerada com sucesso!")
-                return content
-            else:
-                error_msg = f"DeepSeek API Error: {response.status_code} - {response.text}"
-                print(f"❌ {error_msg}")
-                raise Exception(error_msg)
+            content = self._api_content(response.status_code, response)
+        except Exception:
+            self.breaker.record_failure(time.monotonic() - start, permit)
+            raise
+        except BaseException:
+            # Interrompida sem resultado: só devolve a chamada de teste do meio-aberto
+            self.breaker.release(permit)
+            raise
+        self.breaker.record_success(time.monotonic() - start, permit)
+        return content
+    
+    def _cached_completion(self, prompt, cache_key=None):
+        """_request_completion passando pelo cache de gerações (com cache_key)"""
+        if cache_key:
+            cached = generation_cache.lookup(cache_key)
+            if cached is not None:
+                print("⚡ Resultado da IA vindo do cache")
+                return cached
+        
+        content = self._request_completion(prompt)
+        if cache_key:
+            generation_cache.store(cache_key, content)
+        return content
+    
+    def _call_deepseek_api(self, prompt, cache_key=None):
+        """
+        Faz a chamada para a DeepSeek API
+        
+        Com cache_key, devolve o texto do cache de gerações se existir e guarda
+        a resposta da API (fallbacks não são guardados).
+        """
+        try:
+            return self._cached_completion(prompt, cache_key)
                 
+        except CircuitOpenError:
+            print("🔌 Circuit breaker aberto - usando fallback criativo")
+            return self._creative_fallback_description_from_prompt(prompt)
         except requests.exceptions.Timeout:
             print("⏰ Timeout na chamada da API")
             return self._creative_fallback_description_from_prompt(prompt)
@@ -250,6 +441,193 @@ class AIGenerator:
             print(f"❌ Erro na API DeepSeek: {e}")
             return self._creative_fallback_description_from_prompt(prompt)
     
+    def _async_client(self):
+        """
+        Cliente httpx para uma chamada (usar com async with, que fecha as conexões).
+        Não é guardado por event loop: sob WSGI cada async_to_sync roda num loop
+        novo e os clientes guardados nunca seriam fechados.
+        """
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            transport=self.provider.async_transport(),
+        )
+    
+    def _retry_delay(self, attempt, retry_after=None):
+        """
+        Espera (s) antes da nova tentativa do cliente async: o Retry-After da
+        resposta ou o backoff exponencial com jitter, como no Retry do urllib3
+        (a primeira retentativa é imediata), sempre até RETRY_BACKOFF_MAX
+        """
+        if retry_after is not None:
+            try:
+                return CappedRetry(backoff_max=self.RETRY_BACKOFF_MAX).parse_retry_after(retry_after)
+            except InvalidHeader:
+                pass
+        if attempt == 0:
+            return 0
+        backoff = self.retry_backoff * (2 ** attempt) + random.random() * self.retry_backoff
+        return min(backoff, self.RETRY_BACKOFF_MAX)
+    
+    async def _asend(self, client, headers, data, stream=False):
+        """
+        POST à API com a política de retentativas do cliente síncrono: falhas de
+        conexão e respostas 429/5xx são repetidas até max_retries vezes (timeouts
+        de leitura não). Esgotadas as tentativas, devolve a última resposta.
+        Com stream=True, quem chama fecha a resposta (aclose).
+        """
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                request = client.build_request('POST', self.api_url, headers=headers, json=data)
+                response = await client.send(request, stream=stream)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if attempt == self.max_retries:
+                    raise
+            else:
+                if response.status_code not in self.RETRY_STATUS_CODES or attempt == self.max_retries:
+                    return response
+                retry_after = response.headers.get('Retry-After')
+                await response.aclose()
+            delay = self._retry_delay(attempt, retry_after)
+            print(f"🔁 Nova tentativa da API em {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+            await asyncio.sleep(delay)
+    
+    async def _arequest_completion(self, prompt, json_mode=False, max_tokens=None):
+        """Versão assíncrona de _request_completion (httpx)"""
+        headers, data = self._api_request(prompt, json_mode=json_mode, max_tokens=max_tokens)
+        permit = self.breaker.check()
+        
+        print(f"🔗 Chamando DeepSeek API (async)...")
+        start = time.monotonic()
+        try:
+            async with self._async_client() as client:
+                response = await self._asend(client, headers, data)
+            content = self._api_content(response.status_code, response)
+        except Exception:
+            self.breaker.record_failure(time.monotonic() - start, permit)
+            raise
+        except BaseException:
+            # Cancelada (CancelledError): só devolve a chamada de teste do meio-aberto
+            self.breaker.release(permit)
+            raise
+        self.breaker.record_success(time.monotonic() - start, permit)
+        return content
+    
+    async def _acall_deepseek_api(self, prompt, cache_key=None):
+        """Versão assíncrona de _call_deepseek_api (httpx)"""
+        try:
+            if cache_key:
+                cached = await generation_cache.alookup(cache_key)
+                if cached is not None:
+                    print("⚡ Resultado da IA vindo do cache")
+                    return cached
+            
+            content = await self._arequest_completion(prompt)
+            if cache_key:
+                await generation_cache.astore(cache_key, content)
+            return content
+            
+        except CircuitOpenError:
+            print("🔌 Circuit breaker aberto - usando fallback criativo")
+            return self._creative_fallback_description_from_prompt(prompt)
+        except httpx.TimeoutException:
+            print("⏰ Timeout na chamada da API")
+            return self._creative_fallback_description_from_prompt(prompt)
+        except Exception as e:
+            print(f"❌ Erro na API DeepSeek: {e}")
+            return self._creative_fallback_description_from_prompt(prompt)
+    
+    async def astream_product_description(self, product_name, category, price, features=None):
+        """
+        Versão em streaming de agenerate_product_description: gera os trechos do
+        texto conforme a API os envia (stream=True, eventos SSE do provedor).
+        
+        Resultado em cache, IA não configurada ou falha antes do primeiro trecho
+        geram o texto inteiro de uma vez (cache ou fallback criativo).
+        """
+        prompt, cache_key = self._description_prompt(product_name, category, price, features)
+        
+        if cache_key:
+            cached = await generation_cache.alookup(cache_key)
+            if cached is not None:
+                print("⚡ Resultado da IA vindo do cache")
+                yield cached
+                return
+        
+        if not self._is_configured():
+            print("⚠️ API Key não configurada - usando fallback criativo")
+            yield self._creative_fallback_description(product_name, category, price, features)
+            return
+        
+        parts = []
+        start = time.monotonic()
+        recorded = False
+        permit = None
+        try:
+            headers, data = self._api_request(prompt, stream=True)
+            permit = self.breaker.check()
+            
+            print(f"🔗 Chamando DeepSeek API (streaming)...")
+            async with self._async_client() as client:
+                response = await self._asend(client, headers, data, stream=True)
+                try:
+                    if response.status_code != 200:
+                        await response.aread()
+                        self._api_content(response.status_code, response)
+                    
+                    async for line in response.aiter_lines():
+                        content = self._stream_line_content(line)
+                        if content is self.STREAM_DONE:
+                            break
+                        if content:
+                            if not recorded:
+                                # No streaming, a latência para o circuit breaker é a do primeiro trecho
+                                self.breaker.record_success(time.monotonic() - start, permit)
+                                recorded = True
+                            parts.append(content)
+                            yield content
+                finally:
+                    await response.aclose()
+        
+        except CircuitOpenError:
+            print("🔌 Circuit breaker aberto - usando fallback criativo")
+            yield self._creative_fallback_description(product_name, category, price, features)
+            return
+        except Exception as e:
+            print(f"❌ Erro no streaming da API DeepSeek: {e}")
+            if not recorded:
+                self.breaker.record_failure(time.monotonic() - start, permit)
+            if not parts:
+                yield self._creative_fallback_description(product_name, category, price, features)
+            # Com parte do texto já enviada não há fallback: o cliente fica com o que recebeu
+            return
+        except BaseException:
+            # Stream cancelado pelo cliente (CancelledError/GeneratorExit) antes do
+            # primeiro trecho: sem resultado, devolve a chamada de teste do meio-aberto
+            if permit is not None and not recorded:
+                self.breaker.release(permit)
+            raise
+        
+        if not recorded:
+            self.breaker.record_success(time.monotonic() - start, permit)
+        if parts and cache_key:
+            await generation_cache.astore(cache_key, ''.join(parts))
+    
+    def _stream_line_content(self, line):
+        """Texto de uma linha do stream SSE da API (None para linhas sem texto)"""
+        line = line.strip()
+        if not line.startswith('data:'):
+            return None
+        payload = line[len('data:'):].strip()
+        if payload == '[DONE]':
+            return self.STREAM_DONE
+        try:
+            choices = json.loads(payload).get('choices') or [{}]
+        except (json.JSONDecodeError, AttributeError):
+            return None
+        return (choices[0].get('delta') or {}).get('content')
+    
     def _creative_fallback_description(self, product_name, category, price, features=None):
         """Fallback criativo quando a API não está disponível"""
         fallback_styles = [
@@ -326,11 +704,191 @@ Para quem busca excelência técnica sem complicações. 🔧"""
             pass
         return "sua categoria"
     
+    def generate_product_descriptions_batch(self, products):
+        """
+        Descrições de vários produtos numa única chamada (geração em lote).
+        
+        `products` é uma lista de dicts com id, name, category, price e features.
+        O prompt tem um bloco de instruções compacto compartilhado e pede um JSON
+        com a descrição de cada id. Produtos ausentes ou inválidos na resposta
+        são pedidos de novo (só eles) até BATCH_RETRIES vezes.
+        
+        Retorna {id: descrição}; quem continuar falhando fica de fora. Não há
+        fallback criativo: sem API key levanta ImproperlyConfigured e, com o
+        circuito aberto antes da primeira chamada, CircuitOpenError.
+        """
+        if not self._is_configured():
+            raise ImproperlyConfigured('API key da IA não configurada')
+        
+        descriptions = {}
+        pending = list(products)
+        for attempt in range(1 + self.BATCH_RETRIES):
+            try:
+                descriptions.update(self._request_batch(pending))
+            except CircuitOpenError:
+                # Sem nenhuma chamada feita, o lote não foi tentado: quem chama decide
+                # (a geração em lote pausa sem avançar o checkpoint)
+                if attempt == 0:
+                    raise
+                print("🔌 Circuit breaker aberto - produtos restantes ficam sem descrição")
+                break
+            except Exception as e:
+                print(f"❌ Erro na geração em lote: {e}")
+            pending = [product for product in pending if product['id'] not in descriptions]
+            if not pending:
+                break
+        return descriptions
+    
+    def _request_batch(self, products):
+        """Uma chamada com o lote; retorna {id: descrição} dos produtos com descrição válida"""
+        content = self._request_completion(
+            self._batch_prompt(products),
+            json_mode=True,
+            max_tokens=min(self.BATCH_MAX_TOKENS, self.max_tokens * len(products)),
+        )
+        generated = json.loads(content).get('descriptions')
+        if not isinstance(generated, dict):
+            raise ValueError('resposta do lote sem o objeto "descriptions"')
+        
+        descriptions = {}
+        for product in products:
+            text = generated.get(str(product['id']))
+            if isinstance(text, str) and text.strip():
+                descriptions[product['id']] = text.strip()
+        print(f"✅ Lote: {len(descriptions)}/{len(products)} descrições geradas")
+        return descriptions
+    
+    def _batch_prompt(self, products):
+        """Instruções compactas (sem a indentação dos prompts individuais) + um produto JSON por linha"""
+        lines = [
+            json.dumps({
+                'id': str(product['id']),
+                'nome': product['name'],
+                'categoria': product['category'],
+                'preco': str(product['price']),
+                'caracteristicas': product.get('features') or '',
+            }, ensure_ascii=False, separators=(',', ':'))
+            for product in products
+        ]
+        return (
+            "Escreva uma descrição de produto para cada item abaixo.\n"
+            "Regras: português brasileiro natural; 120-180 palavras cada; estilo, tom e abertura "
+            "diferentes entre os itens; emojis com moderação; sem bullet points nem título com o nome "
+            "do produto; evite clichês de marketing; termine com uma chamada para ação natural.\n"
+            'Responda APENAS com JSON: {"descriptions": {"<id>": "<descrição>"}}, com todos os ids.\n'
+            "Produtos:\n" + "\n".join(lines)
+        )
+    
     def generate_product_features(self, product_name, category):
         """
         Gera features únicas e criativas para cada produto
         """
-        style = random.choice(["technical", "benefits", "lifestyle", "comparative"])
+        prompt, cache_key = self._features_prompt(product_name, category)
+        
+        try:
+            if self._is_configured():
+                response = self._call_deepseek_api(prompt, cache_key)
+                return self._clean_features(response)
+            else:
+                return self._fallback_features(category)
+        except Exception as e:
+            print(f"❌ Erro ao gerar features: {e}")
+            return self._fallback_features(category)
+    
+    async def agenerate_product_features(self, product_name, category):
+        """Versão assíncrona de generate_product_features"""
+        prompt, cache_key = self._features_prompt(product_name, category)
+        
+        try:
+            if self._is_configured():
+                response = await self._acall_deepseek_api(prompt, cache_key)
+                return self._clean_features(response)
+            else:
+                return self._fallback_features(category)
+        except Exception as e:
+            print(f"❌ Erro ao gerar features: {e}")
+            return self._fallback_features(category)
+    
+    async def agenerate_product_content(self, product_name, category, price, features=None):
+        """
+        Descrição e características do produto (usado pelo assistente de produto).
+        
+        Com AI_COMBINED_GENERATION faz uma única chamada pedindo um objeto JSON
+        {"description": ..., "features": [...]}. Se a chamada falhar ou a resposta
+        não for válida, gera as duas separadamente, em paralelo.
+        
+        Retorna (descrição, características separadas por vírgula).
+        """
+        if self.combined_generation and self._is_configured():
+            try:
+                return await self._agenerate_combined_content(product_name, category, price, features)
+            except Exception as e:
+                print(f"⚠️ Geração combinada falhou ({e}) - gerando descrição e features em paralelo")
+        
+        return await asyncio.gather(
+            self.agenerate_product_description(product_name, category, price, features),
+            self.agenerate_product_features(product_name, category),
+        )
+    
+    async def _agenerate_combined_content(self, product_name, category, price, features):
+        """Uma chamada em modo JSON; levanta Exception se a resposta não for válida"""
+        prompt, cache_key = self._content_prompt(product_name, category, price, features)
+        
+        if cache_key:
+            cached = await generation_cache.alookup(cache_key)
+            if cached is not None:
+                print("⚡ Resultado da IA vindo do cache")
+                return self._parse_product_content(cached)
+        
+        content = await self._arequest_completion(
+            prompt, json_mode=True, max_tokens=self.max_tokens + self.COMBINED_EXTRA_TOKENS
+        )
+        result = self._parse_product_content(content)
+        if cache_key:
+            await generation_cache.astore(cache_key, content)
+        return result
+    
+    def _content_prompt(self, product_name, category, price, features):
+        """Prompt criativo da descrição pedindo também as características, tudo num objeto JSON"""
+        prompt, description_key = self._description_prompt(product_name, category, price, features)
+        
+        prompt += """
+        Além da descrição, liste de 5 a 7 características ou benefícios curtos e específicos do produto.
+        
+        Responda APENAS com um objeto JSON neste formato:
+        {"description": "descrição completa", "features": ["característica 1", "característica 2"]}
+        """
+        # Mesmas entradas e mesmo estilo da descrição, outro tipo de geração
+        return prompt, description_key and self._generation_cache_key('content', description_key)
+    
+    def _parse_product_content(self, content):
+        """Valida o JSON da geração combinada e retorna (descrição, características)"""
+        text = content.strip()
+        # Alguns modelos embrulham o JSON num bloco de código
+        if text.startswith('```'):
+            text = text.strip('`')
+            text = text[text.find('{'):]
+        
+        result = json.loads(text)
+        if not isinstance(result, dict):
+            raise ValueError('a resposta não é um objeto JSON')
+        
+        description = result.get('description')
+        if not isinstance(description, str) or not description.strip():
+            raise ValueError('descrição ausente na resposta')
+        
+        features = result.get('features')
+        if isinstance(features, list):
+            features = ', '.join(str(feature).strip() for feature in features if str(feature).strip())
+        if not isinstance(features, str) or not features.strip():
+            raise ValueError('características ausentes na resposta')
+        
+        return description.strip(), self._clean_features(features)
+    
+    def _features_prompt(self, product_name, category):
+        """Prompt com um estilo aleatório e a chave do cache de gerações (ver _description_prompt)"""
+        rng = random.Random(generation_cache.digest(product_name, category)) if generation_cache.is_enabled() else random
+        style = rng.choice(["technical", "benefits", "lifestyle", "comparative"])
         
         style_prompts = {
             "technical": f"Liste 5-7 especificações técnicas únicas do {product_name} em {category}",
@@ -346,19 +904,13 @@ Para quem busca excelência técnica sem complicações. 🔧"""
         Idioma: Português brasileiro
         Seja específico e evite generalizações
         """
-        
-        try:
-            if self._is_configured():
-                response = self._call_deepseek_api(prompt)
-                features = response.strip().replace('\n', ', ').replace('"', '')
-                # Garante que não tenha mais que 7 features
-                features_list = [f.strip() for f in features.split(',')]
-                return ', '.join(features_list[:7])
-            else:
-                return self._fallback_features(category)
-        except Exception as e:
-            print(f"❌ Erro ao gerar features: {e}")
-            return self._fallback_features(category)
+        return prompt, self._generation_cache_key('features', product_name, category, style)
+    
+    def _clean_features(self, response):
+        features = response.strip().replace('\n', ', ').replace('"', '')
+        # Garante que não tenha mais que 7 features
+        features_list = [f.strip() for f in features.split(',')]
+        return ', '.join(features_list[:7])
     
     def _fallback_features(self, category):
         """Features fallback variadas"""
@@ -372,4 +924,19 @@ Para quem busca excelência técnica sem complicações. 🔧"""
         
         features = fallback_features.get(category.lower(), fallback_features['default'])
         random.shuffle(features)  # Embaralha para variar
-        return ', '.join(features[:5])
\ No newline at end of file
+        return ', '.join(features[:5])
+
+
+# Instância compartilhada, criada no primeiro uso (lê settings e imprime a configuração)
+_ai_generator = None
+_ai_generator_lock = threading.Lock()
+
+
+def get_ai_generator():
+    """AIGenerator compartilhado do processo"""
+    global _ai_generator
+    if _ai_generator is None:
+        with _ai_generator_lock:
+            if _ai_generator is None:
+                _ai_generator = AIGenerator()
+    return _ai_generator
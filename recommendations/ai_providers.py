@@ -0,0 +1,319 @@
+"""
+Provedores de LLM usados pelo AIGenerator.
+
+Todos falam o formato de chat completions da OpenAI (mensagens, choices,
+stream=True em eventos SSE); o provedor define URL, chave, modelo e headers:
+
+- deepseek: DeepSeek API (DEEPSEEK_API_KEY / DEEPSEEK_API_URL / DEEPSEEK_MODEL);
+- openai: qualquer endpoint compatível (OpenAI, vLLM, Ollama, LM Studio...),
+  em OPENAI_COMPATIBLE_API_URL / _API_KEY / _MODEL;
+- fake: modelo local e determinístico, sem rede, para testes de carga
+  (settings.AI_FAKE_PROVIDER, ver FakeProvider.DEFAULTS).
+
+O provedor é escolhido por settings.AI_PROVIDER. O fake entra como transport
+dos clientes HTTP (adapter do requests e transport do httpx): sessão,
+parsing, streaming e fallbacks do AIGenerator rodam como com uma API real.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+
+import httpx
+import requests
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+class ChatProvider:
+    """Endpoint de chat completions no formato da OpenAI"""
+
+    name = ''
+    label = ''
+
+    def __init__(self, api_url, api_key='', model=''):
+        self.api_url = api_url
+        self.api_key = api_key
+        self.model = model
+
+    @classmethod
+    def from_settings(cls):
+        raise NotImplementedError
+
+    def is_configured(self, api_key):
+        """Se dá para chamar o provedor com esta chave"""
+        return bool(self.api_url and api_key)
+
+    def headers(self, api_key):
+        headers = {'Content-Type': 'application/json'}
+        if api_key:
+            headers['Authorization'] = f'Bearer {api_key}'
+        return headers
+
+    def sync_adapter(self):
+        """Adapter do requests no lugar do HTTPAdapter (None = rede)"""
+        return None
+
+    def async_transport(self):
+        """Transport do httpx no lugar do padrão (None = rede)"""
+        return None
+
+
+class DeepSeekProvider(ChatProvider):
+    name = 'deepseek'
+    label = 'DeepSeek'
+
+    PLACEHOLDER_KEY = 'sua-chave-real-da-deepseek-aqui'
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            api_url=getattr(settings, 'DEEPSEEK_API_URL', 'https://api.deepseek.com/v1/chat/completions'),
+            api_key=getattr(settings, 'DEEPSEEK_API_KEY', ''),
+            model=getattr(settings, 'DEEPSEEK_MODEL', 'deepseek-chat'),
+        )
+
+    def is_configured(self, api_key):
+        return super().is_configured(api_key) and api_key != self.PLACEHOLDER_KEY
+
+
+class OpenAICompatibleProvider(ChatProvider):
+    """Endpoint compatível com a OpenAI; servidores locais costumam dispensar a chave"""
+
+    name = 'openai'
+    label = 'OpenAI-compatível'
+
+    @classmethod
+    def from_settings(cls):
+        return cls(
+            api_url=getattr(settings, 'OPENAI_COMPATIBLE_API_URL', ''),
+            api_key=getattr(settings, 'OPENAI_COMPATIBLE_API_KEY', ''),
+            model=getattr(settings, 'OPENAI_COMPATIBLE_MODEL', ''),
+        )
+
+    def is_configured(self, api_key):
+        return bool(self.api_url)
+
+
+FAKE_WORDS = (
+    'qualidade', 'design', 'conforto', 'praticidade', 'resistente', 'leve', 'moderno',
+    'versátil', 'durável', 'elegante', 'eficiente', 'seu', 'dia', 'a', 'com', 'para',
+    'mais', 'uso', 'ideal', 'acabamento', 'tecnologia', 'rotina', 'cada', 'detalhe',
+)
+
+
+class FakeCompletion:
+    """Resposta sorteada pelo FakeProvider para uma chamada"""
+
+    def __init__(self, status, latency, token_interval, tokens, stream):
+        self.status = status
+        self.latency = latency
+        self.token_interval = token_interval
+        self.tokens = tokens
+        self.stream = stream
+
+    @property
+    def generation_time(self):
+        return self.token_interval * len(self.tokens)
+
+    @property
+    def content(self):
+        return ''.join(self.tokens)
+
+    def body(self):
+        if self.status != 200:
+            return json.dumps({'error': {'message': 'Erro simulado pelo provedor fake'}}).encode()
+        return json.dumps({'choices': [{'message': {'role': 'assistant', 'content': self.content}}]}).encode()
+
+    def events(self):
+        """Eventos SSE do modo stream=True, um por token"""
+        for token in self.tokens:
+            yield ('data: ' + json.dumps({'choices': [{'delta': {'content': token}}]}) + '\n\n').encode()
+        yield b'data: [DONE]\n\n'
+
+
+class FakeProvider(ChatProvider):
+    """
+    LLM simulado: latência até o primeiro token com distribuição log-normal
+    (mediana LATENCY_MEDIAN, cauda controlada por LATENCY_SIGMA), tokens
+    gerados a TOKENS_PER_SECOND (normal com desvio relativo TOKENS_PER_SECOND_JITTER)
+    e uma fração ERROR_RATE de respostas com ERROR_STATUS.
+
+    O texto depende só do prompt; com SEED, a sequência de latências e erros
+    também se repete entre execuções.
+    """
+
+    name = 'fake'
+    label = 'Fake (offline)'
+
+    DEFAULTS = {
+        'LATENCY_MEDIAN': 0.5,
+        'LATENCY_SIGMA': 0.6,
+        'TOKENS_PER_SECOND': 50.0,
+        'TOKENS_PER_SECOND_JITTER': 0.2,
+        'OUTPUT_TOKENS': 120,
+        'ERROR_RATE': 0.0,
+        'ERROR_STATUS': 503,
+        'SEED': None,
+    }
+
+    API_URL = 'http://fake-llm.invalid/v1/chat/completions'
+
+    def __init__(self, config=None):
+        super().__init__(api_url=self.API_URL, api_key='fake', model='fake-llm')
+        self.config = {**self.DEFAULTS, **(config or {})}
+        self.rng = random.Random(self.config['SEED'])
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        # Estimativa de tokens (~4 caracteres por token) do prompt e da resposta
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    @classmethod
+    def from_settings(cls, **overrides):
+        return cls({**getattr(settings, 'AI_FAKE_PROVIDER', {}), **overrides})
+
+    def is_configured(self, api_key):
+        return True
+
+    def sync_adapter(self):
+        return FakeRequestsAdapter(self)
+
+    def async_transport(self):
+        return FakeAsyncTransport(self)
+
+    def complete(self, payload):
+        """Sorteia latência, ritmo e erro da chamada e gera o texto da resposta"""
+        config = self.config
+        with self.lock:
+            self.calls += 1
+            latency = config['LATENCY_MEDIAN'] * math.exp(self.rng.gauss(0, config['LATENCY_SIGMA']))
+            rate = config['TOKENS_PER_SECOND'] * max(0.1, self.rng.gauss(1, config['TOKENS_PER_SECOND_JITTER']))
+            failed = self.rng.random() < config['ERROR_RATE']
+            if failed:
+                self.errors += 1
+
+        stream = bool(payload.get('stream'))
+        if failed:
+            return FakeCompletion(config['ERROR_STATUS'], latency, 0, [], stream)
+
+        prompt = ' '.join(message.get('content', '') for message in payload.get('messages', []))
+        json_mode = (payload.get('response_format') or {}).get('type') == 'json_object'
+        tokens = self._tokens(prompt, json_mode)
+        with self.lock:
+            self.prompt_tokens += len(prompt) // 4
+            self.completion_tokens += len(tokens)
+        return FakeCompletion(200, latency, 1 / rate, tokens, stream)
+
+    def _tokens(self, prompt, json_mode):
+        if not json_mode:
+            words = self._words(prompt, self.config['OUTPUT_TOKENS'])
+            return [word if i == 0 else ' ' + word for i, word in enumerate(words)]
+
+        batch_ids = self._batch_ids(prompt)
+        if batch_ids:
+            # Geração em lote: uma descrição por id do prompt
+            content = json.dumps({'descriptions': {
+                product_id: ' '.join(self._words(prompt + product_id, self.config['OUTPUT_TOKENS']))
+                for product_id in batch_ids
+            }}, ensure_ascii=False)
+        else:
+            words = self._words(prompt, self.config['OUTPUT_TOKENS'])
+            content = json.dumps({
+                'description': ' '.join(words),
+                'features': [word.capitalize() for word in words[:5]],
+            }, ensure_ascii=False)
+        # Um token por palavra, como no texto livre
+        return re.findall(r'\S+\s*', content)
+
+    def _batch_ids(self, prompt):
+        """Ids dos produtos de um prompt de lote (uma linha JSON com "id" por produto)"""
+        ids = []
+        for line in prompt.splitlines():
+            line = line.strip()
+            if not line.startswith('{"id"'):
+                continue
+            try:
+                ids.append(str(json.loads(line)['id']))
+            except (ValueError, KeyError):
+                continue
+        return ids
+
+    def _words(self, prompt, count):
+        rng = random.Random(hashlib.sha256(prompt.encode()).hexdigest())
+        return [rng.choice(FAKE_WORDS) for _ in range(max(1, int(count)))]
+
+
+class FakeRequestsAdapter(BaseAdapter):
+    """Adapter do requests que responde com o FakeProvider (cliente síncrono)"""
+
+    def __init__(self, provider):
+        super().__init__()
+        self.provider = provider
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        completion = self.provider.complete(json.loads(request.body or b'{}'))
+        time.sleep(completion.latency + completion.generation_time)
+
+        response = requests.Response()
+        response.status_code = completion.status
+        response.reason = 'OK' if completion.status == 200 else 'Fake Error'
+        response.headers = CaseInsensitiveDict({'Content-Type': 'application/json'})
+        response._content = completion.body()
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class FakeAsyncTransport(httpx.AsyncBaseTransport):
+    """Transport do httpx que responde com o FakeProvider (cliente async e streaming)"""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    async def handle_async_request(self, request):
+        completion = self.provider.complete(json.loads(await request.aread() or b'{}'))
+        await asyncio.sleep(completion.latency)
+
+        if completion.status == 200 and completion.stream:
+            async def events():
+                for event in completion.events():
+                    yield event
+                    await asyncio.sleep(completion.token_interval)
+            return httpx.Response(200, headers={'Content-Type': 'text/event-stream'}, content=events())
+
+        await asyncio.sleep(completion.generation_time)
+        return httpx.Response(
+            completion.status,
+            headers={'Content-Type': 'application/json'},
+            content=completion.body(),
+        )
+
+
+PROVIDERS = {
+    provider.name: provider
+    for provider in (DeepSeekProvider, OpenAICompatibleProvider, FakeProvider)
+}
+
+
+def get_provider(name=None):
+    """Provedor configurado em settings.AI_PROVIDER (ou o informado)"""
+    name = (name or getattr(settings, 'AI_PROVIDER', 'deepseek')).lower()
+    try:
+        provider_class = PROVIDERS[name]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f'AI_PROVIDER inválido: {name!r} (opções: {", ".join(sorted(PROVIDERS))})'
+        )
+    return provider_class.from_settings()
@@ -0,0 +1,367 @@
+"""
+Geração de descrições em lote para os produtos sem descrição.
+
+Os produtos são processados em ordem de id, em lotes de CHUNK_SIZE:
+
+- cada lote é gerado por um pool limitado de WORKERS threads, com um token
+  bucket (RATE_PER_SECOND, BURST) controlando o ritmo das chamadas à API;
+- com geradores que suportam (generate_product_descriptions_batch), cada
+  chamada à API descreve BATCH_SIZE produtos de uma vez;
+- o gerador é chamado sem fallback (request_product_description): uma falha
+  conta como falha do produto em vez de gravar o texto genérico do fallback
+  criativo, e sem API key configurada o job falha sem avançar o checkpoint;
+- com o circuit breaker da IA aberto o job é interrompido (continua depois) e
+  os produtos não chamados não contam como tentados;
+- as descrições do lote são gravadas com um único bulk_update;
+- o progresso fica em DescriptionGenerationJob (checkpoint por lote), então
+  uma execução interrompida continua do último lote gravado.
+
+Roda pelo comando generate_descriptions ou em segundo plano, iniciado pela
+página de geração em lote (start_background_job), que acompanha o progresso.
+
+Configuração em settings.BULK_DESCRIPTION_GENERATION (ver DEFAULTS).
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .catalog_cache import bump_catalog_version
+from .circuit_breaker import CircuitOpenError
+from .models import DescriptionGenerationJob, Product
+from .related import invalidate_lists_for
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WORKERS': 8,
+    'RATE_PER_SECOND': 5.0,
+    'BURST': 5,
+    'CHUNK_SIZE': 50,
+    # Produtos por chamada à API (1 = uma chamada por produto)
+    'BATCH_SIZE': 10,
+    # Job "em execução" sem progresso há mais tempo que isso é considerado abandonado (s)
+    'STALE_AFTER': 600,
+}
+
+PRODUCT_FIELDS = ('id', 'name', 'category', 'price', 'features', 'description')
+
+
+def generation_settings():
+    return {**DEFAULTS, **getattr(settings, 'BULK_DESCRIPTION_GENERATION', {})}
+
+
+def products_needing_description():
+    return Product.objects.filter(Q(description__isnull=True) | Q(description=''))
+
+
+class TokenBucket:
+    """
+    Limitador de taxa thread-safe: `rate` fichas por segundo, acumulando até
+    `capacity` (rajada). acquire() bloqueia até haver uma ficha.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, stop_event=None):
+        """Espera por uma ficha. Retorna False se stop_event for acionado antes."""
+        while True:
+            if stop_event is not None and stop_event.is_set():
+                return False
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if stop_event is not None:
+                if stop_event.wait(wait):
+                    return False
+            else:
+                time.sleep(wait)
+
+
+class BulkDescriptionGenerator:
+    """Executa (ou continua) um DescriptionGenerationJob"""
+
+    def __init__(self, job, generator, workers=None, rate_per_second=None, burst=None,
+                 chunk_size=None, batch_size=None, stop_event=None, on_progress=None):
+        config = generation_settings()
+        self.job = job
+        self.generator = generator
+        self.workers = workers or config['WORKERS']
+        self.chunk_size = chunk_size or config['CHUNK_SIZE']
+        self.batch_size = batch_size or config['BATCH_SIZE']
+        if not hasattr(generator, 'generate_product_descriptions_batch'):
+            self.batch_size = 1
+        self.bucket = TokenBucket(rate_per_second or config['RATE_PER_SECOND'], burst or config['BURST'])
+        self.stop_event = stop_event or threading.Event()
+        self.on_progress = on_progress
+        self.circuit_open = False
+
+    def stop(self):
+        """Pede a parada: o lote atual é concluído e gravado antes de parar"""
+        self.stop_event.set()
+
+    def _pause_for_open_circuit(self):
+        # Não adianta seguir chamando a API: para o job, que continua do checkpoint
+        self.circuit_open = True
+        self.stop_event.set()
+
+    def _should_stop(self):
+        if self.stop_event.is_set():
+            return True
+        # Parada pedida por outro processo (ex.: botão na página)
+        status = DescriptionGenerationJob.objects.filter(pk=self.job.pk).values_list('status', flat=True).first()
+        if status == 'interrupted':
+            self.stop_event.set()
+        return self.stop_event.is_set()
+
+    def _generate(self, product):
+        """Descrição do produto, ou None se a geração falhar"""
+        try:
+            description = self.generator.request_product_description(
+                product_name=product.name,
+                category=product.category,
+                price=str(product.price),
+                features=product.features,
+            )
+        except (ImproperlyConfigured, CircuitOpenError):
+            raise
+        except Exception as e:
+            logger.warning('Falha ao gerar descrição do produto %s: %s', product.id, e)
+            return None
+        return (description or '').strip() or None
+
+    def _attempt(self, product):
+        # (tentado, descrição): produtos não tentados por causa da parada ficam para a próxima execução
+        if not self.bucket.acquire(self.stop_event):
+            return False, None
+        try:
+            return True, self._generate(product)
+        except CircuitOpenError:
+            self._pause_for_open_circuit()
+            return False, None
+
+    def _generate_batch(self, products):
+        """Descrições de vários produtos numa chamada; None para os que falharem"""
+        try:
+            descriptions = self.generator.generate_product_descriptions_batch([
+                {
+                    'id': product.id,
+                    'name': product.name,
+                    'category': product.category,
+                    'price': str(product.price),
+                    'features': product.features,
+                }
+                for product in products
+            ])
+        except (ImproperlyConfigured, CircuitOpenError):
+            raise
+        except Exception as e:
+            logger.warning('Falha ao gerar o lote de descrições (%s produtos): %s', len(products), e)
+            descriptions = {}
+        return [(descriptions.get(product.id) or '').strip() or None for product in products]
+
+    def _attempt_batch(self, products):
+        # Uma ficha do token bucket por chamada à API, não por produto
+        if not self.bucket.acquire(self.stop_event):
+            return [(False, None)] * len(products)
+        try:
+            descriptions = self._generate_batch(products)
+        except CircuitOpenError:
+            self._pause_for_open_circuit()
+            return [(False, None)] * len(products)
+        return [(True, description) for description in descriptions]
+
+    def _generate_chunk(self, executor, chunk):
+        if self.batch_size <= 1:
+            return list(executor.map(self._attempt, chunk))
+        batches = [chunk[i:i + self.batch_size] for i in range(0, len(chunk), self.batch_size)]
+        return [result for results in executor.map(self._attempt_batch, batches) for result in results]
+
+    def _next_chunk(self):
+        size = self.chunk_size
+        if self.job.limit:
+            size = min(size, self.job.limit - self.job.processed)
+            if size <= 0:
+                return []
+        return list(
+            products_needing_description().filter(id__gt=self.job.last_product_id)
+            .order_by('id').only(*PRODUCT_FIELDS)[:size]
+        )
+
+    def _save_chunk(self, chunk, results):
+        """Grava as descrições geradas e avança o checkpoint até o último produto tentado em sequência"""
+        now = timezone.now()
+        updated = []
+        attempted = 0
+        failed = 0
+        for product, (tried, description) in zip(chunk, results):
+            if not tried:
+                break
+            attempted += 1
+            if description is None:
+                failed += 1
+                continue
+            product.description = description
+            product.updated_at = now
+            updated.append(product)
+
+        if not attempted:
+            return
+
+        with transaction.atomic():
+            if updated:
+                Product.objects.bulk_update(updated, ['description', 'updated_at'], batch_size=self.chunk_size)
+            self.job.processed += attempted
+            self.job.succeeded += attempted - failed
+            self.job.failed += failed
+            self.job.last_product_id = chunk[attempted - 1].id
+            self.job.save(update_fields=['processed', 'succeeded', 'failed', 'last_product_id', 'updated_at'])
+
+        if updated:
+            # bulk_update não dispara signals: mesma invalidação de product_saved
+            invalidate_lists_for(product.pk for product in updated)
+            bump_catalog_version()
+
+    def run(self):
+        job = self.job
+        if not job.total:
+            job.total = products_needing_description().filter(id__gt=job.last_product_id).count()
+            if job.limit:
+                job.total = min(job.total, job.limit)
+        job.status = 'running'
+        job.error = ''
+        job.finished_at = None
+        job.save()
+
+        executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bulk-description')
+        try:
+            while not self._should_stop():
+                chunk = self._next_chunk()
+                if not chunk:
+                    break
+                results = self._generate_chunk(executor, chunk)
+                self._save_chunk(chunk, results)
+                if self.on_progress:
+                    self.on_progress(job)
+
+            job.status = 'interrupted' if self.stop_event.is_set() else 'completed'
+            if self.circuit_open:
+                job.error = 'Circuit breaker da IA aberto: execução pausada, continue mais tarde'
+        except KeyboardInterrupt:
+            self.stop_event.set()
+            job.status = 'interrupted'
+            raise
+        except Exception as e:
+            logger.exception('Falha na geração de descrições em lote (job %s)', job.pk)
+            job.status = 'failed'
+            job.error = str(e)
+        finally:
+            executor.shutdown(wait=not self.stop_event.is_set(), cancel_futures=True)
+            if job.status != 'interrupted':
+                job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+        return job
+
+
+def resumable_job():
+    """Último job que pode ser continuado (interrompido, pendente ou abandonado em execução)"""
+    stale_before = timezone.now() - timedelta(seconds=generation_settings()['STALE_AFTER'])
+    return DescriptionGenerationJob.objects.filter(
+        Q(status__in=['pending', 'interrupted']) | Q(status='running', updated_at__lt=stale_before)
+    ).order_by('-created_at').first()
+
+
+def active_job():
+    """Job em execução com progresso recente (neste ou em outro processo)"""
+    stale_before = timezone.now() - timedelta(seconds=generation_settings()['STALE_AFTER'])
+    return DescriptionGenerationJob.objects.filter(
+        status='running', updated_at__gte=stale_before
+    ).order_by('-created_at').first()
+
+
+_threads = {}
+_threads_lock = threading.Lock()
+
+
+def _run_in_background(job_id, generator):
+    try:
+        job = DescriptionGenerationJob.objects.get(pk=job_id)
+        BulkDescriptionGenerator(job, generator).run()
+    except Exception:
+        logger.exception('Falha no job de geração de descrições %s', job_id)
+    finally:
+        with _threads_lock:
+            _threads.pop(job_id, None)
+        connections.close_all()
+
+
+def start_background_job(generator, user=None, limit=None):
+    """
+    Inicia a geração em segundo plano (continua o job interrompido, se houver).
+    Se já houver um job em execução, retorna ele sem iniciar outro.
+    """
+    with _threads_lock:
+        running = active_job()
+        if running is not None:
+            return running
+
+        job = resumable_job()
+        if job is None:
+            job = DescriptionGenerationJob.objects.create(created_by=user, limit=limit)
+        # Marca como em execução antes de soltar o lock (evita dois jobs simultâneos)
+        job.status = 'running'
+        job.save(update_fields=['status', 'updated_at'])
+
+        thread = threading.Thread(
+            target=_run_in_background,
+            args=(job.pk, generator),
+            name=f'bulk-description-job-{job.pk}',
+            daemon=True,
+        )
+        _threads[job.pk] = thread
+        thread.start()
+    return job
+
+
+def request_stop(job):
+    """Pede a parada do job (atende também jobs rodando em outro processo)"""
+    DescriptionGenerationJob.objects.filter(pk=job.pk, status__in=['pending', 'running']).update(
+        status='interrupted', updated_at=timezone.now()
+    )
+
+
+def job_payload(job):
+    """Progresso do job para a API/página"""
+    return {
+        'id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'total': job.total,
+        'processed': job.processed,
+        'succeeded': job.succeeded,
+        'failed': job.failed,
+        'progress': job.progress,
+        'error': job.error,
+        'finished': job.is_finished,
+        'updated_at': job.updated_at.isoformat() if job.updated_at else None,
+    }
@@ -0,0 +1,354 @@
+"""
+Importação e exportação em lote do catálogo e do histórico de interações.
+
+Os arquivos são CSV (cabeçalho com os nomes das colunas) ou JSON lines (um
+objeto por linha), lidos e escritos em streaming: a memória usada depende do
+tamanho do lote, não do arquivo.
+
+A importação grava cada lote numa transação com bulk_create(update_conflicts=True):
+linhas com id existente são atualizadas e as demais inseridas, então importar
+de novo um arquivo exportado não duplica nada. Avaliações sem id substituem a
+avaliação do mesmo usuário/produto, como em record_interaction.
+
+bulk_create não dispara sinais nem atualiza ProductStats/UserStats: os comandos
+(import_catalog, import_interactions) recalculam ao final as estatísticas dos
+usuários e produtos afetados e ajustam a sequência da pk (reset_sequences),
+já que as linhas com id explícito não a avançam.
+"""
+import csv
+import itertools
+import json
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+
+from .ingestion import parse_event
+from .models import Product, UserInteraction
+
+FORMATS = ('csv', 'jsonl')
+EXTENSIONS = {'csv': 'csv', 'jsonl': 'jsonl', 'ndjson': 'jsonl'}
+
+BATCH_SIZE = 5000
+# Progresso reportado a cada N lotes
+PROGRESS_EVERY = 10
+# Linhas inválidas reportadas uma a uma (as demais só entram na contagem)
+MAX_REPORTED_ERRORS = 20
+
+PRODUCT_FIELDS = ('id', 'name', 'description', 'category', 'price', 'image_url', 'features')
+INTERACTION_FIELDS = ('id', 'user_id', 'product_id', 'interaction_type', 'rating', 'timestamp')
+
+# Colunas atualizadas quando o id já existe (created_at fica com o valor original)
+PRODUCT_UPDATE_FIELDS = ('name', 'description', 'category', 'price', 'image_url', 'features', 'updated_at')
+INTERACTION_UPDATE_FIELDS = ('user', 'product', 'interaction_type', 'rating', 'timestamp')
+
+
+def detect_format(path, format=None):
+    """Formato informado ou deduzido da extensão do arquivo (JSON lines para '-'). Levanta ValueError."""
+    if format:
+        return format
+    if path == '-':
+        return 'jsonl'
+    extension = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+    if extension not in EXTENSIONS:
+        raise ValueError(f'Formato não reconhecido para {path!r}: use --format csv ou jsonl')
+    return EXTENSIONS[extension]
+
+
+@contextmanager
+def open_stream(path, mode):
+    """Arquivo em UTF-8 ('-' é a entrada ou saída padrão)"""
+    if path == '-':
+        yield sys.stdin if mode == 'r' else sys.stdout
+        return
+    with open(path, mode, encoding='utf-8', newline='') as stream:
+        yield stream
+
+
+def read_rows(stream, format):
+    """Gera (número da linha, dict) do arquivo; linhas JSON inválidas viram (número, None)"""
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(stream, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield line_number, json.loads(line)
+        except ValueError:
+            yield line_number, None
+
+
+def _value(row, key):
+    """Valor da coluna, com célula vazia do CSV como None"""
+    value = row.get(key)
+    return None if value == '' else value
+
+
+def _parse_id(row, key, required=False):
+    value = _value(row, key)
+    if value is None:
+        if required:
+            raise ValueError(f'{key} obrigatório')
+        return None
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{key} inválido')
+    if value <= 0:
+        raise ValueError(f'{key} inválido')
+    return value
+
+
+def _require_object(row):
+    if not isinstance(row, dict):
+        raise ValueError('Linha não é um objeto JSON válido')
+
+
+def parse_product(row):
+    """Product (não salvo) a partir de uma linha do arquivo. Levanta ValueError."""
+    _require_object(row)
+
+    values = {}
+    for field_name in ('name', 'category'):
+        value = _value(row, field_name)
+        if not value:
+            raise ValueError(f'{field_name} obrigatório')
+        max_length = Product._meta.get_field(field_name).max_length
+        if len(str(value)) > max_length:
+            raise ValueError(f'{field_name} com mais de {max_length} caracteres')
+        values[field_name] = str(value)
+
+    try:
+        price = Decimal(str(_value(row, 'price')))
+    except InvalidOperation:
+        raise ValueError('price inválido')
+    if not price.is_finite() or price < 0:
+        raise ValueError('price inválido')
+
+    features = _value(row, 'features')
+    if features is None:
+        features = {}
+    elif isinstance(features, str):
+        # No CSV as características vêm como JSON
+        try:
+            features = json.loads(features)
+        except ValueError:
+            raise ValueError('features inválido')
+
+    return Product(
+        id=_parse_id(row, 'id'),
+        description=_value(row, 'description') or '',
+        price=price.quantize(Decimal('0.01')),
+        image_url=_value(row, 'image_url'),
+        features=features,
+        **values,
+    )
+
+
+def parse_interaction(row):
+    """UserInteraction (não salvo) a partir de uma linha do arquivo. Levanta ValueError."""
+    _require_object(row)
+    # Mesma validação dos eventos da API (tipo, avaliação 1-5, timestamp)
+    product_id, interaction_type, rating, timestamp = parse_event(row)
+    return UserInteraction(
+        id=_parse_id(row, 'id'),
+        user_id=_parse_id(row, 'user_id', required=True),
+        product_id=product_id,
+        interaction_type=interaction_type,
+        rating=rating,
+        timestamp=timestamp,
+    )
+
+
+def _dedupe_by_id(objects):
+    """Uma linha por id no lote (a última vence): o upsert não pode tocar a mesma linha duas vezes"""
+    unique = {}
+    for index, obj in enumerate(objects):
+        unique[('id', obj.pk) if obj.pk is not None else ('new', index)] = obj
+    return list(unique.values())
+
+
+def upsert_products(products):
+    """Grava um lote de produtos numa transação (upsert pelo id). Retorna quantos foram gravados."""
+    products = _dedupe_by_id(products)
+    with transaction.atomic():
+        Product.objects.bulk_create(
+            products,
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=PRODUCT_UPDATE_FIELDS,
+        )
+    return len(products)
+
+
+def upsert_interactions(interactions, touched=None):
+    """
+    Grava um lote de interações numa transação (upsert pelo id).
+
+    Interações de usuários ou produtos inexistentes são descartadas e avaliações
+    sem id assumem o id da avaliação já gravada para o mesmo usuário/produto.
+    Com touched ({'users': set(), 'products': set()}), acumula os ids cujas
+    estatísticas mudam, inclusive os de onde saíram as linhas sobrescritas.
+    Retorna quantas foram gravadas.
+    """
+    product_ids = set(Product.objects.filter(
+        id__in={interaction.product_id for interaction in interactions}
+    ).values_list('id', flat=True))
+    user_ids = set(User.objects.filter(
+        id__in={interaction.user_id for interaction in interactions}
+    ).values_list('id', flat=True))
+    valid = [
+        interaction for interaction in interactions
+        if interaction.product_id in product_ids and interaction.user_id in user_ids
+    ]
+
+    new_ratings = [
+        interaction for interaction in valid
+        if interaction.interaction_type == 'rating' and interaction.pk is None
+    ]
+    if new_ratings:
+        existing = {
+            (user_id, product_id): pk
+            for user_id, product_id, pk in UserInteraction.objects.filter(
+                interaction_type='rating',
+                user_id__in={interaction.user_id for interaction in new_ratings},
+                product_id__in={interaction.product_id for interaction in new_ratings},
+            ).values_list('user_id', 'product_id', 'id')
+        }
+        for interaction in new_ratings:
+            interaction.pk = existing.get((interaction.user_id, interaction.product_id))
+
+    # Uma avaliação por usuário/produto também dentro do lote
+    unique = {}
+    for index, interaction in enumerate(valid):
+        if interaction.pk is None and interaction.interaction_type == 'rating':
+            key = ('rating', interaction.user_id, interaction.product_id)
+        else:
+            key = ('new', index)
+        unique[key] = interaction
+    valid = _dedupe_by_id(unique.values())
+
+    if touched is not None:
+        replaced = UserInteraction.objects.filter(
+            id__in=[interaction.pk for interaction in valid if interaction.pk is not None]
+        ).values_list('user_id', 'product_id')
+        written = [(interaction.user_id, interaction.product_id) for interaction in valid]
+        for user_id, product_id in [*replaced, *written]:
+            touched['users'].add(user_id)
+            touched['products'].add(product_id)
+
+    with transaction.atomic():
+        UserInteraction.objects.bulk_create(
+            valid,
+            update_conflicts=True,
+            unique_fields=['id'],
+            update_fields=INTERACTION_UPDATE_FIELDS,
+        )
+    return len(valid)
+
+
+def reset_sequences(model):
+    """
+    Ajusta a sequência da pk ao maior id gravado, para que os próximos INSERT
+    sem id não colidam com as linhas importadas com id explícito (no SQLite o
+    autoincremento já segue o maior id e não há SQL a rodar).
+    """
+    connection = connections[router.db_for_write(model)]
+    statements = connection.ops.sequence_reset_sql(no_style(), [model])
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def import_rows(stream, format, parse, write, batch_size=BATCH_SIZE, on_progress=None, on_error=None):
+    """
+    Lê o arquivo em lotes de batch_size linhas, valida cada linha com parse e
+    grava o lote com write (uma transação por lote).
+
+    on_error(número da linha, mensagem) recebe as primeiras linhas inválidas;
+    on_progress(gravadas, ignoradas, segundos) é chamado a cada PROGRESS_EVERY lotes.
+    Retorna {'written', 'skipped', 'elapsed'}.
+    """
+    rows = read_rows(stream, format)
+    written = skipped = 0
+    start = time.perf_counter()
+
+    for batch_number in itertools.count(1):
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            break
+
+        objects = []
+        for line_number, row in batch:
+            try:
+                objects.append(parse(row))
+            except ValueError as exc:
+                skipped += 1
+                if on_error and skipped <= MAX_REPORTED_ERRORS:
+                    on_error(line_number, str(exc))
+
+        saved = write(objects) if objects else 0
+        written += saved
+        skipped += len(objects) - saved
+        if on_progress and batch_number % PROGRESS_EVERY == 0:
+            on_progress(written, skipped, time.perf_counter() - start)
+
+    return {'written': written, 'skipped': skipped, 'elapsed': time.perf_counter() - start}
+
+
+def _serialize(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return _serialize(value)
+
+
+def export_rows(stream, format, queryset, fields, batch_size=BATCH_SIZE, on_progress=None):
+    """
+    Escreve as colunas `fields` do queryset, em ordem de id, lendo do banco em
+    blocos de batch_size linhas (iterator) para não carregar a tabela na memória.
+
+    on_progress(linhas, segundos) é chamado a cada PROGRESS_EVERY blocos.
+    Retorna {'written', 'elapsed'}.
+    """
+    rows = queryset.order_by('id').values_list(*fields).iterator(chunk_size=batch_size)
+    if format == 'csv':
+        writer = csv.writer(stream)
+        writer.writerow(fields)
+
+        def write(values):
+            writer.writerow([_csv_value(value) for value in values])
+    else:
+        def write(values):
+            row = {field: _serialize(value) for field, value in zip(fields, values)}
+            stream.write(json.dumps(row, ensure_ascii=False) + '\n')
+
+    written = 0
+    start = time.perf_counter()
+    for values in rows:
+        write(values)
+        written += 1
+        if on_progress and written % (batch_size * PROGRESS_EVERY) == 0:
+            on_progress(written, time.perf_counter() - start)
+
+    return {'written': written, 'elapsed': time.perf_counter() - start}
@@ -0,0 +1,69 @@
+"""
+Versão do catálogo para cache de fragmentos e dados das listagens.
+
+Toda chave de cache das listagens inclui a versão atual do catálogo; para
+invalidar tudo basta incrementar a versão (as chaves antigas expiram sozinhas).
+A versão é incrementada quando um produto é salvo ou removido (signals) e na
+atualização periódica das estatísticas (comando rebuild_product_stats).
+
+A versão fica no banco (CatalogVersion), não no cache: o cache padrão é local
+de cada processo, e com vários workers o incremento feito em um deles precisa
+invalidar os fragmentos de todos.
+
+Nos templates: {% cache fragment_timeout 'nome' catalog_version ... %}.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .categories import category_names
+from .models import CatalogVersion
+
+# Linha única de CatalogVersion
+CATALOG_VERSION_ID = 1
+
+
+def fragment_timeout():
+    """Tempo (s) dos fragmentos em cache; limita quanto as estatísticas podem ficar defasadas"""
+    return getattr(settings, 'CATALOG_FRAGMENT_CACHE_TIMEOUT', 300)
+
+
+def get_catalog_version():
+    """Versão atual do catálogo (começa em 1), a mesma em todos os processos"""
+    version = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).values_list('version', flat=True).first()
+    return version or 1
+
+
+def bump_catalog_version():
+    """Invalida todos os fragmentos e dados do catálogo em cache (em todos os processos)"""
+    updated = CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).update(version=F('version') + 1)
+    if not updated:
+        # Primeira mudança: cria a linha já na versão 2 (ou incrementa a criada por outro processo)
+        _, created = CatalogVersion.objects.get_or_create(pk=CATALOG_VERSION_ID, defaults={'version': 2})
+        if not created:
+            CatalogVersion.objects.filter(pk=CATALOG_VERSION_ID).update(version=F('version') + 1)
+
+
+def catalog_key(name, *parts, version=None):
+    """
+    Chave de cache de `name` para a versão do catálogo e os parâmetros informados.
+    Views que já leram a versão a repassam em `version` (uma leitura por requisição).
+    """
+    if version is None:
+        version = get_catalog_version()
+    digest = hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'catalog:{name}:{version}:{digest}'
+
+
+def cached_catalog_data(name, parts, compute, timeout=None, version=None):
+    """Resultado de compute() em cache para a versão atual do catálogo"""
+    if timeout is None:
+        timeout = fragment_timeout()
+    return cache.get_or_set(catalog_key(name, *parts, version=version), compute, timeout)
+
+
+def cached_categories(version=None):
+    """Lista de categorias com produtos, em ordem alfabética (lida de CategoryStats)"""
+    return cached_catalog_data('categories', [], category_names, version=version)
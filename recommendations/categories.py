@@ -0,0 +1,124 @@
+"""
+Catálogo de categorias materializado (CategoryStats).
+
+Menus de categorias e o cabeçalho da página de categoria leem uma linha por
+categoria em vez de DISTINCT/AVG/SUM sobre todos os produtos. A tabela é
+mantida com incrementos F():
+
+- produto criado, alterado (categoria/preço) ou removido: signals de Product;
+- visualização registrada: record_interaction / record_interactions_bulk.
+
+rebuild_category_stats() recalcula tudo a partir dos produtos (backfill e
+reconciliação, chamado por rebuild_product_stats).
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import CategoryStats, Product
+
+
+def adjust_category_stats(name, **deltas):
+    """
+    Soma os deltas à linha da categoria com F(), criando a linha se necessário.
+
+    Ex.: adjust_category_stats('Livros', product_count=1, price_sum=Decimal('29.90'))
+    """
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not name or not deltas:
+        return
+
+    updates = {field: F(field) + value for field, value in deltas.items()}
+    updates['updated_at'] = timezone.now()
+    if CategoryStats.objects.filter(name=name).update(**updates):
+        return
+
+    try:
+        # Primeira ocorrência da categoria
+        with transaction.atomic():
+            CategoryStats.objects.create(name=name, **deltas)
+    except IntegrityError:
+        # Outra requisição criou a linha primeiro
+        CategoryStats.objects.filter(name=name).update(**updates)
+
+
+def increment_category_views(views_by_category):
+    """Soma visualizações por categoria: {categoria: visualizações} (um único UPDATE)"""
+    views_by_category = {name: views for name, views in views_by_category.items() if views}
+    if not views_by_category:
+        return
+
+    increment = Case(
+        *[When(name=name, then=Value(views)) for name, views in views_by_category.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    CategoryStats.objects.filter(name__in=views_by_category).update(
+        total_views=F('total_views') + increment,
+        updated_at=timezone.now(),
+    )
+
+
+def rebuild_category_stats():
+    """
+    Recalcula CategoryStats a partir dos produtos e de ProductStats em uma
+    agregação, removendo categorias que não têm mais produtos.
+
+    Retorna o número de categorias.
+    """
+    aggregates = Product.objects.values('category').annotate(
+        products=Count('id'),
+        prices=Sum('price'),
+        views=Coalesce(Sum('stats__view_count'), 0),
+    ).order_by()
+
+    now = timezone.now()
+    rows = [
+        CategoryStats(
+            name=row['category'],
+            product_count=row['products'],
+            price_sum=row['prices'] or Decimal('0'),
+            total_views=row['views'],
+            updated_at=now,
+        )
+        for row in aggregates
+    ]
+
+    with transaction.atomic():
+        CategoryStats.objects.exclude(name__in=[row.name for row in rows]).delete()
+        CategoryStats.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['name'],
+            update_fields=['product_count', 'price_sum', 'total_views', 'updated_at'],
+        )
+    return len(rows)
+
+
+def category_names():
+    """Categorias com produtos, em ordem alfabética"""
+    return list(
+        CategoryStats.objects.filter(product_count__gt=0).order_by('name').values_list('name', flat=True)
+    )
+
+
+def category_summary(category_name):
+    """
+    Resumo das categorias cujo nome contém `category_name` (mesma regra da
+    página de categoria): nomes, total de produtos, preço médio e visualizações.
+    """
+    rows = list(
+        CategoryStats.objects.filter(name__icontains=category_name, product_count__gt=0)
+        .values_list('name', 'product_count', 'price_sum', 'total_views')
+    )
+    total = sum(row[1] for row in rows)
+    price_sum = sum((row[2] for row in rows), Decimal('0'))
+    return {
+        'names': [row[0] for row in rows],
+        'total': total,
+        'avg_price': round(price_sum / total, 2) if total else 0,
+        'total_views': sum(row[3] for row in rows),
+    }
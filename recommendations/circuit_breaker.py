@@ -0,0 +1,226 @@
+"""
+Circuit breaker das chamadas ao provedor de IA.
+
+Acompanha as chamadas dos últimos WINDOW_SECONDS e abre o circuito quando,
+com pelo menos MINIMUM_CALLS chamadas na janela, a taxa de falhas passa de
+FAILURE_RATE_THRESHOLD ou a de chamadas lentas (mais de SLOW_CALL_DURATION
+segundos) passa de SLOW_CALL_RATE_THRESHOLD.
+
+Aberto, o AIGenerator nem chama o provedor: responde na hora com o fallback
+criativo, em vez de prender um worker até o timeout. Depois de OPEN_SECONDS
+o circuito fica meio-aberto e deixa passar até HALF_OPEN_MAX_CALLS chamadas
+de teste: se todas derem certo ele fecha, se uma falhar ele abre de novo.
+Chamadas de teste canceladas sem resultado liberam a vaga (release).
+
+allow_request devolve um Permit, que volta em record_success/record_failure/
+release: no meio-aberto só contam as chamadas que reservaram uma vaga de teste
+naquele meio-aberto (as que começaram com o circuito fechado são ignoradas).
+
+O estado é do processo (cada worker tem o seu). Configuração em
+settings.AI_CIRCUIT_BREAKER (ver DEFAULTS).
+"""
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+DEFAULTS = {
+    'ENABLED': True,
+    'WINDOW_SECONDS': 60,
+    'MINIMUM_CALLS': 10,
+    'FAILURE_RATE_THRESHOLD': 0.5,
+    'SLOW_CALL_DURATION': 15.0,
+    'SLOW_CALL_RATE_THRESHOLD': 0.8,
+    'OPEN_SECONDS': 30,
+    'HALF_OPEN_MAX_CALLS': 3,
+}
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+STATE_LABELS = {
+    CLOSED: 'Fechado',
+    OPEN: 'Aberto',
+    HALF_OPEN: 'Meio-aberto',
+}
+
+
+def breaker_settings():
+    return {**DEFAULTS, **getattr(settings, 'AI_CIRCUIT_BREAKER', {})}
+
+
+class CircuitOpenError(Exception):
+    """Chamada recusada porque o circuito está aberto"""
+
+
+class Permit:
+    """
+    Autorização de uma chamada dada por allow_request. trial indica que ela
+    ocupa uma vaga de teste do meio-aberto número `generation`.
+    """
+
+    __slots__ = ('trial', 'generation')
+
+    def __init__(self, trial=False, generation=None):
+        self.trial = trial
+        self.generation = generation
+
+
+class CircuitBreaker:
+    """Circuit breaker thread-safe com janela deslizante de tempo"""
+
+    def __init__(self, config=None, clock=time.monotonic):
+        self.config = {**DEFAULTS, **(config or {})}
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        # (instante, falhou, lenta) das chamadas da janela
+        self.calls = deque()
+        self.opened_at = None
+        self.half_open_in_flight = 0
+        self.half_open_successes = 0
+        # Muda a cada meio-aberto: vagas de teste de um meio-aberto anterior não contam
+        self.generation = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(breaker_settings())
+
+    @property
+    def enabled(self):
+        return bool(self.config['ENABLED'])
+
+    def _prune(self, now):
+        limit = now - self.config['WINDOW_SECONDS']
+        while self.calls and self.calls[0][0] < limit:
+            self.calls.popleft()
+
+    def _rates(self):
+        total = len(self.calls)
+        if not total:
+            return 0, 0.0, 0.0
+        failures = sum(1 for _, failed, _ in self.calls if failed)
+        slow = sum(1 for _, _, is_slow in self.calls if is_slow)
+        return total, failures / total, slow / total
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+        self.half_open_in_flight = 0
+        self.half_open_successes = 0
+        self.times_opened += 1
+
+    def _current_state(self, now):
+        if self.state == OPEN and now - self.opened_at >= self.config['OPEN_SECONDS']:
+            self.state = HALF_OPEN
+            self.half_open_in_flight = 0
+            self.half_open_successes = 0
+            self.generation += 1
+        return self.state
+
+    def _is_trial(self, permit):
+        """Se a chamada reservou uma vaga de teste do meio-aberto atual"""
+        return permit is not None and permit.trial and permit.generation == self.generation
+
+    def allow_request(self):
+        """
+        Permit se a chamada pode ir ao provedor (no meio-aberto, reserva uma das
+        chamadas de teste), None se não pode
+        """
+        if not self.enabled:
+            return Permit()
+        with self.lock:
+            state = self._current_state(self.clock())
+            if state == CLOSED:
+                return Permit()
+            if state == HALF_OPEN and self.half_open_in_flight + self.half_open_successes < self.config['HALF_OPEN_MAX_CALLS']:
+                self.half_open_in_flight += 1
+                return Permit(trial=True, generation=self.generation)
+            self.rejected += 1
+            return None
+
+    def check(self):
+        """Como allow_request, mas levanta CircuitOpenError se a chamada não pode ir ao provedor"""
+        permit = self.allow_request()
+        if permit is None:
+            raise CircuitOpenError('Circuit breaker da IA aberto')
+        return permit
+
+    def release(self, permit):
+        """
+        Devolve a chamada de teste reservada por allow_request sem registrar
+        resultado (chamada cancelada). Sem isso, no meio-aberto a vaga ficaria
+        presa e o circuito nunca mais fecharia.
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            if self._current_state(self.clock()) == HALF_OPEN and self._is_trial(permit):
+                self.half_open_in_flight = max(0, self.half_open_in_flight - 1)
+
+    def record_success(self, duration, permit=None):
+        self._record(False, duration, permit)
+
+    def record_failure(self, duration, permit=None):
+        self._record(True, duration, permit)
+
+    def _record(self, failed, duration, permit):
+        if not self.enabled:
+            return
+        config = self.config
+        with self.lock:
+            now = self.clock()
+            state = self._current_state(now)
+            if state == HALF_OPEN:
+                if not self._is_trial(permit):
+                    # Começou com o circuito fechado ou num meio-aberto anterior: não é chamada de teste
+                    return
+                self.half_open_in_flight = max(0, self.half_open_in_flight - 1)
+                if failed:
+                    self._open(now)
+                    return
+                self.half_open_successes += 1
+                if self.half_open_successes >= config['HALF_OPEN_MAX_CALLS']:
+                    self.state = CLOSED
+                    self.opened_at = None
+                    self.calls.clear()
+                return
+            if state == OPEN:
+                # Chamada que começou antes de o circuito abrir
+                return
+
+            self.calls.append((now, failed, duration >= config['SLOW_CALL_DURATION']))
+            self._prune(now)
+            total, failure_rate, slow_rate = self._rates()
+            if total >= config['MINIMUM_CALLS'] and (
+                failure_rate >= config['FAILURE_RATE_THRESHOLD'] or
+                slow_rate >= config['SLOW_CALL_RATE_THRESHOLD']
+            ):
+                self._open(now)
+
+    def snapshot(self):
+        """Estado atual para a página de status"""
+        with self.lock:
+            now = self.clock()
+            state = self._current_state(now)
+            self._prune(now)
+            total, failure_rate, slow_rate = self._rates()
+            retry_in = None
+            if state == OPEN:
+                retry_in = max(0, round(self.config['OPEN_SECONDS'] - (now - self.opened_at)))
+            return {
+                'enabled': self.enabled,
+                'state': state,
+                'state_display': STATE_LABELS[state],
+                'calls': total,
+                'failure_rate': round(failure_rate * 100, 1),
+                'slow_call_rate': round(slow_rate * 100, 1),
+                'retry_in': retry_in,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened,
+                'config': dict(self.config),
+            }
@@ -0,0 +1,55 @@
+"""
+Roteamento leitura/escrita entre o banco primário e a réplica opcional.
+
+Sem o alias 'replica' em settings.DATABASES tudo vai para o primário. Com ele,
+as leituras das views vão para a réplica e as escritas para o primário. Dentro
+de uma transação no primário as leituras ficam no primário, para enxergar as
+próprias escritas (upsert de avaliação, select_for_update das estatísticas).
+
+Sessões, usuários/permissões, content types e a versão do catálogo são lidos
+sempre no primário: com o atraso da réplica, um login recém-feito ou uma
+versão recém-incrementada ainda não estariam lá (sessão perdida, cache velho).
+
+O alias deve apontar para uma réplica de verdade, mantida por replicação
+externa; fora de transações as leituras podem ver dados com atraso.
+"""
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_ALIAS = 'replica'
+
+# Lidos sempre no primário (ver docstring do módulo)
+PRIMARY_ONLY_APPS = {'sessions', 'auth', 'contenttypes'}
+PRIMARY_ONLY_MODELS = {'recommendations.catalogversion'}
+
+
+def replica_enabled():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if not replica_enabled():
+            return None
+        if model._meta.app_label in PRIMARY_ONLY_APPS or model._meta.label_lower in PRIMARY_ONLY_MODELS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # A réplica é uma cópia do primário
+        aliases = {DEFAULT_DB_ALIAS, REPLICA_ALIAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # A réplica recebe o schema do primário pela replicação
+        if db == REPLICA_ALIAS:
+            return False
+        return None
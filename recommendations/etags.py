@@ -0,0 +1,75 @@
+"""
+ETags fortes para as APIs de recomendações e de dados do produto.
+
+O ETag é calculado a partir de versões baratas de ler (versão do modelo,
+última interação do usuário, versão do catálogo, updated_at do produto e
+contadores das estatísticas), sem rodar o recomendador nem serializar nada.
+Se o cliente mandar If-None-Match com o mesmo ETag, a view responde 304 antes
+de qualquer trabalho pesado.
+"""
+import hashlib
+
+from django.db.models import Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .catalog_cache import get_catalog_version
+from .models import Product, UserInteraction
+
+
+def make_etag(*parts):
+    """ETag forte (entre aspas) a partir das partes informadas"""
+    digest = hashlib.sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def not_modified(request, etag):
+    """Resposta 304 se o If-None-Match do cliente bate com o ETag, senão None"""
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        set_etag(response, etag)
+    return response
+
+
+def set_etag(response, etag):
+    """Define o ETag e obriga o cliente a revalidar (a resposta depende do usuário)"""
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def recommendations_etag(user_id, model_version, variant):
+    """
+    ETag das recomendações do usuário: muda quando o modelo é retreinado, quando
+    o usuário registra (ou atualiza) uma interação e quando o catálogo muda.
+    """
+    last_interaction = UserInteraction.objects.filter(user_id=user_id).aggregate(
+        last_id=Max('id'),
+        last_at=Max('timestamp'),
+    )
+    return make_etag(
+        'recommendations', variant, model_version,
+        last_interaction['last_id'], last_interaction['last_at'],
+        get_catalog_version(),
+    )
+
+
+STATS_FIELDS = (
+    'updated_at',
+    'stats__view_count',
+    'stats__wishlist_count',
+    'stats__rating_sum',
+    'stats__rating_count',
+    'stats__last_interaction_at',
+)
+
+
+def product_stats_row(product_id):
+    """
+    Linha (updated_at do produto + contadores das estatísticas) usada tanto no
+    ETag quanto na resposta da API. None se o produto não existe.
+    """
+    return Product.objects.filter(id=product_id).values_list(*STATS_FIELDS).first()
+
+
+def product_stats_etag(product_id, row):
+    return make_etag('product-stats', product_id, *row)
@@ -0,0 +1,80 @@
+"""
+Cache dos textos gerados pela IA (opt-in).
+
+A chave é um hash das entradas normalizadas (nome, categoria, preço,
+features), do modelo e do estilo/tom/ângulo escolhidos. Com o cache ligado,
+o AIGenerator escolhe estilo/tom/ângulo a partir do hash das entradas: as
+mesmas entradas geram a mesma chave, e repetir o assistente durante a edição
+de um produto não gasta cota da API.
+
+Fica num alias próprio de settings.CACHES (por padrão em disco, com
+MAX_ENTRIES/TIMEOUT limitando tamanho e validade). Só respostas da API são
+guardadas, nunca os textos de fallback.
+
+Configuração em settings.AI_GENERATION_CACHE (ver DEFAULTS).
+"""
+import hashlib
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULTS = {
+    'ENABLED': False,
+    'ALIAS': 'ai_generation',
+    # None usa o TIMEOUT do alias
+    'TIMEOUT': None,
+}
+
+KEY_PREFIX = 'ai-generation'
+
+
+def generation_cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'AI_GENERATION_CACHE', {})}
+
+
+def is_enabled():
+    return bool(generation_cache_settings()['ENABLED'])
+
+
+def get_cache():
+    return caches[generation_cache_settings()['ALIAS']]
+
+
+def normalize(value):
+    """Texto sem diferenças de caixa e espaços; preços viram Decimal com 2 casas"""
+    if value is None:
+        return ''
+    if isinstance(value, (int, float, Decimal)):
+        value = str(value)
+    text = re.sub(r'\s+', ' ', str(value)).strip().lower()
+    try:
+        return str(Decimal(text.replace(',', '.')).quantize(Decimal('0.01')))
+    except (InvalidOperation, ValueError):
+        return text
+
+
+def digest(*parts):
+    return hashlib.sha256('\x1f'.join(normalize(part) for part in parts).encode()).hexdigest()
+
+
+def make_key(kind, *parts):
+    """Chave de cache de um tipo de geração ('description', 'features', ...)"""
+    return f'{KEY_PREFIX}:{kind}:{digest(*parts)}'
+
+
+def lookup(key):
+    return get_cache().get(key)
+
+
+def store(key, value):
+    get_cache().set(key, value, generation_cache_settings()['TIMEOUT'] or get_cache().default_timeout)
+
+
+async def alookup(key):
+    return await get_cache().aget(key)
+
+
+async def astore(key, value):
+    await get_cache().aset(key, value, generation_cache_settings()['TIMEOUT'] or get_cache().default_timeout)
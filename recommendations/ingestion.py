@@ -0,0 +1,386 @@
+"""
+Ingestão em lote de interações (visualizações, cliques, lista de desejos...).
+
+As APIs enfileiram os eventos num buffer em memória, limitado, que é gravado
+com bulk_create (recommendations.stats.record_interactions_bulk) quando atinge
+BATCH_SIZE eventos ou quando o evento mais antigo passa de FLUSH_INTERVAL
+segundos. Com o buffer cheio, add() levanta BufferFull e a API responde 503
+com Retry-After (backpressure) em vez de acumular memória sem limite.
+
+Avaliações não passam pelo buffer: têm semântica de upsert e continuam
+síncronas (recommendations.stats.record_interaction).
+
+Um lote recusado pelo banco por dados inválidos (IntegrityError/DataError) é
+dividido ao meio até isolar as linhas ruins, que vão para dead_letters em vez
+de voltar ao buffer; outros erros (banco fora do ar, lock) devolvem o lote ao
+buffer para a próxima tentativa.
+
+Configuração em settings.INTERACTION_INGESTION (ver DEFAULTS).
+"""
+import atexit
+import collections
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import DataError, IntegrityError, connections
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Product, UserInteraction
+from .stats import record_interaction, record_interactions_bulk
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_MODES = ('buffered', 'sync')
+
+DEFAULTS = {
+    'DURABILITY': 'buffered',
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,
+    'MAX_BUFFER_SIZE': 10000,
+    'MAX_EVENTS_PER_REQUEST': 500,
+    # Thread que grava o buffer por tempo mesmo sem novas requisições
+    'FLUSH_THREAD': True,
+}
+
+# Tipos aceitos pela ingestão ('wishlist' é usado pelas views, fora dos choices)
+INTERACTION_TYPES = {value for value, _ in UserInteraction.INTERACTION_TYPES} | {'wishlist'}
+# Tipos que passam pelo buffer; avaliações são gravadas na hora (upsert da nota do usuário)
+BUFFERED_TYPES = INTERACTION_TYPES - {'rating'}
+
+CARD_FIELDS = ('id', 'name', 'category', 'price', 'image_url')
+
+# Eventos recusados pelo banco guardados para inspeção (os mais antigos saem)
+DEAD_LETTER_SIZE = 1000
+
+PRODUCT_NOT_FOUND = 'Produto não encontrado'
+
+
+class BufferFull(Exception):
+    """Buffer de ingestão cheio: o cliente deve tentar novamente depois"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Buffer de interações cheio, tente novamente em {retry_after}s')
+        self.retry_after = retry_after
+
+
+def ingestion_settings():
+    return {**DEFAULTS, **getattr(settings, 'INTERACTION_INGESTION', {})}
+
+
+def parse_event(data):
+    """
+    Valida um evento recebido pela API e retorna
+    (product_id, interaction_type, rating, timestamp). Levanta ValueError.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Evento deve ser um objeto')
+
+    try:
+        product_id = int(data.get('product_id'))
+    except (TypeError, ValueError):
+        raise ValueError('product_id inválido')
+    if product_id <= 0:
+        raise ValueError('product_id inválido')
+
+    interaction_type = data.get('interaction_type') or 'view'
+    if interaction_type not in INTERACTION_TYPES:
+        raise ValueError(f'Tipo de interação inválido: {interaction_type}')
+
+    rating = None
+    if interaction_type == 'rating':
+        try:
+            rating = int(data.get('rating'))
+        except (TypeError, ValueError):
+            raise ValueError('Avaliação inválida')
+        if not 1 <= rating <= 5:
+            raise ValueError('Avaliação deve ser entre 1 e 5')
+
+    # Horário informado pelo cliente (eventos acumulados no navegador); nunca no futuro
+    now = timezone.now()
+    timestamp = now
+    if data.get('timestamp'):
+        timestamp = parse_datetime(str(data['timestamp']))
+        if timestamp is None:
+            raise ValueError('timestamp inválido')
+        if timezone.is_naive(timestamp):
+            timestamp = timezone.make_aware(timestamp)
+        timestamp = min(timestamp, now)
+
+    return product_id, interaction_type, rating, timestamp
+
+
+def write_interactions(interactions):
+    """
+    Grava um lote de interações (UserInteraction não salvos) com bulk_create.
+
+    Eventos de produtos ou usuários removidos depois de enfileirados são
+    descartados. Retorna o número de interações gravadas.
+    """
+    products = Product.objects.only(*CARD_FIELDS).in_bulk(
+        {interaction.product_id for interaction in interactions}
+    )
+    user_ids = set(User.objects.filter(
+        id__in={interaction.user_id for interaction in interactions}
+    ).values_list('id', flat=True))
+
+    valid = []
+    for interaction in interactions:
+        product = products.get(interaction.product_id)
+        if product is None or interaction.user_id not in user_ids:
+            continue
+        interaction.product = product
+        valid.append(interaction)
+
+    dropped = len(interactions) - len(valid)
+    if dropped:
+        logger.warning('%d interações descartadas: produto ou usuário inexistente', dropped)
+
+    record_interactions_bulk(valid)
+    return len(valid)
+
+
+def _reset(events):
+    """Volta os eventos ao estado não salvo (o bulk_create desfeito pode ter definido a pk)"""
+    for event in events:
+        event.pk = None
+        event._state.adding = True
+    return events
+
+
+class InteractionBuffer:
+    """
+    Buffer limitado de interações, gravado em lote por tamanho ou por tempo.
+
+    Thread-safe: as views enfileiram de várias threads; só um flush roda por vez.
+    """
+
+    def __init__(self, batch_size=500, flush_interval=2.0, max_size=10000,
+                 durability='buffered', flush_thread=True):
+        if durability not in DURABILITY_MODES:
+            raise ImproperlyConfigured(
+                f"INTERACTION_INGESTION['DURABILITY'] deve ser um de {DURABILITY_MODES}, não {durability!r}"
+            )
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self.durability = durability
+        self.flush_thread = flush_thread
+
+        self._events = []
+        self._oldest = None
+        self.dead_letters = collections.deque(maxlen=DEAD_LETTER_SIZE)
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._events)
+
+    @property
+    def retry_after(self):
+        """Segundos sugeridos ao cliente quando o buffer está cheio"""
+        return max(1, int(round(self.flush_interval)))
+
+    def add(self, interactions):
+        """
+        Enfileira interações (UserInteraction não salvos).
+
+        Com durabilidade 'sync' grava na hora. Levanta BufferFull se não houver espaço.
+        """
+        if not interactions:
+            return
+        if self.durability == 'sync':
+            write_interactions(list(interactions))
+            return
+
+        with self._lock:
+            if len(self._events) + len(interactions) > self.max_size:
+                raise BufferFull(self.retry_after)
+            self._events.extend(interactions)
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            should_flush = len(self._events) >= self.batch_size or self._expired()
+
+        self._ensure_thread()
+        if should_flush:
+            self.flush()
+
+    def _expired(self):
+        return self._oldest is not None and time.monotonic() - self._oldest >= self.flush_interval
+
+    def flush(self):
+        """Grava tudo o que está no buffer. Retorna o número de interações gravadas."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._events, self._oldest = self._events, [], None
+
+            pending = [batch[start:start + self.batch_size] for start in range(0, len(batch), self.batch_size)]
+            written = 0
+            while pending:
+                chunk = pending.pop(0)
+                try:
+                    written += write_interactions(chunk)
+                except (IntegrityError, DataError):
+                    _reset(chunk)
+                    if len(chunk) == 1:
+                        self._dead_letter(chunk[0])
+                    else:
+                        # Divide ao meio até isolar as linhas que o banco recusa
+                        middle = len(chunk) // 2
+                        pending[:0] = [chunk[:middle], chunk[middle:]]
+                except Exception:
+                    logger.exception('Falha ao gravar lote de %d interações', len(chunk))
+                    self._requeue(_reset([event for part in [chunk] + pending for event in part]))
+                    break
+            return written
+
+    def _dead_letter(self, event):
+        """Evento recusado pelo banco: sai do buffer (senão todo flush esbarraria nele)"""
+        logger.error(
+            'Interação descartada (recusada pelo banco): usuário %s, produto %s, tipo %s',
+            event.user_id, event.product_id, event.interaction_type,
+        )
+        self.dead_letters.append(event)
+
+    def _requeue(self, events):
+        """Devolve ao início do buffer os eventos que não foram gravados (se couberem)"""
+        with self._lock:
+            room = self.max_size - len(self._events)
+            if room < len(events):
+                logger.error('Buffer cheio: %d interações perdidas', len(events) - max(room, 0))
+                events = events[:max(room, 0)]
+            self._events[:0] = events
+            if events and self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def _ensure_thread(self):
+        if not self.flush_thread or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='interaction-buffer-flush', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopped.wait(self.flush_interval / 2):
+            if self._expired():
+                try:
+                    self.flush()
+                finally:
+                    # Thread fora do ciclo de requisição: não deixa conexões abertas
+                    connections.close_all()
+
+    def stop(self, flush=True):
+        """Para a thread de flush (gravando o que restou, por padrão)"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval)
+        if flush:
+            self.flush()
+
+
+def ingest_events(user, events):
+    """
+    Valida e registra eventos do usuário: avaliações na hora, o resto pelo buffer.
+
+    Retorna {'accepted': n, 'rejected': [{'index': i, 'message': ..., 'status': 400|404}]}.
+    Levanta BufferFull (nada do lote é enfileirado nesse caso).
+    """
+    parsed, rejected = [], []
+    for index, data in enumerate(events):
+        try:
+            parsed.append((index, *parse_event(data)))
+        except ValueError as e:
+            rejected.append({'index': index, 'message': str(e), 'status': 400})
+
+    # Produto inexistente é recusado já na requisição (404), não só no flush
+    existing = set(Product.objects.filter(
+        id__in={product_id for _, product_id, _, _, _ in parsed}
+    ).values_list('id', flat=True)) if parsed else set()
+
+    interactions, ratings = [], []
+    for index, product_id, interaction_type, rating, timestamp in parsed:
+        if product_id not in existing:
+            rejected.append({'index': index, 'message': PRODUCT_NOT_FOUND, 'status': 404})
+            continue
+
+        if interaction_type in BUFFERED_TYPES:
+            interactions.append(UserInteraction(
+                user=user,
+                product_id=product_id,
+                interaction_type=interaction_type,
+                timestamp=timestamp,
+            ))
+        else:
+            ratings.append((index, product_id, rating))
+
+    get_buffer().add(interactions)
+
+    accepted = len(interactions)
+    if ratings:
+        products = Product.objects.in_bulk({product_id for _, product_id, _ in ratings})
+        for index, product_id, rating in ratings:
+            product = products.get(product_id)
+            if product is None:
+                rejected.append({'index': index, 'message': PRODUCT_NOT_FOUND, 'status': 404})
+                continue
+            record_interaction(user, product, 'rating', rating=rating)
+            accepted += 1
+
+    return {'accepted': accepted, 'rejected': sorted(rejected, key=lambda item: item['index'])}
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    """Buffer global do processo, criado a partir de settings.INTERACTION_INGESTION"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                config = ingestion_settings()
+                _buffer = InteractionBuffer(
+                    batch_size=config['BATCH_SIZE'],
+                    flush_interval=config['FLUSH_INTERVAL'],
+                    max_size=config['MAX_BUFFER_SIZE'],
+                    durability=config['DURABILITY'],
+                    flush_thread=config['FLUSH_THREAD'],
+                )
+    return _buffer
+
+
+def reset_buffer(flush=False):
+    """Descarta o buffer global (o próximo get_buffer() relê as configurações)"""
+    global _buffer
+    with _buffer_lock:
+        buffer, _buffer = _buffer, None
+    if buffer is not None:
+        buffer.stop(flush=flush)
+
+
+@receiver(setting_changed)
+def _ingestion_settings_changed(setting, **kwargs):
+    if setting == 'INTERACTION_INGESTION':
+        reset_buffer()
+
+
+@atexit.register
+def _flush_on_exit():
+    # Encerramento normal do processo: grava o que ainda estiver no buffer
+    if _buffer is not None and len(_buffer):
+        try:
+            _buffer.stop(flush=True)
+        except Exception:
+            logger.exception('Falha ao gravar o buffer de interações no encerramento')
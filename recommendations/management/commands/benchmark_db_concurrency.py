@@ -0,0 +1,115 @@
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.db.models import Count
+
+from recommendations.models import Product, UserInteraction
+from recommendations.stats import rebuild_product_stats, rebuild_user_stats, record_interaction
+from recommendations.views import with_product_stats
+
+
+def explorer_reads():
+    """Queries de leitura equivalentes às do explorador de produtos"""
+    products = with_product_stats(Product.objects.all())
+    list(products.order_by('-id')[:13])
+    list(products.order_by('-view_count', '-id')[:8])
+    products.count()
+    list(Product.objects.values('category').annotate(total=Count('id')).order_by('category'))
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a vazão de leituras do explorador com escritas de interações concorrentes '
+        '(as interações criadas são removidas ao final, a menos que --keep seja usado)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--duration', type=float, default=10.0, help='Duração em segundos')
+        parser.add_argument('--readers', type=int, default=4, help='Threads de leitura')
+        parser.add_argument('--writers', type=int, default=2, help='Threads registrando interações')
+        parser.add_argument('--keep', action='store_true', help='Mantém as interações criadas')
+
+    def handle(self, *args, **options):
+        product_ids = list(Product.objects.values_list('id', flat=True))
+        user_ids = list(User.objects.values_list('id', flat=True))
+        if not product_ids or not user_ids:
+            raise CommandError('Banco sem produtos ou usuários (rode populate_sample_data)')
+
+        read_alias = router.db_for_read(Product)
+        connection = connections[DEFAULT_DB_ALIAS]
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                journal_mode = cursor.fetchone()[0]
+            self.stdout.write(f'📋 SQLite journal_mode={journal_mode}, leituras em "{read_alias}"')
+
+        deadline = time.monotonic() + options['duration']
+        results = {'reads': 0, 'writes': 0, 'errors': 0, 'read_time': 0.0}
+        created = []
+        lock = threading.Lock()
+
+        def reader():
+            try:
+                while time.monotonic() < deadline:
+                    start = time.perf_counter()
+                    try:
+                        explorer_reads()
+                    except Exception:
+                        with lock:
+                            results['errors'] += 1
+                        continue
+                    with lock:
+                        results['reads'] += 1
+                        results['read_time'] += time.perf_counter() - start
+            finally:
+                connections.close_all()
+
+        def writer():
+            users = {user.id: user for user in User.objects.filter(id__in=user_ids)}
+            products = {product.id: product for product in Product.objects.filter(id__in=product_ids)}
+            try:
+                while time.monotonic() < deadline:
+                    try:
+                        interaction, _ = record_interaction(
+                            users[random.choice(user_ids)],
+                            products[random.choice(product_ids)],
+                            'view',
+                        )
+                    except Exception:
+                        with lock:
+                            results['errors'] += 1
+                        continue
+                    with lock:
+                        results['writes'] += 1
+                        created.append(interaction)
+            finally:
+                connections.close_all()
+
+        threads = (
+            [threading.Thread(target=reader) for _ in range(options['readers'])] +
+            [threading.Thread(target=writer) for _ in range(options['writers'])]
+        )
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        duration = options['duration']
+        average_ms = results['read_time'] / results['reads'] * 1000 if results['reads'] else 0
+        self.stdout.write(
+            f'📊 Leituras: {results["reads"]} ({results["reads"] / duration:.1f}/s, '
+            f'média {average_ms:.1f} ms) | Escritas: {results["writes"]} '
+            f'({results["writes"] / duration:.1f}/s) | Erros: {results["errors"]}'
+        )
+
+        if created and not options['keep']:
+            UserInteraction.objects.filter(id__in=[interaction.id for interaction in created]).delete()
+            rebuild_product_stats({interaction.product_id for interaction in created})
+            rebuild_user_stats({interaction.user_id for interaction in created})
+            self.stdout.write(f'🧹 {len(created)} interações do benchmark removidas')
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark concluído'))
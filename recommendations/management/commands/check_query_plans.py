@@ -0,0 +1,38 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.models import UserInteraction
+from recommendations.query_plans import find_full_scans, query_plans
+
+
+class Command(BaseCommand):
+    help = (
+        'Roda os caminhos principais das views (numa transação desfeita), captura o SQL '
+        'executado e falha se alguma query fizer full table scan em UserInteraction'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='ID de usuário usado nas queries (padrão: o de uma interação qualquer)')
+        parser.add_argument('--product', type=int, help='ID de produto usado nas queries')
+
+    def handle(self, *args, **options):
+        sample = UserInteraction.objects.order_by().values('user_id', 'product_id').first() or {}
+        user_id = options['user'] or sample.get('user_id')
+        product_id = options['product'] or sample.get('product_id')
+        if not (user_id and product_id):
+            raise CommandError('Sem interações no banco: informe --user e --product')
+
+        try:
+            if options['verbosity'] >= 2:
+                for name, sql, plan in query_plans(user_id, product_id):
+                    self.stdout.write(f'\n📋 {name}\n{sql}\n{plan}')
+            offenders = find_full_scans(user_id, product_id)
+        except ObjectDoesNotExist as exc:
+            raise CommandError(str(exc))
+        if offenders:
+            for name, queries in offenders.items():
+                for sql, plan in queries:
+                    self.stderr.write(f'\n❌ {name}\n{sql}\n{plan}')
+            raise CommandError(f'{len(offenders)} caminhos fazem full table scan em UserInteraction')
+
+        self.stdout.write(self.style.SUCCESS('✅ Todas as queries principais usam índices'))
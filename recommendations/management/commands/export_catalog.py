@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.bulk_io import BATCH_SIZE, FORMATS, PRODUCT_FIELDS, detect_format, export_rows, open_stream
+from recommendations.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Exporta os produtos para CSV ou JSON lines em streaming (formato aceito pelo import_catalog)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo de saída (- escreve na saída padrão)')
+        parser.add_argument('--format', choices=FORMATS, help='Formato do arquivo (padrão: pela extensão)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Linhas lidas do banco por bloco')
+        parser.add_argument('--category', help='Exporta só uma categoria')
+
+    def handle(self, *args, **options):
+        # Com a saída padrão ocupada pelos dados, as mensagens vão para stderr
+        output = self.stderr if options['path'] == '-' else self.stdout
+        queryset = Product.objects.all()
+        if options['category']:
+            queryset = queryset.filter(category=options['category'])
+
+        try:
+            format = detect_format(options['path'], options['format'])
+            with open_stream(options['path'], 'w') as stream:
+                result = export_rows(
+                    stream, format, queryset, PRODUCT_FIELDS,
+                    batch_size=options['batch_size'],
+                    on_progress=lambda written, elapsed: output.write(
+                        f'📦 {written} produtos ({written / elapsed:.0f} linhas/s)'
+                    ),
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        elapsed = result['elapsed']
+        output.write(self.style.SUCCESS(
+            f'✅ {result["written"]} produtos exportados em {elapsed:.1f}s '
+            f'({result["written"] / elapsed if elapsed else 0:.0f} linhas/s)'
+        ))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.bulk_io import BATCH_SIZE, FORMATS, INTERACTION_FIELDS, detect_format, export_rows, open_stream
+from recommendations.models import UserInteraction
+
+
+class Command(BaseCommand):
+    help = 'Exporta as interações para CSV ou JSON lines em streaming (formato aceito pelo import_interactions)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo de saída (- escreve na saída padrão)')
+        parser.add_argument('--format', choices=FORMATS, help='Formato do arquivo (padrão: pela extensão)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Linhas lidas do banco por bloco')
+        parser.add_argument('--category', help='Exporta só as interações com produtos de uma categoria')
+
+    def handle(self, *args, **options):
+        # Com a saída padrão ocupada pelos dados, as mensagens vão para stderr
+        output = self.stderr if options['path'] == '-' else self.stdout
+        queryset = UserInteraction.objects.all()
+        if options['category']:
+            queryset = queryset.filter(product__category=options['category'])
+
+        try:
+            format = detect_format(options['path'], options['format'])
+            with open_stream(options['path'], 'w') as stream:
+                result = export_rows(
+                    stream, format, queryset, INTERACTION_FIELDS,
+                    batch_size=options['batch_size'],
+                    on_progress=lambda written, elapsed: output.write(
+                        f'📊 {written} interações ({written / elapsed:.0f} linhas/s)'
+                    ),
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        elapsed = result['elapsed']
+        output.write(self.style.SUCCESS(
+            f'✅ {result["written"]} interações exportadas em {elapsed:.1f}s '
+            f'({result["written"] / elapsed if elapsed else 0:.0f} linhas/s)'
+        ))
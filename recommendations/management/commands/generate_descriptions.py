@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.ai_generator import AIGenerator
+from recommendations.bulk_generation import (
+    BulkDescriptionGenerator, active_job, products_needing_description, resumable_job,
+)
+from recommendations.models import DescriptionGenerationJob
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera descrições com IA para os produtos sem descrição, em paralelo e com '
+        'checkpoint (continua a última execução interrompida)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Threads gerando descrições ao mesmo tempo')
+        parser.add_argument('--rate', type=float, help='Chamadas à API por segundo')
+        parser.add_argument('--burst', type=int, help='Rajada máxima de chamadas')
+        parser.add_argument('--chunk-size', type=int, help='Produtos por lote gravado (checkpoint)')
+        parser.add_argument('--batch-size', type=int, help='Produtos por chamada à API (1 = um por chamada)')
+        parser.add_argument('--limit', type=int, help='Máximo de produtos nesta execução')
+        parser.add_argument('--new', action='store_true', help='Ignora execuções interrompidas e começa do zero')
+
+    def handle(self, *args, **options):
+        if active_job() is not None:
+            raise CommandError('Já existe uma geração em lote em execução')
+
+        job = None if options['new'] else resumable_job()
+        if job is not None:
+            self.stdout.write(f'↩️  Continuando a execução #{job.pk} ({job.processed}/{job.total})')
+        else:
+            if not products_needing_description().exists():
+                self.stdout.write(self.style.SUCCESS('✅ Nenhum produto sem descrição'))
+                return
+            job = DescriptionGenerationJob.objects.create(limit=options['limit'])
+            self.stdout.write(f'🚀 Nova execução #{job.pk}')
+
+        engine = BulkDescriptionGenerator(
+            job,
+            AIGenerator(),
+            workers=options['workers'],
+            rate_per_second=options['rate'],
+            burst=options['burst'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+            on_progress=lambda job: self.stdout.write(
+                f'📊 {job.processed}/{job.total} ({job.progress}%) - {job.failed} falhas'
+            ),
+        )
+
+        try:
+            job = engine.run()
+        except KeyboardInterrupt:
+            raise CommandError(f'Interrompido: rode o comando de novo para continuar a execução #{job.pk}')
+
+        if job.status == 'failed':
+            raise CommandError(f'Execução #{job.pk} falhou: {job.error}')
+        if job.status == 'interrupted':
+            self.stdout.write(self.style.WARNING(f'⏸️  Execução #{job.pk} interrompida em {job.processed}/{job.total}'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {job.succeeded} descrições geradas ({job.failed} falhas) na execução #{job.pk}'
+        ))
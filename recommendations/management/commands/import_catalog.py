@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.bulk_io import (
+    BATCH_SIZE, FORMATS, detect_format, import_rows, open_stream, parse_product, reset_sequences, upsert_products,
+)
+from recommendations.catalog_cache import bump_catalog_version
+from recommendations.categories import rebuild_category_stats
+from recommendations.models import Product
+from recommendations.related import invalidate_related_products
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa produtos de um arquivo CSV ou JSON lines em streaming, com upsert pelo id '
+        '(bulk_create com update_conflicts, uma transação por lote)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo de entrada (- lê da entrada padrão)')
+        parser.add_argument('--format', choices=FORMATS, help='Formato do arquivo (padrão: pela extensão)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Linhas por lote (uma transação por lote)')
+
+    def handle(self, *args, **options):
+        try:
+            format = detect_format(options['path'], options['format'])
+            with open_stream(options['path'], 'r') as stream:
+                result = import_rows(
+                    stream, format, parse_product, upsert_products,
+                    batch_size=options['batch_size'],
+                    on_progress=lambda written, skipped, elapsed: self.stdout.write(
+                        f'📦 {written} produtos ({written / elapsed:.0f} linhas/s) - {skipped} ignorados'
+                    ),
+                    on_error=lambda line, message: self.stdout.write(
+                        self.style.WARNING(f'⚠️  Linha {line} ignorada: {message}')
+                    ),
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        finally:
+            reset_sequences(Product)
+
+        # bulk_create não dispara sinais: categorias e caches do catálogo
+        rebuild_category_stats()
+        invalidate_related_products()
+        bump_catalog_version()
+
+        elapsed = result['elapsed']
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {result["written"]} produtos importados em {elapsed:.1f}s '
+            f'({result["written"] / elapsed if elapsed else 0:.0f} linhas/s) - {result["skipped"]} linhas ignoradas'
+        ))
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.bulk_io import (
+    BATCH_SIZE, FORMATS, detect_format, import_rows, open_stream, parse_interaction, reset_sequences,
+    upsert_interactions,
+)
+from recommendations.catalog_cache import bump_catalog_version
+from recommendations.models import UserInteraction
+from recommendations.related import invalidate_related_products
+from recommendations.stats import rebuild_product_stats, rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa o histórico de interações de um arquivo CSV ou JSON lines em streaming, com '
+        'upsert pelo id (bulk_create com update_conflicts, uma transação por lote)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo de entrada (- lê da entrada padrão)')
+        parser.add_argument('--format', choices=FORMATS, help='Formato do arquivo (padrão: pela extensão)')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Linhas por lote (uma transação por lote)')
+        parser.add_argument('--skip-stats', action='store_true',
+                            help='Não recalcula ProductStats/CategoryStats/UserStats ao final '
+                                 '(depois: rebuild_product_stats e rebuild_user_stats)')
+
+    def handle(self, *args, **options):
+        touched = {'users': set(), 'products': set()}
+        try:
+            format = detect_format(options['path'], options['format'])
+            with open_stream(options['path'], 'r') as stream:
+                result = import_rows(
+                    stream, format, parse_interaction,
+                    lambda interactions: upsert_interactions(interactions, touched),
+                    batch_size=options['batch_size'],
+                    on_progress=lambda written, skipped, elapsed: self.stdout.write(
+                        f'📊 {written} interações ({written / elapsed:.0f} linhas/s) - {skipped} ignoradas'
+                    ),
+                    on_error=lambda line, message: self.stdout.write(
+                        self.style.WARNING(f'⚠️  Linha {line} ignorada: {message}')
+                    ),
+                )
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+        finally:
+            reset_sequences(UserInteraction)
+
+        elapsed = result['elapsed']
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {result["written"]} interações importadas em {elapsed:.1f}s '
+            f'({result["written"] / elapsed if elapsed else 0:.0f} linhas/s) - {result["skipped"]} linhas ignoradas '
+            f'(inválidas ou de usuário/produto inexistente)'
+        ))
+
+        # bulk_create não passa por record_interaction: recalcula as estatísticas
+        # só dos usuários e produtos que o arquivo tocou
+        if not options['skip_stats']:
+            self.stdout.write(
+                f'🔄 Recalculando estatísticas de {len(touched["products"])} produtos '
+                f'e {len(touched["users"])} usuários...'
+            )
+            rebuild_product_stats(touched['products'])
+            rebuild_user_stats(touched['users'])
+        invalidate_related_products()
+        bump_catalog_version()
@@ -0,0 +1,192 @@
+import asyncio
+import json
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import AsyncRequestFactory
+
+from recommendations import views
+from recommendations.ai_generator import AIGenerator
+from recommendations.ai_providers import FakeProvider
+from recommendations.bulk_generation import BulkDescriptionGenerator, generation_settings
+from recommendations.models import DescriptionGenerationJob, Product
+
+
+def percentile(values, pct):
+    """Percentil (nearest-rank) de uma lista de números"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+class TimedGenerator:
+    """Mede a latência de cada chamada da geração em lote ao gerador (um produto ou um lote)"""
+
+    def __init__(self, generator):
+        self.generator = generator
+        self.latencies = []
+        self.lock = threading.Lock()
+
+    def request_product_description(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.generator.request_product_description(*args, **kwargs)
+        finally:
+            with self.lock:
+                self.latencies.append(time.perf_counter() - start)
+
+    def generate_product_descriptions_batch(self, products):
+        start = time.perf_counter()
+        try:
+            return self.generator.generate_product_descriptions_batch(products)
+        finally:
+            with self.lock:
+                self.latencies.append(time.perf_counter() - start)
+
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga das gerações com IA contra o provedor fake (sem rede e sem custo): '
+        'chama a API generate_description_api em paralelo e roda a geração em lote '
+        '(numa transação desfeita ao final), reportando vazão e latências'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Chamadas à API de descrição')
+        parser.add_argument('--concurrency', type=int, default=20, help='Chamadas à API em paralelo')
+        parser.add_argument('--bulk-products', type=int, default=100, help='Produtos na geração em lote (0 pula)')
+        parser.add_argument('--workers', type=int, help='Workers da geração em lote')
+        parser.add_argument('--rate', type=float, help='Chamadas por segundo da geração em lote')
+        parser.add_argument('--batch-size', type=int, help='Produtos por chamada na geração em lote')
+        parser.add_argument('--latency', type=float, help='Mediana da latência do provedor fake (s)')
+        parser.add_argument('--latency-sigma', type=float, help='Cauda da latência (sigma da log-normal)')
+        parser.add_argument('--tokens-per-second', type=float, help='Ritmo de geração do provedor fake')
+        parser.add_argument('--output-tokens', type=int, help='Tokens por resposta')
+        parser.add_argument('--error-rate', type=float, help='Fração de respostas com erro')
+        parser.add_argument('--seed', type=int, help='Semente (execuções repetíveis)')
+
+    def handle(self, *args, **options):
+        overrides = {
+            key: options[option]
+            for key, option in [
+                ('LATENCY_MEDIAN', 'latency'),
+                ('LATENCY_SIGMA', 'latency_sigma'),
+                ('TOKENS_PER_SECOND', 'tokens_per_second'),
+                ('OUTPUT_TOKENS', 'output_tokens'),
+                ('ERROR_RATE', 'error_rate'),
+                ('SEED', 'seed'),
+            ]
+            if options[option] is not None
+        }
+        provider = FakeProvider.from_settings(**overrides)
+        generator = AIGenerator(provider=provider)
+        config = provider.config
+        self.stdout.write(
+            f'🧪 Provedor fake: latência mediana {config["LATENCY_MEDIAN"]}s '
+            f'(sigma {config["LATENCY_SIGMA"]}), {config["TOKENS_PER_SECOND"]} tokens/s, '
+            f'{config["OUTPUT_TOKENS"]} tokens, erros {config["ERROR_RATE"]:.0%}'
+        )
+
+        if options['requests'] > 0:
+            self.api_load_test(generator, options['requests'], options['concurrency'])
+        if options['bulk_products'] > 0:
+            self.bulk_load_test(generator, options)
+
+        self.stdout.write(
+            f'📡 Chamadas ao provedor: {provider.calls} ({provider.errors} erros simulados, '
+            f'respondidos com o fallback criativo)'
+        )
+        self.stdout.write(self.style.SUCCESS('✅ Teste de carga concluído'))
+
+    def report(self, label, count, elapsed, latencies, failures=0):
+        self.stdout.write(
+            f'📊 {label}: {count} em {elapsed:.2f}s ({count / elapsed if elapsed else 0:.1f}/s) | '
+            f'p50 {percentile(latencies, 50) * 1000:.0f} ms, '
+            f'p95 {percentile(latencies, 95) * 1000:.0f} ms, '
+            f'p99 {percentile(latencies, 99) * 1000:.0f} ms, '
+            f'máx {max(latencies, default=0) * 1000:.0f} ms | Falhas: {failures}'
+        )
+
+    def api_load_test(self, generator, total, concurrency):
+        """Chama a view generate_description_api (async) com `concurrency` requisições em paralelo"""
+        factory = AsyncRequestFactory()
+        # Usuário em memória: passa pelo login_required sem criar sessão no banco
+        user = User(username='load-test')
+
+        async def auser():
+            return user
+
+        async def call(index, semaphore, latencies, failures):
+            async with semaphore:
+                request = factory.post(
+                    '/api/generate-description/',
+                    json.dumps({
+                        'product_name': f'Produto de carga {index}',
+                        'category': 'Eletrônicos',
+                        'price': '199.90',
+                    }),
+                    content_type='application/json',
+                )
+                request.user = user
+                request.auser = auser
+                start = time.perf_counter()
+                response = await views.generate_description_api(request)
+                latencies.append(time.perf_counter() - start)
+                if json.loads(response.content).get('status') != 'success':
+                    failures.append(index)
+
+        async def run():
+            semaphore = asyncio.Semaphore(concurrency)
+            latencies = []
+            failures = []
+            start = time.perf_counter()
+            await asyncio.gather(*[call(index, semaphore, latencies, failures) for index in range(total)])
+            return time.perf_counter() - start, latencies, failures
+
+        original = views.ai_generator
+        views.ai_generator = generator
+        try:
+            elapsed, latencies, failures = asyncio.run(run())
+        finally:
+            views.ai_generator = original
+        self.report(f'API de descrição (concorrência {concurrency})', total, elapsed, latencies, len(failures))
+
+    def bulk_load_test(self, generator, options):
+        """Geração em lote de N produtos, com as descrições apagadas e restauradas (rollback)"""
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True)[:options['bulk_products']])
+        if not product_ids:
+            raise CommandError('Banco sem produtos (rode populate_sample_data)')
+
+        timed = TimedGenerator(generator)
+        config = generation_settings()
+        provider = generator.provider
+        calls, tokens = provider.calls, provider.prompt_tokens + provider.completion_tokens
+        with transaction.atomic():
+            Product.objects.filter(id__in=product_ids).update(description='')
+            job = DescriptionGenerationJob.objects.create(limit=len(product_ids))
+            engine = BulkDescriptionGenerator(
+                job, timed, workers=options['workers'], rate_per_second=options['rate'],
+                batch_size=options['batch_size'],
+            )
+            start = time.perf_counter()
+            job = engine.run()
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+
+        self.report(
+            f'Geração em lote ({options["workers"] or config["WORKERS"]} workers, '
+            f'{options["rate"] or config["RATE_PER_SECOND"]}/s, '
+            f'{options["batch_size"] or config["BATCH_SIZE"]} por chamada)',
+            job.processed, elapsed, timed.latencies, job.failed,
+        )
+        calls, tokens = provider.calls - calls, provider.prompt_tokens + provider.completion_tokens - tokens
+        self.stdout.write(
+            f'🔢 {calls} chamadas ao provedor, ~{tokens / max(1, job.processed):.0f} tokens por produto '
+            f'(latências acima por chamada)'
+        )
+        self.stdout.write('↩️  Descrições originais restauradas (transação desfeita)')
@@ -1,93 +1,193 @@
-import pandas as pd
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import itertools
 import random
+import time
+from datetime import timedelta
+from decimal import Decimal
 
-class SimpleRecommender:
-    def __init__(self):
-        self.content_vectorizer = TfidfVectorizer(max_features=500, stop_words='english')
-        self.is_trained = False
-        
-    def prepare_product_features(self, products):
-        """Prepara features dos produtos para content-based filtering"""
-        product_features = []
-        product_ids = []
-        
-        for product in products:
-            # Combina nome, descrição e categoria
-            text_features = f"{product.name} {product.description} {product.category}"
-            product_features.append(text_features)
-            product_ids.append(product.id)
-            
-        return product_features, product_ids
-    
-    def train(self, products, interactions):
-        """Treina o modelo simplificado"""
-        print("🔄 Treinando modelo simplificado de recomendações...")
-        
-        # Content-based features apenas
-        product_features, product_ids = self.prepare_product_features(products)
-        
-        if product_features:
-            self.content_matrix = self.content_vectorizer.fit_transform(product_features)
-            self.product_ids = product_ids
-        else:
-            self.content_matrix = None
-            
-        self.is_trained = True
-        print("✅ Modelo simplificado treinado com sucesso!")
-        return True
-    
-    def recommend_for_user(self, user, products, top_n=6):
-        """Recomendações simplificadas baseadas em conteúdo"""
-        if not self.is_trained or not hasattr(self, 'content_matrix') or self.content_matrix is None:
-            return self._get_random_recommendations(products, top_n)
-            
-        try:
-            # Import aqui para evitar circular imports
-            from ..models import UserInteraction
-            
-            # Calcula similaridade entre produtos
-            content_sim = cosine_similarity(self.content_matrix)
-            
-            # Pega produtos que o usuário já interagiu
-            user_interactions = UserInteraction.objects.filter(user=user)
-            interacted_product_ids = [interaction.product_id for interaction in user_interactions]
-            
-            if interacted_product_ids:
-                # Baseado nos produtos que usuário já viu
-                scores = np.mean(content_sim[[self.product_ids.index(pid) for pid in interacted_product_ids if pid in self.product_ids]], axis=0)
-            else:
-                # Se não tem interações, use produtos diversos
-                scores = np.ones(len(products)) * 0.5
-                
-            # Adiciona diversidade
-            diversity_boost = np.random.rand(len(products)) * 0.3
-            final_scores = scores + diversity_boost
-            
-            # Ordena por score
-            product_scores = list(zip(products, final_scores))
-            product_scores.sort(key=lambda x: x[1], reverse=True)
-            
-            recommended = [product for product, score in product_scores[:top_n]]
-            
-            # Garante que temos recomendações suficientes
-            if len(recommended) < top_n:
-                remaining = [p for p in products if p not in recommended]
-                recommended.extend(random.sample(remaining, min(top_n - len(recommended), len(remaining))))
-            
-            return recommended
-            
-        except Exception as e:
-            print(f"❌ Erro em recomendações: {e}")
-            return self._get_random_recommendations(products, top_n)
-    
-    def _get_random_recommendations(self, products, top_n):
-        """Recomendações aleatórias de fallback"""
-        if not products:
-            return []
-        return random.sample(list(products), min(top_n, len(products)))
-
-# Instância global do recomendador
-recommender = SimpleRecommender()
\ No newline at end of file
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from recommendations.catalog_cache import bump_catalog_version
+from recommendations.models import Product, UserInteraction
+from recommendations.related import invalidate_related_products
+from recommendations.stats import rebuild_product_stats, rebuild_user_stats
+
+# Categoria: (nomes, adjetivos, faixa de preço)
+CATALOG = {
+    'Eletrônicos': (['Fone Bluetooth', 'Smartwatch', 'Caixa de Som', 'Carregador Portátil', 'Teclado Mecânico', 'Mouse Sem Fio'],
+                    ['Pro', 'Lite', 'Max', 'Plus', 'Mini'], (49, 2499)),
+    'Livros': (['Romance', 'Guia Prático', 'Biografia', 'Livro de Receitas', 'Ficção Científica', 'Manual'],
+               ['Edição Especial', 'de Bolso', 'Ilustrado', 'Capa Dura', 'Volume 2'], (19, 159)),
+    'Roupas': (['Camiseta', 'Jaqueta', 'Calça Jeans', 'Moletom', 'Vestido', 'Bermuda'],
+               ['Básica', 'Slim', 'Oversized', 'Esportiva', 'Algodão'], (39, 399)),
+    'Casa': (['Luminária', 'Jogo de Panelas', 'Cafeteira', 'Organizador', 'Tapete', 'Jogo de Cama'],
+             ['Compacta', 'Premium', 'Inox', 'Retrô', 'Moderna'], (29, 899)),
+    'Esportes': (['Tênis de Corrida', 'Garrafa Térmica', 'Tapete de Yoga', 'Mochila', 'Halteres', 'Bicicleta'],
+                 ['Performance', 'Leve', 'Trail', 'Urbana', 'Pro'], (29, 2999)),
+    'Beleza': (['Perfume', 'Hidratante', 'Protetor Solar', 'Secador', 'Kit Maquiagem', 'Shampoo'],
+               ['Natural', 'Vegano', 'Intenso', 'Sensível', 'Travel'], (19, 599)),
+}
+
+# Mistura de interações (funil: muita visualização, pouca compra)
+INTERACTION_MIX = (('view', 0.80), ('click', 0.13), ('purchase', 0.03), ('rating', 0.04))
+RATING_WEIGHTS = ((1, 0.05), (2, 0.07), (3, 0.15), (4, 0.33), (5, 0.40))
+
+USER_PREFIX = 'amostra_'
+
+
+def power_law_cum_weights(size, exponent):
+    """Pesos acumulados de uma lei de potência (Zipf): o item de rank r tem peso 1 / r^exponent"""
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, size + 1)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Gera dados sintéticos para benchmarks: produtos em várias categorias, usuários e '
+        'interações com popularidade em lei de potência, gravados em lotes com bulk_create'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000, help='Produtos a criar')
+        parser.add_argument('--users', type=int, default=200, help='Usuários a criar')
+        parser.add_argument('--interactions', type=int, default=50000, help='Interações a criar')
+        parser.add_argument('--days', type=int, default=180, help='Período das interações (dias até hoje)')
+        parser.add_argument('--popularity-exponent', type=float, default=1.1,
+                            help='Expoente da lei de potência da popularidade dos produtos')
+        parser.add_argument('--activity-exponent', type=float, default=0.8,
+                            help='Expoente da lei de potência da atividade dos usuários')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Linhas por lote (uma transação por lote)')
+        parser.add_argument('--seed', type=int, help='Semente (dados repetíveis)')
+        parser.add_argument('--skip-stats', action='store_true',
+                            help='Não recalcula ProductStats/CategoryStats/UserStats ao final '
+                                 '(depois: rebuild_product_stats e rebuild_user_stats)')
+
+    def handle(self, *args, **options):
+        if options['interactions'] and not (options['products'] and options['users']):
+            raise CommandError('Interações precisam de --products e --users maiores que zero')
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        start = time.perf_counter()
+
+        product_ids = self.create_products(options['products'])
+        user_ids = self.create_users(options['users'])
+        created = self.create_interactions(product_ids, user_ids, options)
+
+        if not options['skip_stats']:
+            self.stdout.write('🔄 Recalculando estatísticas...')
+            rebuild_product_stats()
+            rebuild_user_stats()
+        invalidate_related_products()
+        bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {len(product_ids)} produtos, {len(user_ids)} usuários e {created} interações '
+            f'em {time.perf_counter() - start:.1f}s'
+        ))
+
+    def insert(self, model, objects):
+        """bulk_create de um lote numa única transação; retorna os ids criados"""
+        with transaction.atomic():
+            created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        return [obj.pk for obj in created]
+
+    def batches(self, total):
+        for offset in range(0, total, self.batch_size):
+            yield offset, min(self.batch_size, total - offset)
+
+    def create_products(self, total):
+        categories = list(CATALOG)
+        ids = []
+        for offset, size in self.batches(total):
+            products = []
+            for number in range(offset, offset + size):
+                category = categories[number % len(categories)]
+                names, adjectives, (low, high) = CATALOG[category]
+                name = f'{self.rng.choice(names)} {self.rng.choice(adjectives)} {number + 1}'
+                products.append(Product(
+                    name=name,
+                    description=f'{name}: produto de exemplo da categoria {category}.',
+                    category=category,
+                    price=Decimal(self.rng.uniform(low, high)).quantize(Decimal('0.01')),
+                    features={'marca': f'Marca {self.rng.randint(1, 40)}', 'amostra': True},
+                ))
+            ids.extend(self.insert(Product, products))
+
+        if None in ids:
+            # Banco sem RETURNING no bulk_create: os ids são os últimos criados
+            ids = list(Product.objects.order_by('-id').values_list('id', flat=True)[:total])
+        self.stdout.write(f'📦 {total} produtos criados')
+        return ids
+
+    def create_users(self, total):
+        # Um hash só para todos: make_password é lento de propósito
+        password = make_password('amostra-123')
+        start = User.objects.filter(username__startswith=USER_PREFIX).count()
+        ids = []
+        for offset, size in self.batches(total):
+            ids.extend(self.insert(User, [
+                User(username=f'{USER_PREFIX}{start + number + 1}', password=password)
+                for number in range(offset, offset + size)
+            ]))
+
+        if None in ids:
+            ids = list(User.objects.filter(username__startswith=USER_PREFIX).order_by('-id').values_list('id', flat=True)[:total])
+        self.stdout.write(f'👥 {total} usuários criados')
+        return ids
+
+    def create_interactions(self, product_ids, user_ids, options):
+        total = options['interactions']
+        if not total:
+            return 0
+
+        rng = self.rng
+        # Ranks de popularidade/atividade embaralhados: não dependem da ordem dos ids
+        products = rng.sample(product_ids, len(product_ids))
+        users = rng.sample(user_ids, len(user_ids))
+        product_weights = power_law_cum_weights(len(products), options['popularity_exponent'])
+        user_weights = power_law_cum_weights(len(users), options['activity_exponent'])
+        types, type_weights = zip(*INTERACTION_MIX)
+        type_weights = list(itertools.accumulate(type_weights))
+        ratings, rating_weights = zip(*RATING_WEIGHTS)
+        rating_weights = list(itertools.accumulate(rating_weights))
+
+        now = timezone.now()
+        span = options['days'] * 86400
+        rated = set()
+        created = 0
+        start = time.perf_counter()
+
+        for batch_number, (_, size) in enumerate(self.batches(total), 1):
+            batch_products = rng.choices(products, cum_weights=product_weights, k=size)
+            batch_users = rng.choices(users, cum_weights=user_weights, k=size)
+            batch_types = rng.choices(types, cum_weights=type_weights, k=size)
+
+            interactions = []
+            for user_id, product_id, interaction_type in zip(batch_users, batch_products, batch_types):
+                rating = None
+                if interaction_type == 'rating':
+                    # Uma avaliação por usuário e produto (como o upsert de record_interaction)
+                    if (user_id, product_id) in rated:
+                        interaction_type = 'view'
+                    else:
+                        rated.add((user_id, product_id))
+                        rating = rng.choices(ratings, cum_weights=rating_weights)[0]
+                interactions.append(UserInteraction(
+                    user_id=user_id,
+                    product_id=product_id,
+                    interaction_type=interaction_type,
+                    rating=rating,
+                    timestamp=now - timedelta(seconds=rng.random() * span),
+                ))
+
+            with transaction.atomic():
+                UserInteraction.objects.bulk_create(interactions, batch_size=self.batch_size)
+            created += len(interactions)
+            if batch_number % 10 == 0 or created == total:
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f'📊 {created}/{total} interações ({created / elapsed:.0f}/s)')
+
+        return created
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recommendations.stats import rebuild_product_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalcula as tabelas ProductStats e CategoryStats a partir das interações (backfill)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product',
+            type=int,
+            action='append',
+            dest='product_ids',
+            help='ID de produto a recalcular (pode ser repetido). Padrão: todos.',
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_product_stats(options['product_ids'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Estatísticas recalculadas para {total} produtos'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recommendations.related import rebuild_related_products
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói as listas pré-calculadas de produtos relacionados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product',
+            type=int,
+            action='append',
+            dest='product_ids',
+            help='ID de produto a reconstruir (pode ser repetido). Padrão: todos.',
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_related_products(options['product_ids'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Produtos relacionados reconstruídos para {total} produtos'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from recommendations.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a tabela UserStats (dashboard) a partir das interações'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='user_ids',
+            help='ID de usuário a recalcular (pode ser repetido). Padrão: todos com interações.',
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_user_stats(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f'✅ Estatísticas recalculadas para {total} usuários'))
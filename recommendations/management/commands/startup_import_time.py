@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from recommendations.startup import measure_startup, startup_budget
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede o tempo de importação na inicialização (django.setup() + URLconf) com '
+        'python -X importtime e falha se passar do orçamento STARTUP_IMPORT_BUDGET'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=15, help='Módulos de primeiro nível listados')
+        parser.add_argument('--budget', type=float, help='Orçamento em segundos (padrão: STARTUP_IMPORT_BUDGET)')
+        parser.add_argument('--import', dest='imports', action='append', default=[],
+                            help='Módulo extra a importar (pode repetir)')
+
+    def handle(self, *args, **options):
+        report = measure_startup(options['imports'])
+        budget = options['budget'] or startup_budget()
+
+        self.stdout.write(f'⏱️  Importação na inicialização: {report["total"] * 1000:.0f} ms (orçamento {budget * 1000:.0f} ms)')
+        for name, self_time, cumulative, _ in report['modules'][:options['top']]:
+            self.stdout.write(f'   {cumulative * 1000:8.1f} ms  (próprio {self_time * 1000:6.1f} ms)  {name}')
+
+        if report['heavy']:
+            self.stdout.write(self.style.WARNING(
+                f'⚠️  Bibliotecas pesadas importadas na inicialização: {", ".join(report["heavy"])}'
+            ))
+        if report['total'] > budget:
+            raise CommandError(f'Inicialização acima do orçamento: {report["total"]:.2f}s > {budget:.2f}s')
+        self.stdout.write(self.style.SUCCESS('✅ Dentro do orçamento'))
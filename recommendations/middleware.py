@@ -0,0 +1,119 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+# Contador da requisição em andamento. O sync_to_async copia o contexto para a
+# thread que executa o ORM, então as queries das views async também são contadas.
+_current_counter = ContextVar('db_query_counter', default=None)
+
+
+class QueryCounter:
+    """
+    Wrapper de execução que conta as queries SQL e o tempo gasto no banco.
+    Pode ser usado como execute_wrapper em qualquer conexão do Django.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+def count_query(execute, sql, params, many, context):
+    """execute_wrapper fixo das conexões: repassa ao contador da requisição atual, se houver"""
+    counter = _current_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+def install_query_counter(connection):
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+@receiver(connection_created)
+def _install_on_new_connection(sender, connection, **kwargs):
+    # Conexões abertas em qualquer thread (inclusive as do sync_to_async)
+    install_query_counter(connection)
+
+
+@receiver(request_started)
+def _install_on_request_thread(sender, **kwargs):
+    # Conexões já abertas na thread da requisição (no ASGI o sinal roda na
+    # mesma thread do sync_to_async das views)
+    for alias in connections:
+        install_query_counter(connections[alias])
+
+
+class QueryCountMiddleware:
+    """
+    Registra o número de queries SQL e o tempo de banco de cada requisição.
+
+    Os valores são expostos nos headers X-DB-Query-Count e X-DB-Query-Time
+    (em milissegundos) e registrados no log. Requisições acima de
+    QUERY_COUNT_WARNING_THRESHOLD geram um warning para facilitar a
+    identificação de problemas N+1.
+
+    Funciona em modo síncrono e assíncrono, para não forçar as views async
+    a rodarem numa thread: o contador fica numa ContextVar e o wrapper de
+    execução é instalado em cada conexão, de qualquer thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.warning_threshold = getattr(settings, 'QUERY_COUNT_WARNING_THRESHOLD', 30)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        counter = QueryCounter()
+        token = _current_counter.set(counter)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_counter.reset(token)
+        return self._finish(request, response, counter)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        token = _current_counter.set(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_counter.reset(token)
+        return self._finish(request, response, counter)
+
+    def _finish(self, request, response, counter):
+        duration_ms = counter.duration * 1000
+        response['X-DB-Query-Count'] = str(counter.count)
+        response['X-DB-Query-Time'] = f'{duration_ms:.2f}'
+
+        log = logger.warning if counter.count > self.warning_threshold else logger.debug
+        log(
+            '%s %s: %d queries em %.2f ms',
+            request.method, request.path, counter.count, duration_ms,
+        )
+        return response
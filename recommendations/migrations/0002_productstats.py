@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+
+def fill_product_stats(apps, schema_editor):
+    """Mesmas agregações de stats._rebuild_product_stats, para bancos que já têm interações"""
+    Product = apps.get_model('recommendations', 'Product')
+    ProductStats = apps.get_model('recommendations', 'ProductStats')
+    aggregates = Product.objects.annotate(
+        total_views=Count('userinteraction', filter=Q(userinteraction__interaction_type='view')),
+        total_wishlist=Count('userinteraction', filter=Q(userinteraction__interaction_type='wishlist')),
+        total_rating_sum=Sum('userinteraction__rating', filter=Q(userinteraction__interaction_type='rating')),
+        total_rating_count=Count(
+            'userinteraction',
+            filter=Q(userinteraction__interaction_type='rating', userinteraction__rating__isnull=False)
+        ),
+        last_interaction=Max('userinteraction__timestamp'),
+    ).values_list(
+        'id', 'total_views', 'total_wishlist', 'total_rating_sum', 'total_rating_count', 'last_interaction'
+    ).order_by()
+    ProductStats.objects.bulk_create([
+        ProductStats(
+            product_id=product_id,
+            view_count=views,
+            wishlist_count=wishlist,
+            rating_sum=rating_sum or 0,
+            rating_count=rating_count,
+            last_interaction_at=last_interaction,
+        )
+        for product_id, views, wishlist, rating_sum, rating_count, last_interaction in aggregates.iterator()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStats',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='recommendations.product', verbose_name='Produto')),
+                ('view_count', models.PositiveIntegerField(default=0, verbose_name='Visualizações')),
+                ('wishlist_count', models.PositiveIntegerField(default=0, verbose_name='Lista de Desejos')),
+                ('rating_sum', models.PositiveIntegerField(default=0, verbose_name='Soma das Avaliações')),
+                ('rating_count', models.PositiveIntegerField(default=0, verbose_name='Número de Avaliações')),
+                ('last_interaction_at', models.DateTimeField(blank=True, null=True, verbose_name='Última Interação')),
+            ],
+            options={
+                'verbose_name': 'Estatística do Produto',
+                'verbose_name_plural': 'Estatísticas dos Produtos',
+            },
+        ),
+        migrations.RunPython(fill_product_stats, migrations.RunPython.noop),
+    ]
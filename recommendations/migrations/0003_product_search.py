@@ -0,0 +1,91 @@
+from django.db import migrations
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE recommendations_product_fts USING fts5(
+        name, description, category,
+        content='recommendations_product',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER recommendations_product_fts_ai AFTER INSERT ON recommendations_product BEGIN
+        INSERT INTO recommendations_product_fts(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER recommendations_product_fts_ad AFTER DELETE ON recommendations_product BEGIN
+        INSERT INTO recommendations_product_fts(recommendations_product_fts, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER recommendations_product_fts_au
+    AFTER UPDATE OF name, description, category ON recommendations_product BEGIN
+        INSERT INTO recommendations_product_fts(recommendations_product_fts, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO recommendations_product_fts(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+    END
+    """,
+    "INSERT INTO recommendations_product_fts(recommendations_product_fts) VALUES ('rebuild')",
+]
+
+SQLITE_REVERSE = [
+    'DROP TRIGGER IF EXISTS recommendations_product_fts_au',
+    'DROP TRIGGER IF EXISTS recommendations_product_fts_ad',
+    'DROP TRIGGER IF EXISTS recommendations_product_fts_ai',
+    'DROP TABLE IF EXISTS recommendations_product_fts',
+]
+
+POSTGRES_FORWARD = [
+    """
+    CREATE INDEX IF NOT EXISTS recommendations_product_search_gin ON recommendations_product
+    USING GIN (to_tsvector('portuguese'::regconfig,
+        COALESCE(name, '') || ' ' || COALESCE(description, '') || ' ' || COALESCE(category, '')))
+    """,
+]
+
+POSTGRES_REVERSE = [
+    'DROP INDEX IF EXISTS recommendations_product_search_gin',
+]
+
+
+def _sqlite_has_fts5(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = {row[0] for row in cursor.fetchall()}
+    return 'ENABLE_FTS5' in options
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite' and _sqlite_has_fts5(schema_editor):
+        statements = SQLITE_FORWARD
+    elif vendor == 'postgresql':
+        statements = POSTGRES_FORWARD
+    else:
+        # Sem índice textual: a busca usa o fallback com icontains
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'sqlite': SQLITE_REVERSE, 'postgresql': POSTGRES_REVERSE}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0002_productstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
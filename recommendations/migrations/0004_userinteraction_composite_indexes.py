@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0003_product_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userinteraction',
+            index=models.Index(fields=['product', 'interaction_type', 'rating'], name='ui_product_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userinteraction',
+            index=models.Index(fields=['user', 'interaction_type'], name='ui_user_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userinteraction',
+            index=models.Index(fields=['user', 'product', 'interaction_type'], name='ui_user_product_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userinteraction',
+            index=models.Index(fields=['user', '-timestamp'], name='ui_user_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0004_userinteraction_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedProducts',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='related_list', serialize=False, to='recommendations.product', verbose_name='Produto')),
+                ('items', models.JSONField(blank=True, default=list, verbose_name='Produtos Relacionados')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Produtos Relacionados',
+                'verbose_name_plural': 'Produtos Relacionados',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:31
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('recommendations', '0005_relatedproducts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='interaction_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+                ('total_views', models.PositiveIntegerField(default=0, verbose_name='Visualizações')),
+                ('wishlist_count', models.PositiveIntegerField(default=0, verbose_name='Lista de Desejos')),
+                ('ratings_count', models.PositiveIntegerField(default=0, verbose_name='Avaliações')),
+                ('total_interactions', models.PositiveIntegerField(default=0, verbose_name='Total de Interações')),
+                ('category_counts', models.JSONField(blank=True, default=dict, verbose_name='Interações por Categoria')),
+                ('product_views', models.JSONField(blank=True, default=dict, verbose_name='Visualizações por Produto')),
+                ('top_products', models.JSONField(blank=True, default=list, verbose_name='Mais Visualizados')),
+                ('recent_interactions', models.JSONField(blank=True, default=list, verbose_name='Interações Recentes')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Estatísticas do Usuário',
+                'verbose_name_plural': 'Estatísticas dos Usuários',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0006_userstats'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userinteraction',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Data/Hora'),
+        ),
+    ]
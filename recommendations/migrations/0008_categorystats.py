@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-19 04:57
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_category_stats(apps, schema_editor):
+    """Mesma agregação de categories.rebuild_category_stats, para bancos que já têm produtos"""
+    Product = apps.get_model('recommendations', 'Product')
+    CategoryStats = apps.get_model('recommendations', 'CategoryStats')
+    aggregates = Product.objects.values('category').annotate(
+        products=Count('id'),
+        prices=Sum('price'),
+        views=Coalesce(Sum('stats__view_count'), 0),
+    ).order_by()
+    CategoryStats.objects.bulk_create([
+        CategoryStats(
+            name=row['category'],
+            product_count=row['products'],
+            price_sum=row['prices'] or Decimal('0'),
+            total_views=row['views'],
+        )
+        for row in aggregates
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0007_userinteraction_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryStats',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Categoria')),
+                ('product_count', models.IntegerField(default=0, verbose_name='Produtos')),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Soma dos Preços')),
+                ('total_views', models.IntegerField(default=0, verbose_name='Visualizações')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Estatística da Categoria',
+                'verbose_name_plural': 'Estatísticas das Categorias',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.RunPython(fill_category_stats, migrations.RunPython.noop),
+    ]
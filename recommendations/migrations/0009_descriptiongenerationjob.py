@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0008_categorystats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DescriptionGenerationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('running', 'Em execução'), ('interrupted', 'Interrompido'), ('completed', 'Concluído'), ('failed', 'Falhou')], default='pending', max_length=20, verbose_name='Status')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Total de Produtos')),
+                ('processed', models.PositiveIntegerField(default=0, verbose_name='Processados')),
+                ('succeeded', models.PositiveIntegerField(default=0, verbose_name='Gerados')),
+                ('failed', models.PositiveIntegerField(default=0, verbose_name='Falhas')),
+                ('last_product_id', models.PositiveIntegerField(default=0, verbose_name='Último Produto (checkpoint)')),
+                ('limit', models.PositiveIntegerField(blank=True, null=True, verbose_name='Limite de Produtos')),
+                ('error', models.TextField(blank=True, verbose_name='Erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finalizado em')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Criado por')),
+            ],
+            options={
+                'verbose_name': 'Geração de Descrições em Lote',
+                'verbose_name_plural': 'Gerações de Descrições em Lote',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-19 05:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copy_product_views(apps, schema_editor):
+    """Move o JSON UserStats.product_views para a tabela UserProductViews"""
+    UserStats = apps.get_model('recommendations', 'UserStats')
+    UserProductViews = apps.get_model('recommendations', 'UserProductViews')
+    Product = apps.get_model('recommendations', 'Product')
+    product_ids = set(Product.objects.values_list('id', flat=True))
+
+    for stats in UserStats.objects.exclude(product_views={}).iterator():
+        UserProductViews.objects.bulk_create([
+            UserProductViews(user_id=stats.user_id, product_id=int(product_id), view_count=views)
+            for product_id, views in stats.product_views.items()
+            if int(product_id) in product_ids
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0009_descriptiongenerationjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProductViews',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view_count', models.PositiveIntegerField(default=0, verbose_name='Visualizações')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='recommendations.product', verbose_name='Produto')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='product_views', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Visualizações do Usuário por Produto',
+                'verbose_name_plural': 'Visualizações dos Usuários por Produto',
+                'constraints': [models.UniqueConstraint(fields=('user', 'product'), name='user_product_views_unique')],
+            },
+        ),
+        migrations.RunPython(copy_product_views, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='userstats',
+            name='product_views',
+        ),
+    ]
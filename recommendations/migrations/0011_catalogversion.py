@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-19 06:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0010_userproductviews'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=1, verbose_name='Versão')),
+            ],
+            options={
+                'verbose_name': 'Versão do Catálogo',
+                'verbose_name_plural': 'Versões do Catálogo',
+            },
+        ),
+    ]
@@ -1,17 +1,41 @@
-import pandas as pd
-import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.decomposition import TruncatedSVD
 import os
+import threading
+
 from django.conf import settings
+from django.db.models import Count
+from django.utils import timezone
+
+# pandas, numpy e scikit-learn (que puxa o SciPy) levam segundos para importar:
+# são importados dentro dos métodos, só quando o modelo é treinado ou usado,
+# e não na carga das views (comandos, testes e boot dos workers).
+
+# Atributos gravados com o modelo treinado (model_path/model.joblib)
+MODEL_STATE = (
+    'content_vectorizer', 'content_matrix', 'product_ids', 'user_product_matrix',
+    'svd', 'user_ids', 'last_trained', 'model_version',
+)
+
+
+def _atomic_write(path, write):
+    """write(caminho temporário) e troca pelo arquivo final: leitores nunca veem o arquivo pela metade"""
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
 
 class HybridRecommender:
     def __init__(self):
-        self.content_vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
+        self.content_vectorizer = None  # Criado no treino
         self.svd = None  # Inicializar como None
         self.is_trained = False
-        self.model_path = os.path.join(settings.BASE_DIR, 'ml_models', 'trained_model')
+        # Muda a cada treino; entra no ETag das recomendações
+        self.model_version = 'untrained'
+        # O modelo treinado fica em disco com a versão ao lado (arquivo VERSION),
+        # para todos os workers servirem o mesmo modelo com a mesma versão
+        self.model_path = getattr(
+            settings, 'RECOMMENDER_MODEL_PATH', os.path.join(settings.BASE_DIR, 'ml_models', 'trained_model')
+        )
+        self._load_lock = threading.Lock()
         
     def prepare_product_features(self, products):
         """Prepara features dos produtos para content-based filtering"""
@@ -28,6 +52,8 @@ class HybridRecommender:
     
     def create_user_product_matrix(self, interactions):
         """Cria matriz usuario-produto para collaborative filtering"""
+        import pandas as pd
+        
         if not interactions:
             return pd.DataFrame()
             
@@ -67,11 +93,15 @@ class HybridRecommender:
     
     def train(self, products, interactions):
         """Treina o modelo com dados atuais"""
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        
         print("# Treinando modelo de recomendações...")
         
         # Content-based features
         product_features, product_ids = self.prepare_product_features(products)
         if product_features:
+            self.content_vectorizer = TfidfVectorizer(max_features=1000, stop_words='english')
             self.content_matrix = self.content_vectorizer.fit_transform(product_features)
             self.product_ids = product_ids
             print(f"✅ Content-based: {len(product_features)} produtos processados")
@@ -103,11 +133,62 @@ class HybridRecommender:
             print("⚠️  Collaborative: Nenhuma interação para treinar")
             
         self.is_trained = True
+        self.last_trained = timezone.now()
+        self.model_version = self.last_trained.isoformat()
+        self._save()
         print("# ✅ Modelo treinado com sucesso!")
         return True
     
+    def _model_file(self):
+        return os.path.join(self.model_path, 'model.joblib')
+    
+    def _version_file(self):
+        return os.path.join(self.model_path, 'VERSION')
+    
+    def _save(self):
+        """Grava o modelo e, por último, a versão: quem vê a versão nova já encontra o modelo"""
+        import joblib
+        
+        os.makedirs(self.model_path, exist_ok=True)
+        state = {name: getattr(self, name, None) for name in MODEL_STATE}
+        _atomic_write(self._model_file(), lambda path: joblib.dump(state, path))
+        
+        def write_version(path):
+            with open(path, 'w', encoding='utf-8') as stream:
+                stream.write(self.model_version)
+        _atomic_write(self._version_file(), write_version)
+    
+    def current_version(self):
+        """
+        Versão do modelo gravado em disco, a mesma em todos os workers. Se outro
+        processo treinou um modelo mais novo, carrega ele antes de responder.
+        """
+        try:
+            with open(self._version_file(), encoding='utf-8') as stream:
+                version = stream.read().strip()
+        except FileNotFoundError:
+            return self.model_version
+        if version != self.model_version:
+            self._load()
+        return self.model_version
+    
+    def _load(self):
+        import joblib
+        
+        with self._load_lock:
+            try:
+                state = joblib.load(self._model_file())
+            except FileNotFoundError:
+                return
+            for name, value in state.items():
+                setattr(self, name, value)
+            self.is_trained = True
+            print(f"📥 Modelo de recomendações carregado do disco (versão {self.model_version})")
+    
     def recommend_for_user(self, user, products, top_n=10):
         """Gera recomendações para um usuário específico"""
+        # Usa o mesmo modelo (e versão) que os outros workers
+        self.current_version()
         if not self.is_trained:
             print("⚠️  Modelo não treinado, usando fallback")
             return self._get_fallback_recommendations(products, top_n)
@@ -129,6 +210,9 @@ class HybridRecommender:
     def _get_hybrid_recommendations(self, user, products, top_n):
         """Recomendações híbridas para novos usuários"""
         try:
+            import numpy as np
+            from sklearn.metrics.pairwise import cosine_similarity
+            
             # Import aqui para evitar circular imports
             from recommendations.models import UserInteraction
             
@@ -180,6 +264,9 @@ class HybridRecommender:
     def _get_collaborative_recommendations(self, user, products, top_n):
         """Recomendações baseadas em collaborative filtering"""
         try:
+            import numpy as np
+            from sklearn.metrics.pairwise import cosine_similarity
+            
             # Import aqui para evitar circular imports
             from recommendations.models import UserInteraction
             
@@ -231,28 +318,37 @@ class HybridRecommender:
     
     def _get_fallback_recommendations(self, products, top_n):
         """Recomendações de fallback baseadas em popularidade"""
-        if not products:
+        # Popularidade = total de interações, contado numa única query agregada
+        popular_products = list(
+            products.annotate(interaction_count=Count('userinteraction')).order_by('-interaction_count', 'pk')[:top_n]
+        )
+        if not popular_products:
             return []
             
-        # Import aqui para evitar circular imports
-        from recommendations.models import UserInteraction
-        
-        # Simula popularidade baseada em interações
-        popular_products = []
-        for product in products:
-            interaction_count = UserInteraction.objects.filter(product=product).count()
-            popular_products.append((product, interaction_count))
-            
-        # Ordena por popularidade
-        popular_products.sort(key=lambda x: x[1], reverse=True)
-        
-        # Se não há interações, retorna aleatório
-        if all(count == 0 for product, count in popular_products):
-            return list(products)[:top_n]
+        # Se não há interações, retorna os primeiros produtos
+        if popular_products[0].interaction_count == 0:
+            return list(products[:top_n])
             
-        recommendations = [product for product, count in popular_products[:top_n]]
-        print(f"✅ Fallback: {len(recommendations)} recomendações por popularidade")
-        return recommendations
+        print(f"✅ Fallback: {len(popular_products)} recomendações por popularidade")
+        return popular_products
+
+# Instância global do recomendador, criada no primeiro uso
+_recommender = None
+_recommender_lock = threading.Lock()
+
+
+def get_recommender():
+    """Recomendador compartilhado do processo"""
+    global _recommender
+    if _recommender is None:
+        with _recommender_lock:
+            if _recommender is None:
+                _recommender = HybridRecommender()
+    return _recommender
+
 
-# Instância global do recomendador
-recommender = HybridRecommender()
\ No newline at end of file
+def __getattr__(name):
+    # Compatibilidade com `from recommendations.ml_models.recommender import recommender`
+    if name == 'recommender':
+        return get_recommender()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class Product(models.Model):
     name = models.CharField(max_length=200, verbose_name="Nome")
@@ -38,12 +39,23 @@ class UserInteraction(models.Model):
         verbose_name="Tipo de Interação"
     )
     rating = models.IntegerField(null=True, blank=True, verbose_name="Avaliação (1-5)")
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Data/Hora")
+    # default em vez de auto_now_add: a ingestão em lote grava o horário do evento
+    timestamp = models.DateTimeField(default=timezone.now, verbose_name="Data/Hora")
     
     class Meta:
         verbose_name = "Interação do Usuário"
         verbose_name_plural = "Interações dos Usuários"
         ordering = ['-timestamp']
+        indexes = [
+            # Estatísticas por produto (rating no índice deixa a média coberta)
+            models.Index(fields=['product', 'interaction_type', 'rating'], name='ui_product_type_idx'),
+            # Contadores do dashboard por tipo
+            models.Index(fields=['user', 'interaction_type'], name='ui_user_type_idx'),
+            # Upsert da avaliação e avaliação do usuário na página do produto
+            models.Index(fields=['user', 'product', 'interaction_type'], name='ui_user_product_type_idx'),
+            # Atividade recente do usuário
+            models.Index(fields=['user', '-timestamp'], name='ui_user_recent_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.product.name} - {self.interaction_type}"
@@ -61,4 +73,205 @@ class Recommendation(models.Model):
         ordering = ['-created_at']
     
     def __str__(self):
-        return f"Recomendações para {self.user.username}"
\ No newline at end of file
+        return f"Recomendações para {self.user.username}"
+
+class ProductStats(models.Model):
+    """
+    Estatísticas desnormalizadas do produto, atualizadas de forma incremental
+    a cada interação registrada (ver recommendations/stats.py).
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name="Produto"
+    )
+    view_count = models.PositiveIntegerField(default=0, verbose_name="Visualizações")
+    wishlist_count = models.PositiveIntegerField(default=0, verbose_name="Lista de Desejos")
+    rating_sum = models.PositiveIntegerField(default=0, verbose_name="Soma das Avaliações")
+    rating_count = models.PositiveIntegerField(default=0, verbose_name="Número de Avaliações")
+    last_interaction_at = models.DateTimeField(null=True, blank=True, verbose_name="Última Interação")
+    
+    class Meta:
+        verbose_name = "Estatística do Produto"
+        verbose_name_plural = "Estatísticas dos Produtos"
+    
+    def __str__(self):
+        return f"Estatísticas de {self.product_id}"
+    
+    @property
+    def average_rating(self):
+        if not self.rating_count:
+            return 0.0
+        return round(self.rating_sum / self.rating_count, 1)
+
+
+class RelatedProducts(models.Model):
+    """
+    Lista pré-calculada de produtos relacionados (mesma categoria + conteúdo
+    parecido), com os dados de card já serializados. Mantida por
+    recommendations/related.py.
+    """
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='related_list',
+        verbose_name="Produto"
+    )
+    items = models.JSONField(default=list, blank=True, verbose_name="Produtos Relacionados")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+    
+    class Meta:
+        verbose_name = "Produtos Relacionados"
+        verbose_name_plural = "Produtos Relacionados"
+    
+    def __str__(self):
+        return f"Relacionados de {self.product_id}"
+
+
+class UserStats(models.Model):
+    """
+    Estatísticas desnormalizadas por usuário, usadas pelo dashboard.
+
+    Atualizadas incrementalmente a cada interação registrada (ver
+    recommendations/stats.py); o dashboard lê tudo desta linha, sem agregar
+    UserInteraction.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='interaction_stats',
+        verbose_name="Usuário"
+    )
+    total_views = models.PositiveIntegerField(default=0, verbose_name="Visualizações")
+    wishlist_count = models.PositiveIntegerField(default=0, verbose_name="Lista de Desejos")
+    ratings_count = models.PositiveIntegerField(default=0, verbose_name="Avaliações")
+    total_interactions = models.PositiveIntegerField(default=0, verbose_name="Total de Interações")
+    # {"Categoria": {"view": 3, "wishlist": 1, "rating": 0}}
+    category_counts = models.JSONField(default=dict, blank=True, verbose_name="Interações por Categoria")
+    # Cards dos produtos mais vistos, com view_count
+    top_products = models.JSONField(default=list, blank=True, verbose_name="Mais Visualizados")
+    # Últimas interações (mais recente primeiro)
+    recent_interactions = models.JSONField(default=list, blank=True, verbose_name="Interações Recentes")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+    
+    class Meta:
+        verbose_name = "Estatísticas do Usuário"
+        verbose_name_plural = "Estatísticas dos Usuários"
+    
+    def __str__(self):
+        return f"Estatísticas de {self.user_id}"
+
+
+class UserProductViews(models.Model):
+    """
+    Visualizações de cada produto por usuário, base do ranking "mais vistos" de
+    UserStats. Uma linha por usuário/produto: registrar uma visualização
+    atualiza só a linha do produto, qualquer que seja o histórico do usuário.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='product_views', verbose_name="Usuário")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="Produto")
+    view_count = models.PositiveIntegerField(default=0, verbose_name="Visualizações")
+
+    class Meta:
+        verbose_name = "Visualizações do Usuário por Produto"
+        verbose_name_plural = "Visualizações dos Usuários por Produto"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='user_product_views_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.product_id}: {self.view_count}"
+
+class CategoryStats(models.Model):
+    """
+    Catálogo de categorias materializado: número de produtos, soma dos preços
+    e total de visualizações por categoria. Mantido de forma incremental pelos
+    signals de Product e pelo registro de interações (ver recommendations/categories.py).
+    """
+    name = models.CharField(max_length=100, primary_key=True, verbose_name="Categoria")
+    product_count = models.IntegerField(default=0, verbose_name="Produtos")
+    price_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Soma dos Preços")
+    total_views = models.IntegerField(default=0, verbose_name="Visualizações")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+    
+    class Meta:
+        verbose_name = "Estatística da Categoria"
+        verbose_name_plural = "Estatísticas das Categorias"
+        ordering = ['name']
+    
+    def __str__(self):
+        return self.name
+    
+    @property
+    def average_price(self):
+        if not self.product_count:
+            return 0
+        return round(self.price_sum / self.product_count, 2)
+
+class DescriptionGenerationJob(models.Model):
+    """
+    Execução da geração de descrições em lote (ver recommendations/bulk_generation.py).
+
+    Guarda o progresso por lote: last_product_id é o checkpoint (produtos são
+    processados em ordem de id), então uma execução interrompida continua de
+    onde parou.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pendente'),
+        ('running', 'Em execução'),
+        ('interrupted', 'Interrompido'),
+        ('completed', 'Concluído'),
+        ('failed', 'Falhou'),
+    ]
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Status")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Criado por")
+    total = models.PositiveIntegerField(default=0, verbose_name="Total de Produtos")
+    processed = models.PositiveIntegerField(default=0, verbose_name="Processados")
+    succeeded = models.PositiveIntegerField(default=0, verbose_name="Gerados")
+    failed = models.PositiveIntegerField(default=0, verbose_name="Falhas")
+    last_product_id = models.PositiveIntegerField(default=0, verbose_name="Último Produto (checkpoint)")
+    limit = models.PositiveIntegerField(null=True, blank=True, verbose_name="Limite de Produtos")
+    error = models.TextField(blank=True, verbose_name="Erro")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Criado em")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Atualizado em")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Finalizado em")
+    
+    class Meta:
+        verbose_name = "Geração de Descrições em Lote"
+        verbose_name_plural = "Gerações de Descrições em Lote"
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"Geração #{self.pk} ({self.get_status_display()})"
+    
+    @property
+    def progress(self):
+        """Percentual concluído (0-100)"""
+        if not self.total:
+            return 100 if self.status == 'completed' else 0
+        return min(100, round(self.processed * 100 / self.total))
+    
+    @property
+    def is_finished(self):
+        return self.status in ('completed', 'failed')
+
+
+class CatalogVersion(models.Model):
+    """
+    Versão do catálogo (uma linha só), incrementada a cada mudança no catálogo.
+    Fica no banco para ser a mesma em todos os processos: entra nas chaves de
+    cache das listagens e no ETag das recomendações (ver recommendations/catalog_cache.py).
+    """
+    version = models.PositiveBigIntegerField(default=1, verbose_name="Versão")
+    
+    class Meta:
+        verbose_name = "Versão do Catálogo"
+        verbose_name_plural = "Versões do Catálogo"
+    
+    def __str__(self):
+        return f"Catálogo v{self.version}"
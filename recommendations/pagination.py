@@ -0,0 +1,188 @@
+"""
+Paginação por cursor (keyset) para as listagens do catálogo.
+
+Em vez de COUNT(*) + OFFSET n LIMIT 12, cada página filtra a partir da última
+linha vista na ordenação ativa (ex.: price > 10 OR (price = 10 AND id > 42)),
+então o custo não cresce com a profundidade da página. O cursor vai na query
+string como um token opaco e assinado.
+"""
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Q
+
+CURSOR_SALT = 'recommendations.pagination.cursor'
+
+# Ordenações suportadas: lista de (campo, descendente). O id desempata sempre.
+SORT_KEYS = {
+    'newest': [('id', True)],
+    'price_low': [('price', False), ('id', False)],
+    'price_high': [('price', True), ('id', True)],
+    'name': [('name', False), ('id', False)],
+    'popular': [('view_count', True), ('id', True)],
+}
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(payload):
+    return signing.dumps(payload, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token):
+    try:
+        return signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature as e:
+        raise InvalidCursor(str(e))
+
+
+def _serialize(value):
+    # Decimal não é serializável em JSON; o banco aceita a string de volta
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def cached_count(queryset, timeout=None, version=''):
+    """
+    COUNT(*) do queryset guardado em cache (a chave é o SQL da query),
+    para não recontar o catálogo a cada página.
+    """
+    if timeout is None:
+        timeout = getattr(settings, 'CATALOG_COUNT_CACHE_TIMEOUT', 60)
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.sha1(f'{version}:{sql}:{params}'.encode()).hexdigest()
+    return cache.get_or_set(f'catalog-count:{digest}', queryset.count, timeout)
+
+
+class KeysetPage:
+    """Página de resultados com cursores para a próxima/anterior página"""
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Pagina um queryset por cursor na ordenação informada (chave de SORT_KEYS).
+
+    Ordenações sem chave estável (ex.: relevância da busca) usam um cursor com
+    offset, que continua opaco para o cliente.
+    """
+
+    def __init__(self, queryset, sort_by, per_page=12, count_version=''):
+        self.queryset = queryset
+        self.sort_by = sort_by
+        self.keys = SORT_KEYS.get(sort_by)
+        self.per_page = per_page
+        self.count_version = count_version
+        self._count = None
+
+    @property
+    def count(self):
+        """Total de itens (cacheado, não recalculado a cada página)"""
+        if self._count is None:
+            self._count = cached_count(self.queryset, version=self.count_version)
+        return self._count
+
+    @count.setter
+    def count(self, value):
+        self._count = value
+
+    @property
+    def num_pages(self):
+        return max(1, -(-self.count // self.per_page))
+
+    def get_page(self, token=None):
+        """Retorna a página do cursor (cursor inválido volta para a primeira página)"""
+        try:
+            cursor = decode_cursor(token) if token else None
+            if cursor is not None and cursor.get('s') != self.sort_by:
+                raise InvalidCursor('cursor de outra ordenação')
+        except InvalidCursor:
+            cursor = None
+
+        if self.keys is None:
+            return self._offset_page(cursor)
+        return self._keyset_page(cursor)
+
+    def _ordering(self, reverse=False):
+        return [
+            f'-{field}' if descending != reverse else field
+            for field, descending in self.keys
+        ]
+
+    def _after(self, values, reverse=False):
+        """Filtro de linhas depois de `values` na ordenação (ou antes, se reverse)"""
+        condition = Q()
+        for position, (field, descending) in enumerate(self.keys):
+            lookup = 'lt' if descending != reverse else 'gt'
+            branch = Q(**{f'{field}__{lookup}': values[position]})
+            for previous_position, (previous_field, _) in enumerate(self.keys[:position]):
+                branch &= Q(**{previous_field: values[previous_position]})
+            condition |= branch
+        return condition
+
+    def _cursor_for(self, obj, direction):
+        values = [_serialize(getattr(obj, field)) for field, _ in self.keys]
+        return encode_cursor({'s': self.sort_by, 'd': direction, 'k': values})
+
+    def _keyset_page(self, cursor):
+        backwards = cursor is not None and cursor.get('d') == 'p'
+        queryset = self.queryset.order_by(*self._ordering(reverse=backwards))
+        if cursor is not None:
+            queryset = queryset.filter(self._after(cursor['k'], reverse=backwards))
+
+        items = list(queryset[:self.per_page + 1])
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+
+        if backwards:
+            items.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+
+        next_cursor = self._cursor_for(items[-1], 'n') if items and has_next else None
+        previous_cursor = self._cursor_for(items[0], 'p') if items and has_previous else None
+        return KeysetPage(items, self, next_cursor, previous_cursor)
+
+    def _offset_page(self, cursor):
+        offset = max(0, int(cursor.get('o', 0))) if cursor else 0
+        items = list(self.queryset[offset:offset + self.per_page + 1])
+        has_next = len(items) > self.per_page
+        items = items[:self.per_page]
+
+        next_cursor = None
+        if has_next:
+            next_cursor = encode_cursor({'s': self.sort_by, 'o': offset + self.per_page})
+        previous_cursor = None
+        if offset > 0:
+            previous_cursor = encode_cursor({'s': self.sort_by, 'o': max(0, offset - self.per_page)})
+        return KeysetPage(items, self, next_cursor, previous_cursor)
@@ -0,0 +1,129 @@
+"""
+Cache dos payloads JSON de produtos usados pelas APIs.
+
+Cada produto é serializado uma vez por variante ('card', 'summary', 'detail')
+e guardado como fragmento JSON pronto, com o updated_at do produto na chave:
+quando o produto muda, a chave muda e o fragmento antigo simplesmente expira.
+As APIs montam a resposta concatenando os fragmentos na ordem do ranking,
+sem instanciar modelos nem serializar de novo a cada requisição.
+"""
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+from .models import Product
+
+DEFAULT_IMAGE_URL = '/static/images/default-product.jpg'
+SUMMARY_DESCRIPTION_LENGTH = 100
+
+
+def _card(row):
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'category': row['category'],
+        'price': str(row['price']),
+        'image_url': row['image_url'],
+    }
+
+
+def _summary(row):
+    description = row['description'] or ''
+    if len(description) > SUMMARY_DESCRIPTION_LENGTH:
+        description = description[:SUMMARY_DESCRIPTION_LENGTH] + '...'
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'category': row['category'],
+        'price': str(row['price']),
+        'description': description,
+        'image_url': row['image_url'] or DEFAULT_IMAGE_URL,
+    }
+
+
+def _detail(row):
+    return {
+        'id': row['id'],
+        'name': row['name'],
+        'category': row['category'],
+        'price': str(row['price']),
+        'features': row['features'] or '',
+        'current_description': row['description'] or '',
+        'image_url': row['image_url'] or '',
+    }
+
+
+# Variante -> (campos lidos do banco, função que monta o payload)
+VARIANTS = {
+    'card': (('id', 'name', 'category', 'price', 'image_url'), _card),
+    'summary': (('id', 'name', 'category', 'price', 'description', 'image_url'), _summary),
+    'detail': (('id', 'name', 'category', 'price', 'features', 'description', 'image_url'), _detail),
+}
+
+
+def payload_timeout():
+    return getattr(settings, 'PRODUCT_PAYLOAD_CACHE_TIMEOUT', 3600)
+
+
+def payload_key(variant, product_id, updated_at):
+    version = updated_at.timestamp() if updated_at else 0
+    return f'product-payload:{variant}:{product_id}:{version}'
+
+
+def product_versions(product_ids):
+    """[(id, updated_at)] na ordem dos ids informados (uma query, sem instanciar modelos)"""
+    versions = dict(Product.objects.filter(id__in=product_ids).values_list('id', 'updated_at'))
+    return [(product_id, versions[product_id]) for product_id in product_ids if product_id in versions]
+
+
+def get_payloads(variant, versions):
+    """
+    Fragmentos JSON (str) dos produtos, na ordem de `versions` ([(id, updated_at)]).
+
+    Os que faltam no cache são lidos com .values() e serializados uma única vez.
+    """
+    fields, build = VARIANTS[variant]
+    keys = {product_id: payload_key(variant, product_id, updated_at) for product_id, updated_at in versions}
+    cached = cache.get_many(keys.values())
+
+    missing = [product_id for product_id, key in keys.items() if key not in cached]
+    if missing:
+        fresh = {}
+        for row in Product.objects.filter(id__in=missing).values(*fields):
+            key = keys[row['id']]
+            fresh[key] = json.dumps(build(row), cls=DjangoJSONEncoder)
+        cache.set_many(fresh, payload_timeout())
+        cached.update(fresh)
+
+    return [cached[keys[product_id]] for product_id, _ in versions if keys[product_id] in cached]
+
+
+class RawJSON(str):
+    """Texto que já é JSON válido (não é serializado de novo)"""
+
+
+def payload_list(variant, versions):
+    """Lista JSON com os payloads dos produtos na ordem informada"""
+    return RawJSON('[' + ', '.join(get_payloads(variant, versions)) + ']')
+
+
+def payload_object(variant, product_id):
+    """Payload JSON de um produto, ou None se ele não existir"""
+    payloads = get_payloads(variant, product_versions([product_id]))
+    return RawJSON(payloads[0]) if payloads else None
+
+
+def json_fragments_response(**fields):
+    """
+    Resposta JSON montada a partir de valores Python e de fragmentos já serializados.
+
+    Valores do tipo RawJSON entram como estão; os demais passam por json.dumps.
+    """
+    parts = []
+    for name, value in fields.items():
+        encoded = value if isinstance(value, RawJSON) else json.dumps(value, cls=DjangoJSONEncoder)
+        parts.append(f'{json.dumps(name)}: {encoded}')
+    return HttpResponse('{' + ', '.join(parts) + '}', content_type='application/json')
@@ -0,0 +1,138 @@
+"""
+Verificação dos planos de execução (EXPLAIN) das principais queries das views.
+
+As queries não são copiadas à mão: cada caminho de código (view, manutenção das
+estatísticas, ETag, recomendador) roda de verdade numa transação desfeita ao
+final, com um execute_wrapper gravando o SQL e os parâmetros enviados ao banco.
+Cada SELECT/UPDATE/DELETE que toca UserInteraction passa por EXPLAIN e precisa
+usar um índice; um full table scan nessa tabela (a maior do sistema) é tratado
+como regressão. Usado pelo comando check_query_plans e pelos testes.
+"""
+import re
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.test import RequestFactory
+
+from .models import Product, UserInteraction
+
+CHECKED_TABLES = [UserInteraction._meta.db_table]
+EXPLAINED_STATEMENTS = ('SELECT', 'UPDATE', 'DELETE')
+
+
+class QueryRecorder:
+    """execute_wrapper que guarda (alias, sql, params) de cada query executada"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many:
+            self.queries.append((context['connection'].alias, sql, params))
+        return execute(sql, params, many, context)
+
+
+def main_code_paths(user, product):
+    """Caminhos quentes das views e da manutenção das estatísticas: {nome: função sem argumentos}"""
+    # Importados aqui: as views puxam o restante do app
+    from . import views
+    from .etags import recommendations_etag
+    from .ml_models.recommender import get_recommender
+    from .stats import build_user_stats, rebuild_product_stats, record_interaction
+
+    def product_detail():
+        # Host aceito por ALLOWED_HOSTS (a página renderiza URLs absolutas)
+        hosts = [host for host in settings.ALLOWED_HOSTS if host and '*' not in host and not host.startswith('.')]
+        request = RequestFactory().get(f'/product/{product.pk}/', HTTP_HOST=hosts[0] if hosts else 'localhost')
+        request.user = user
+        views.product_detail(request, product.pk)
+
+    return {
+        'views.product_detail': product_detail,
+        'stats.record_interaction.view': lambda: record_interaction(user, product, 'view'),
+        'stats.record_interaction.rating': lambda: record_interaction(user, product, 'rating', rating=4),
+        'stats.build_user_stats': lambda: build_user_stats(user),
+        'stats.rebuild_product_stats': lambda: rebuild_product_stats([product.pk]),
+        'etags.recommendations_etag': lambda: recommendations_etag(user.pk, 'query-plan', 'card'),
+        'recommender.recommend_for_user': lambda: get_recommender().recommend_for_user(
+            user, Product.objects.all(), top_n=10
+        ),
+    }
+
+
+def capture_queries(code_path):
+    """
+    Roda o caminho de código numa transação desfeita (nada é gravado) e retorna
+    as queries que ele executou em qualquer conexão: [(alias, sql, params)].
+    Dentro da transação o roteador manda também as leituras para o primário.
+    """
+    recorder = QueryRecorder()
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            code_path()
+        transaction.set_rollback(True, using=DEFAULT_DB_ALIAS)
+    return recorder.queries
+
+
+def checked_queries(queries):
+    """Queries de leitura/alteração que tocam as tabelas verificadas (sem repetições)"""
+    seen = set()
+    for alias, sql, params in queries:
+        if not sql.lstrip().upper().startswith(EXPLAINED_STATEMENTS):
+            continue
+        if not any(table in sql for table in CHECKED_TABLES):
+            continue
+        if sql in seen:
+            continue
+        seen.add(sql)
+        yield alias, sql, params
+
+
+def _full_scan_pattern(vendor, table):
+    if vendor == 'postgresql':
+        return re.compile(rf'Seq Scan on {table}\b')
+    # SQLite: "SCAN tabela" (com ou sem USING INDEX) percorre a tabela/índice inteiro
+    return re.compile(rf'\bSCAN {table}\b')
+
+
+def explain(sql, params, using=DEFAULT_DB_ALIAS):
+    """Plano de execução da query. No PostgreSQL, desliga seq scan para ver se há índice utilizável."""
+    connection = connections[using]
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            # SQLite: (id, parent, notused, detail); PostgreSQL: uma coluna com o texto do plano
+            return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+
+
+def query_plans(user_id, product_id):
+    """[(nome do caminho, sql, plano)] de cada query verificada dos caminhos principais"""
+    user = User.objects.get(pk=user_id)
+    product = Product.objects.get(pk=product_id)
+
+    plans = []
+    for name, code_path in main_code_paths(user, product).items():
+        for alias, sql, params in checked_queries(capture_queries(code_path)):
+            plans.append((name, sql, explain(sql, params, using=alias)))
+    return plans
+
+
+def find_full_scans(user_id, product_id):
+    """
+    Retorna {nome_do_caminho: [(sql, plano)]} para as queries que fazem full scan
+    em UserInteraction. Dicionário vazio = todas as queries usam índice.
+    """
+    vendor = connections[DEFAULT_DB_ALIAS].vendor
+    patterns = [_full_scan_pattern(vendor, table) for table in CHECKED_TABLES]
+
+    offenders = {}
+    for name, sql, plan in query_plans(user_id, product_id):
+        if any(pattern.search(plan) for pattern in patterns):
+            offenders.setdefault(name, []).append((sql, plan))
+    return offenders
@@ -0,0 +1,150 @@
+"""
+Listas pré-calculadas de produtos relacionados.
+
+Cada produto guarda (em RelatedProducts) uma lista com os dados de card de
+produtos da mesma categoria (os mais vistos) intercalados com produtos de
+conteúdo parecido de outras categorias (busca textual pelo nome). A página de
+detalhes lê a lista com um único lookup pela chave primária e faz a rotação
+com um offset aleatório, sem ORDER BY RANDOM().
+
+As listas são invalidadas pelos signals de Product (recommendations/signals.py)
+e reconstruídas sob demanda no próximo acesso. Uma alteração de produto
+descarta só as listas que ela pode mudar (ver invalidate_lists_for).
+"""
+import random
+
+from django.db import connections, router
+from django.db.models import F, Q
+
+from .models import Product, RelatedProducts
+from .search import search_products
+
+# Tamanho da lista guardada e quantos itens vêm da mesma categoria
+RELATED_LIST_SIZE = 16
+SAME_CATEGORY_SIZE = 10
+
+CARD_FIELDS = ('id', 'name', 'category', 'price', 'image_url')
+
+
+def _card(values):
+    card = dict(values)
+    card['price'] = str(card['price'])
+    return card
+
+
+def _interleave(primary, secondary):
+    """Intercala as duas listas, começando pela principal"""
+    merged = []
+    for position in range(max(len(primary), len(secondary))):
+        if position < len(primary):
+            merged.append(primary[position])
+        if position < len(secondary):
+            merged.append(secondary[position])
+    return merged
+
+
+def compute_related_items(product, size=RELATED_LIST_SIZE):
+    """Calcula a lista de cards relacionados ao produto (sem salvar)"""
+    others = Product.objects.exclude(id=product.id)
+
+    same_category = []
+    if product.category and product.category.strip():
+        same_category = [
+            _card(values) for values in others.filter(category=product.category).order_by(
+                F('stats__view_count').desc(nulls_last=True), '-id'
+            ).values(*CARD_FIELDS)[:min(size, SAME_CATEGORY_SIZE)]
+        ]
+
+    similar = []
+    remaining = size - len(same_category)
+    if remaining > 0 and product.name:
+        candidates = others.exclude(category=product.category)
+        similar = [
+            _card(values) for values in search_products(
+                candidates, product.name, match_any=True
+            ).order_by('-search_rank', '-id').values(*CARD_FIELDS)[:remaining]
+        ]
+
+    return _interleave(same_category, similar)
+
+
+def build_related_products(product):
+    """Recalcula e salva a lista de relacionados do produto"""
+    related, _ = RelatedProducts.objects.update_or_create(
+        product=product,
+        defaults={'items': compute_related_items(product)},
+    )
+    return related
+
+
+def get_related_products(product, count=4):
+    """
+    Retorna `count` cards relacionados ao produto, rotacionando a lista salva.
+
+    Use select_related('related_list') ao carregar o produto para que isso não
+    faça nenhuma query; a lista é construída na primeira vez que faltar.
+    """
+    try:
+        items = product.related_list.items
+    except RelatedProducts.DoesNotExist:
+        items = build_related_products(product).items
+
+    if len(items) <= count:
+        return list(items)
+
+    offset = random.randrange(len(items))
+    return (items[offset:] + items[:offset])[:count]
+
+
+def rebuild_related_products(product_ids=None):
+    """
+    Reconstrói as listas de relacionados (todas ou dos produtos informados).
+
+    Retorna o número de produtos processados.
+    """
+    products = Product.objects.only('id', 'name', 'category').order_by('id')
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+
+    total = 0
+    for product in products.iterator():
+        build_related_products(product)
+        total += 1
+    return total
+
+
+def invalidate_related_products(product_ids=None):
+    """Descarta as listas salvas (todas, por padrão); são refeitas no próximo acesso"""
+    lists = RelatedProducts.objects.all()
+    if product_ids is not None:
+        lists = lists.filter(product_id__in=product_ids)
+    lists.delete()
+
+
+def _lists_showing(product_ids):
+    """Filtro das listas que exibem algum dos produtos como card"""
+    connection = connections[router.db_for_write(RelatedProducts)]
+    showing = Q(pk__in=[])
+    for product_id in product_ids:
+        if connection.features.supports_json_field_contains:
+            showing |= Q(items__contains=[{'id': product_id}])
+        else:
+            # SQLite: o JSON fica em texto e todo card começa por {"id": N, ...}
+            showing |= Q(items__icontains=f'{{"id": {product_id},')
+    return showing
+
+
+def invalidate_lists_for(product_ids, categories=()):
+    """
+    Descarta só as listas que a alteração dos produtos pode mudar: a do próprio
+    produto (nome e categoria definem a busca), as que o exibem como card e,
+    em `categories`, as dos produtos das categorias em que ele passou a
+    concorrer pelo ranking da mesma categoria.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    lists = Q(product_id__in=product_ids) | _lists_showing(product_ids)
+    if categories:
+        lists |= Q(product__category__in=list(categories))
+    RelatedProducts.objects.filter(lists).delete()
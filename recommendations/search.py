@@ -0,0 +1,106 @@
+"""
+Busca textual indexada de produtos.
+
+- SQLite: tabela virtual FTS5 (external content) mantida por triggers na tabela
+  de produtos, com ranking por bm25.
+- PostgreSQL: índice GIN sobre to_tsvector('portuguese', ...), com ranking por ts_rank.
+- Outros bancos (ou SQLite sem FTS5): fallback com icontains.
+
+Criados pela migration 0003_product_search.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+FTS_TABLE = 'recommendations_product_fts'
+PG_INDEX = 'recommendations_product_search_gin'
+PG_CONFIG = 'portuguese'
+
+# Pesos do bm25 por coluna: nome, descrição, categoria
+FTS_WEIGHTS = (10.0, 1.0, 5.0)
+
+# Limite de termos aceitos na busca (evita queries gigantes)
+MAX_TERMS = 8
+
+_fts_available = {}
+
+
+def _terms(query):
+    """Normaliza a busca em termos alfanuméricos"""
+    return re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+
+
+def _pg_document(table):
+    # Deve ser equivalente à expressão do índice GIN criado na migration
+    return (
+        f"to_tsvector('{PG_CONFIG}'::regconfig, "
+        f"COALESCE({table}.name, '') || ' ' || "
+        f"COALESCE({table}.description, '') || ' ' || "
+        f"COALESCE({table}.category, ''))"
+    )
+
+
+def search_backend(using='default'):
+    """Retorna o backend de busca disponível para o banco: 'fts5', 'postgres' ou 'icontains'"""
+    connection = connections[using]
+
+    if connection.vendor == 'postgresql':
+        return 'postgres'
+
+    if connection.vendor == 'sqlite':
+        key = (using, connection.settings_dict['NAME'])
+        if key not in _fts_available:
+            with connection.cursor() as cursor:
+                _fts_available[key] = FTS_TABLE in connection.introspection.table_names(cursor)
+        if _fts_available[key]:
+            return 'fts5'
+
+    return 'icontains'
+
+
+def search_products(queryset, query, match_any=False):
+    """
+    Filtra um queryset de Product pela busca textual e anota search_rank
+    (quanto maior, mais relevante). Ordene por '-search_rank' para ranking.
+
+    Por padrão todos os termos são obrigatórios; com match_any=True basta um
+    (usado para encontrar produtos com conteúdo parecido).
+    """
+    terms = _terms(query)
+    if not terms:
+        return queryset
+
+    backend = search_backend(queryset.db)
+    table = queryset.model._meta.db_table
+
+    if backend == 'fts5':
+        # Prefix match nos termos: "fone"* "blue"* (ou "fone"* OR "blue"* com match_any)
+        match = (' OR ' if match_any else ' ').join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in FTS_WEIGHTS)
+        return queryset.extra(
+            tables=[FTS_TABLE],
+            where=[f'{FTS_TABLE}.rowid = {table}.id', f'{FTS_TABLE} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'-bm25({FTS_TABLE}, {weights})'},
+        )
+
+    if backend == 'postgres':
+        tsquery = (' | ' if match_any else ' & ').join(f"'{term}':*" for term in terms)
+        document = _pg_document(table)
+        return queryset.extra(
+            where=[f"{document} @@ to_tsquery('{PG_CONFIG}'::regconfig, %s)"],
+            params=[tsquery],
+            select={'search_rank': f"ts_rank({document}, to_tsquery('{PG_CONFIG}'::regconfig, %s))"},
+            select_params=[tsquery],
+        )
+
+    condition = Q()
+    for term in terms:
+        term_condition = (
+            Q(name__icontains=term) |
+            Q(description__icontains=term) |
+            Q(category__icontains=term)
+        )
+        condition = condition | term_condition if match_any else condition & term_condition
+    return queryset.filter(condition).extra(select={'search_rank': '0'})
@@ -0,0 +1,84 @@
+"""
+Signals do app: mantêm os dados pré-calculados coerentes com o catálogo.
+"""
+from decimal import Decimal
+
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .catalog_cache import bump_catalog_version
+from .categories import adjust_category_stats
+from .models import Product, ProductStats
+from .related import invalidate_lists_for
+
+# Campos de Product exibidos nas listagens e nas listas de relacionados
+CATALOG_FIELDS = {'name', 'description', 'category', 'price', 'image_url'}
+
+# Campos de Product agregados em CategoryStats
+CATEGORY_FIELDS = {'category', 'price'}
+
+
+def _price(value):
+    # O preço pode chegar como str/float em Product.objects.create(price=...)
+    return Decimal(str(value or 0))
+
+
+def _product_views(product_id):
+    return ProductStats.objects.filter(product_id=product_id).values_list('view_count', flat=True).first() or 0
+
+
+@receiver(pre_save, sender=Product)
+def product_before_save(sender, instance, update_fields=None, **kwargs):
+    """Guarda categoria e preço anteriores para ajustar CategoryStats depois do save"""
+    instance._category_previous = None
+    if instance.pk is None or instance._state.adding:
+        return
+    if update_fields is not None and not CATEGORY_FIELDS.intersection(update_fields):
+        return
+    instance._category_previous = Product.objects.filter(pk=instance.pk).values_list('category', 'price').first()
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Produto novo ou alterado: listas de relacionados e fragmentos do catálogo ficam desatualizados"""
+    if update_fields is not None and not CATALOG_FIELDS.intersection(update_fields):
+        return
+
+    previous = getattr(instance, '_category_previous', None)
+    # Categorias em que o produto entrou: pode aparecer nas listas dos produtos de lá
+    entered_categories = []
+    if created:
+        adjust_category_stats(instance.category, product_count=1, price_sum=_price(instance.price))
+        entered_categories.append(instance.category)
+    elif previous is not None:
+        category, price = previous
+        if category != instance.category:
+            views = _product_views(instance.pk)
+            adjust_category_stats(category, product_count=-1, price_sum=-price, total_views=-views)
+            adjust_category_stats(instance.category, product_count=1, price_sum=_price(instance.price), total_views=views)
+            entered_categories.append(instance.category)
+        elif price != _price(instance.price):
+            adjust_category_stats(instance.category, price_sum=_price(instance.price) - price)
+
+    invalidate_lists_for([instance.pk], entered_categories)
+    bump_catalog_version()
+
+
+@receiver(pre_delete, sender=Product)
+def product_before_delete(sender, instance, **kwargs):
+    """As estatísticas do produto são removidas em cascata: guarda as visualizações antes"""
+    instance._category_views = _product_views(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    """Produto removido: tira ele das listas de relacionados e das listagens em cache"""
+    adjust_category_stats(
+        instance.category,
+        product_count=-1,
+        price_sum=-_price(instance.price),
+        total_views=-getattr(instance, '_category_views', 0),
+    )
+    # A lista do próprio produto sai em cascata; as que o exibiam ficam sem ele
+    invalidate_lists_for([instance.pk])
+    bump_catalog_version()
@@ -0,0 +1,68 @@
+"""
+Tempo de importação na inicialização (python -X importtime).
+
+Roda, num processo novo, o que todo comando, teste e worker faz ao subir:
+django.setup() e a importação do URLconf (que importa as views). O relatório
+soma o tempo cumulativo dos módulos de primeiro nível e aponta as bibliotecas
+pesadas (HEAVY_MODULES) que não deveriam ser importadas nessa fase: elas são
+carregadas só no primeiro uso (ver get_recommender e get_ai_generator).
+
+Usado pelo comando startup_import_time e pelos testes, que impõem o orçamento
+settings.STARTUP_IMPORT_BUDGET (segundos).
+"""
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+
+# Stack de ML: segundos de importação (scikit-learn puxa o SciPy)
+HEAVY_MODULES = ('pandas', 'numpy', 'sklearn', 'scipy')
+
+STARTUP_SCRIPT = (
+    'import django; django.setup(); '
+    'from django.conf import settings; from importlib import import_module; '
+    'import_module(settings.ROOT_URLCONF)'
+)
+
+LINE_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def startup_budget():
+    return float(getattr(settings, 'STARTUP_IMPORT_BUDGET', 1.5))
+
+
+def parse_importtime(output):
+    """[(módulo, tempo próprio em s, tempo cumulativo em s, profundidade)] da saída do -X importtime"""
+    modules = []
+    for line in output.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us) / 1e6, int(cumulative_us) / 1e6, len(indent) // 2))
+    return modules
+
+
+def measure_startup(extra_imports=()):
+    """
+    Importa o projeto num processo novo com -X importtime e retorna o relatório:
+    total (s), módulos de primeiro nível mais lentos e bibliotecas pesadas importadas.
+    """
+    script = STARTUP_SCRIPT + ''.join(f'; import {module}' for module in extra_imports)
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    modules = parse_importtime(result.stderr)
+    top_level = [module for module in modules if module[3] == 0]
+    imported = {name for name, _, _, _ in modules}
+    return {
+        'total': sum(cumulative for _, _, cumulative, _ in top_level),
+        'modules': sorted(top_level, key=lambda module: module[2], reverse=True),
+        'heavy': sorted(
+            name for name in HEAVY_MODULES
+            if name in imported or any(module.startswith(name + '.') for module in imported)
+        ),
+    }
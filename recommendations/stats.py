@@ -0,0 +1,511 @@
+"""
+Registro de interações e manutenção incremental das estatísticas desnormalizadas.
+
+Todas as escritas de UserInteraction feitas pelas views passam por aqui para que
+ProductStats seja atualizado na mesma transação, usando expressões F() (sem
+condição de corrida entre requisições concorrentes).
+
+UserStats (dashboard) também é atualizado aqui, com a linha do usuário
+travada por select_for_update durante a atualização, assim como o total de
+visualizações por categoria (CategoryStats). As visualizações por produto de
+cada usuário ficam em UserProductViews (uma linha por usuário/produto), para
+que o custo de cada interação não cresça com o histórico do usuário.
+"""
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .catalog_cache import bump_catalog_version
+from .categories import increment_category_views, rebuild_category_stats
+from .models import Product, ProductStats, UserInteraction, UserProductViews, UserStats
+
+# Quantos itens o dashboard mostra em "recentes" e "mais vistos"
+RECENT_INTERACTIONS_SIZE = 10
+TOP_PRODUCTS_SIZE = 4
+
+# Tipo de interação -> chave em UserStats.category_counts
+CATEGORY_COUNTERS = {'view': 'view', 'wishlist': 'wishlist', 'rating': 'rating'}
+
+# Ids por consulta nos recálculos parciais (limite de parâmetros do SQLite)
+ID_BATCH_SIZE = 500
+
+
+def _id_batches(ids):
+    ids = sorted(set(ids))
+    return [ids[start:start + ID_BATCH_SIZE] for start in range(0, len(ids), ID_BATCH_SIZE)]
+
+
+def record_interaction(user, product, interaction_type, rating=None):
+    """
+    Registra uma interação do usuário e atualiza as estatísticas do produto.
+
+    Avaliações são únicas por usuário/produto: uma nova avaliação substitui a
+    anterior e apenas a diferença entra na soma das avaliações.
+
+    Retorna (interaction, created).
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        if interaction_type == 'rating':
+            interaction = UserInteraction.objects.select_for_update().filter(
+                user=user,
+                product=product,
+                interaction_type='rating'
+            ).first()
+
+            if interaction:
+                previous_rating = interaction.rating
+                interaction.rating = rating
+                interaction.timestamp = now
+                interaction.save(update_fields=['rating', 'timestamp'])
+                created = False
+            else:
+                previous_rating = None
+                interaction = UserInteraction.objects.create(
+                    user=user,
+                    product=product,
+                    interaction_type='rating',
+                    rating=rating,
+                    timestamp=now
+                )
+                created = True
+
+            increments = {
+                'rating_sum': (rating or 0) - (previous_rating or 0),
+                'rating_count': int(rating is not None) - int(previous_rating is not None),
+            }
+        else:
+            interaction = UserInteraction.objects.create(
+                user=user,
+                product=product,
+                interaction_type=interaction_type,
+                timestamp=now
+            )
+            created = True
+            increments = _increments_for(interaction_type)
+
+        increment_product_stats(product.pk, now, **increments)
+        if interaction_type == 'view':
+            increment_category_views({product.category: 1})
+        update_user_stats(user, product, interaction, created)
+
+    return interaction, created
+
+
+def record_interactions_bulk(interactions):
+    """
+    Grava em lote interações novas (não avaliações), com `product` já carregado
+    em cada objeto, e atualiza ProductStats/UserStats com poucas queries:
+    um INSERT em lote, um UPDATE por grupo de produtos com os mesmos
+    incrementos e um UPDATE por usuário.
+
+    Retorna a lista de interações gravadas.
+    """
+    if not interactions:
+        return []
+    if any(interaction.interaction_type == 'rating' for interaction in interactions):
+        raise ValueError('Avaliações devem ser registradas com record_interaction()')
+
+    interactions = sorted(interactions, key=lambda interaction: interaction.timestamp)
+
+    product_increments = {}
+    for interaction in interactions:
+        increments = product_increments.setdefault(interaction.product_id, {})
+        for field, value in _increments_for(interaction.interaction_type).items():
+            increments[field] = increments.get(field, 0) + value
+
+    category_views = {}
+    by_user = {}
+    for interaction in interactions:
+        if interaction.interaction_type == 'view':
+            category = interaction.product.category
+            category_views[category] = category_views.get(category, 0) + 1
+        by_user.setdefault(interaction.user_id, []).append(interaction)
+
+    with transaction.atomic():
+        UserInteraction.objects.bulk_create(interactions, batch_size=500)
+        increment_product_stats_bulk(product_increments, interactions[-1].timestamp)
+        increment_category_views(category_views)
+
+        for user_id, user_interactions in by_user.items():
+            stats = UserStats.objects.select_for_update().filter(user_id=user_id).first()
+            if stats is None:
+                build_user_stats(User(pk=user_id))
+                continue
+
+            view_counts = {}
+            for interaction in user_interactions:
+                if interaction.interaction_type == 'view':
+                    view_counts[interaction.product_id] = view_counts.get(interaction.product_id, 0) + 1
+            views = add_user_product_views(user_id, view_counts) if view_counts else {}
+            for interaction in user_interactions:
+                total = None
+                if interaction.interaction_type == 'view':
+                    views[interaction.product_id] += 1
+                    total = views[interaction.product_id]
+                _apply_user_interaction(stats, interaction.product, interaction, True, total)
+            stats.save()
+
+    return interactions
+
+
+def _increments_for(interaction_type):
+    """Contadores afetados por uma interação que não é avaliação"""
+    if interaction_type == 'view':
+        return {'view_count': 1}
+    if interaction_type == 'wishlist':
+        return {'wishlist_count': 1}
+    return {}
+
+
+def increment_product_stats(product_id, timestamp=None, **increments):
+    """
+    Soma os incrementos às estatísticas do produto com F(), criando a linha se necessário.
+
+    Ex.: increment_product_stats(10, view_count=1)
+    """
+    timestamp = timestamp or timezone.now()
+    updates = {field: F(field) + value for field, value in increments.items() if value}
+    updates['last_interaction_at'] = timestamp
+
+    if ProductStats.objects.filter(product_id=product_id).update(**updates):
+        return
+
+    try:
+        # Primeira interação do produto: cria a linha já com os incrementos
+        with transaction.atomic():
+            ProductStats.objects.create(
+                product_id=product_id,
+                last_interaction_at=timestamp,
+                **{field: value for field, value in increments.items() if value}
+            )
+    except IntegrityError:
+        # Outra requisição criou a linha primeiro
+        ProductStats.objects.filter(product_id=product_id).update(**updates)
+
+
+def increment_product_stats_bulk(increments_by_product, timestamp=None):
+    """
+    Versão em lote de increment_product_stats: {product_id: {campo: incremento}}.
+
+    Cria as linhas que faltam e agrupa os produtos com os mesmos incrementos
+    em um único UPDATE (ex.: todos os produtos com exatamente 1 visualização).
+    """
+    timestamp = timestamp or timezone.now()
+    ProductStats.objects.bulk_create(
+        [ProductStats(product_id=product_id) for product_id in increments_by_product],
+        ignore_conflicts=True,
+    )
+
+    groups = {}
+    for product_id, increments in increments_by_product.items():
+        key = tuple(sorted((field, value) for field, value in increments.items() if value))
+        groups.setdefault(key, []).append(product_id)
+
+    for key, product_ids in groups.items():
+        updates = {field: F(field) + value for field, value in key}
+        updates['last_interaction_at'] = timestamp
+        ProductStats.objects.filter(product_id__in=product_ids).update(**updates)
+
+
+def get_product_stats(product):
+    """Retorna as estatísticas do produto (zeradas se ainda não houver interações)"""
+    try:
+        return product.stats
+    except ProductStats.DoesNotExist:
+        return ProductStats(product=product)
+
+
+def rebuild_product_stats(product_ids=None):
+    """
+    Recalcula ProductStats a partir de UserInteraction (backfill/reconciliação).
+
+    Rodado periodicamente (comando rebuild_product_stats), também renova os
+    fragmentos do catálogo em cache.
+
+    Retorna o número de produtos processados.
+    """
+    if product_ids is None:
+        total = _rebuild_product_stats(Product.objects.all())
+    else:
+        total = sum(
+            _rebuild_product_stats(Product.objects.filter(id__in=batch))
+            for batch in _id_batches(product_ids)
+        )
+    # Totais de visualizações por categoria vêm de ProductStats
+    rebuild_category_stats()
+    # Listagens em cache mostram visualizações/avaliações: passam a usar os números novos
+    bump_catalog_version()
+    return total
+
+
+def _rebuild_product_stats(products):
+    aggregates = products.annotate(
+        total_views=Count('userinteraction', filter=Q(userinteraction__interaction_type='view')),
+        total_wishlist=Count('userinteraction', filter=Q(userinteraction__interaction_type='wishlist')),
+        total_rating_sum=Sum(
+            'userinteraction__rating',
+            filter=Q(userinteraction__interaction_type='rating')
+        ),
+        total_rating_count=Count(
+            'userinteraction',
+            filter=Q(userinteraction__interaction_type='rating', userinteraction__rating__isnull=False)
+        ),
+        last_interaction=Max('userinteraction__timestamp'),
+    ).values_list(
+        'id', 'total_views', 'total_wishlist', 'total_rating_sum',
+        'total_rating_count', 'last_interaction'
+    ).order_by()
+
+    stats = [
+        ProductStats(
+            product_id=product_id,
+            view_count=views,
+            wishlist_count=wishlist,
+            rating_sum=rating_sum or 0,
+            rating_count=rating_count,
+            last_interaction_at=last_interaction,
+        )
+        for product_id, views, wishlist, rating_sum, rating_count, last_interaction in aggregates.iterator()
+    ]
+
+    ProductStats.objects.bulk_create(
+        stats,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=['view_count', 'wishlist_count', 'rating_sum', 'rating_count', 'last_interaction_at'],
+    )
+    return len(stats)
+
+
+# ---------------------------------------------------------------------------
+# Estatísticas por usuário (dashboard)
+# ---------------------------------------------------------------------------
+
+def _product_card(product, view_count):
+    return {
+        'id': product.pk,
+        'name': product.name,
+        'category': product.category,
+        'price': str(product.price),
+        'image_url': product.image_url,
+        'view_count': view_count,
+    }
+
+
+def _recent_entry(interaction, product):
+    return {
+        'product': {'id': product.pk, 'name': product.name},
+        'interaction_type': interaction.interaction_type,
+        'rating': interaction.rating,
+        'created_at': interaction.timestamp.isoformat() if interaction.timestamp else None,
+    }
+
+
+def _top_product_order(card):
+    return (-card['view_count'], -card['id'])
+
+
+def _empty_category_counts():
+    return {counter: 0 for counter in CATEGORY_COUNTERS.values()}
+
+
+def add_user_product_views(user_id, counts):
+    """
+    Soma visualizações em UserProductViews ({product_id: novas visualizações}).
+
+    Toca só as linhas dos produtos informados; deve rodar com a linha de
+    UserStats do usuário travada. Retorna {product_id: total anterior}.
+    """
+    rows = {
+        row.product_id: row
+        for row in UserProductViews.objects.filter(user_id=user_id, product_id__in=list(counts))
+    }
+    previous = {product_id: rows[product_id].view_count if product_id in rows else 0 for product_id in counts}
+
+    for product_id, row in rows.items():
+        row.view_count += counts[product_id]
+    if rows:
+        UserProductViews.objects.bulk_update(rows.values(), ['view_count'])
+    UserProductViews.objects.bulk_create([
+        UserProductViews(user_id=user_id, product_id=product_id, view_count=views)
+        for product_id, views in counts.items() if product_id not in rows
+    ])
+    return previous
+
+
+def _apply_user_interaction(stats, product, interaction, created, views=None):
+    """
+    Aplica uma interação em UserStats (em memória, sem salvar). Em visualizações,
+    `views` é o total de visualizações do produto pelo usuário já com esta.
+    """
+    interaction_type = interaction.interaction_type
+    if created:
+        stats.total_interactions += 1
+        if interaction_type == 'view':
+            stats.total_views += 1
+        elif interaction_type == 'wishlist':
+            stats.wishlist_count += 1
+        elif interaction_type == 'rating':
+            stats.ratings_count += 1
+
+        if product.category:
+            counts = stats.category_counts.setdefault(product.category, _empty_category_counts())
+            counter = CATEGORY_COUNTERS.get(interaction_type)
+            if counter:
+                counts[counter] = counts.get(counter, 0) + 1
+
+    if interaction_type == 'view':
+        top = [card for card in stats.top_products if card['id'] != product.pk]
+        if len(top) < TOP_PRODUCTS_SIZE or (views, product.pk) > (top[-1]['view_count'], top[-1]['id']):
+            top.append(_product_card(product, views))
+        top.sort(key=_top_product_order)
+        stats.top_products = top[:TOP_PRODUCTS_SIZE]
+
+    # Avaliação atualizada sobe para o topo, como a linha com timestamp novo
+    recent = [
+        entry for entry in stats.recent_interactions
+        if created or not (entry['product']['id'] == product.pk and entry['interaction_type'] == interaction_type)
+    ]
+    recent.insert(0, _recent_entry(interaction, product))
+    stats.recent_interactions = recent[:RECENT_INTERACTIONS_SIZE]
+
+
+def update_user_stats(user, product, interaction, created):
+    """
+    Aplica uma interação recém-registrada em UserStats.
+
+    Deve rodar na mesma transação da escrita da interação. Se o usuário ainda
+    não tem estatísticas, elas são calculadas do zero (já incluindo a interação).
+    """
+    stats = UserStats.objects.select_for_update().filter(user=user).first()
+    if stats is None:
+        return build_user_stats(user)
+
+    views = None
+    if interaction.interaction_type == 'view':
+        views = add_user_product_views(user.pk, {product.pk: 1})[product.pk] + 1
+    _apply_user_interaction(stats, product, interaction, created, views)
+    stats.save()
+    return stats
+
+
+def build_user_stats(user):
+    """Calcula UserStats do usuário a partir de UserInteraction e salva"""
+    user_interactions = UserInteraction.objects.filter(user=user)
+
+    # Todos os contadores em uma única agregação condicional
+    counters = user_interactions.aggregate(
+        total_views=Count('id', filter=Q(interaction_type='view')),
+        wishlist_count=Count('id', filter=Q(interaction_type='wishlist')),
+        ratings_count=Count('id', filter=Q(interaction_type='rating')),
+        total_interactions=Count('id'),
+    )
+
+    category_counts = {}
+    for row in user_interactions.exclude(product__category='').values('product__category').annotate(
+        view=Count('id', filter=Q(interaction_type='view')),
+        wishlist=Count('id', filter=Q(interaction_type='wishlist')),
+        rating=Count('id', filter=Q(interaction_type='rating')),
+    ).order_by():
+        category_counts[row['product__category']] = {
+            counter: row[counter] for counter in CATEGORY_COUNTERS.values()
+        }
+
+    # Visualizações por produto: tabela refeita do zero (reconciliação)
+    product_views = dict(
+        user_interactions.filter(interaction_type='view').values('product_id').annotate(
+            views=Count('id')
+        ).values_list('product_id', 'views').order_by()
+    )
+    UserProductViews.objects.filter(user=user).delete()
+    UserProductViews.objects.bulk_create([
+        UserProductViews(user=user, product_id=product_id, view_count=views)
+        for product_id, views in product_views.items()
+    ], batch_size=500)
+
+    top_ids = sorted(product_views, key=lambda product_id: (-product_views[product_id], -product_id))[:TOP_PRODUCTS_SIZE]
+    top_products = sorted(
+        (_product_card(product, product_views[product.pk])
+         for product in Product.objects.filter(id__in=top_ids)),
+        key=_top_product_order
+    )
+
+    recent_interactions = [
+        _recent_entry(interaction, interaction.product)
+        for interaction in user_interactions.select_related('product').order_by('-timestamp')[:RECENT_INTERACTIONS_SIZE]
+    ]
+
+    stats, _ = UserStats.objects.update_or_create(
+        user=user,
+        defaults={
+            **counters,
+            'category_counts': category_counts,
+            'top_products': top_products,
+            'recent_interactions': recent_interactions,
+        },
+    )
+    return stats
+
+
+def get_user_stats(user):
+    """Retorna UserStats do usuário, calculando na primeira vez"""
+    try:
+        return user.interaction_stats
+    except UserStats.DoesNotExist:
+        return build_user_stats(user)
+
+
+def rebuild_user_stats(user_ids=None):
+    """
+    Recalcula UserStats dos usuários com interações (ou dos informados, mesmo
+    que tenham ficado sem interações).
+
+    Retorna o número de usuários processados.
+    """
+    if user_ids is None:
+        batches = [User.objects.filter(id__in=UserInteraction.objects.values('user_id'))]
+    else:
+        batches = [User.objects.filter(id__in=batch) for batch in _id_batches(user_ids)]
+
+    total = 0
+    for users in batches:
+        for user in users.only('id').order_by('id').iterator():
+            build_user_stats(user)
+            total += 1
+    return total
+
+
+def dashboard_data(stats):
+    """Dados de UserStats no formato que o template do dashboard espera"""
+    category_stats = sorted(
+        (
+            {
+                'category': category,
+                'view_count': counts.get('view', 0),
+                'wishlist_count': counts.get('wishlist', 0),
+                'rating_count': counts.get('rating', 0),
+            }
+            for category, counts in stats.category_counts.items()
+        ),
+        key=lambda stat: (-stat['view_count'], stat['category'])
+    )
+
+    recent_interactions = [
+        {**entry, 'created_at': parse_datetime(entry['created_at']) if entry.get('created_at') else None}
+        for entry in stats.recent_interactions
+    ]
+
+    return {
+        'total_views': stats.total_views,
+        'wishlist_count': stats.wishlist_count,
+        'ratings_count': stats.ratings_count,
+        'total_interactions': stats.total_interactions,
+        'recent_interactions': recent_interactions,
+        'most_viewed_products': stats.top_products,
+        'category_stats': category_stats,
+    }
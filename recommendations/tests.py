@@ -1,3 +1,1684 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
 
-# Create your tests here.
+import httpx
+from django.conf import settings
+from django.contrib.auth.models import Permission, User
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from . import ingestion, views
+from .ai_generator import AIGenerator, get_ai_generator
+from .ai_providers import FakeProvider, get_provider
+from .bulk_generation import BulkDescriptionGenerator, TokenBucket
+from .catalog_cache import get_catalog_version
+from .categories import rebuild_category_stats
+from .circuit_breaker import CircuitBreaker
+from .db_router import PrimaryReplicaRouter
+from .ingestion import get_buffer, reset_buffer
+from .models import CatalogVersion, CategoryStats, DescriptionGenerationJob, Product, ProductStats, RelatedProducts, UserInteraction, UserProductViews, UserStats
+from .pagination import SORT_KEYS, KeysetPaginator
+from .query_plans import find_full_scans, query_plans
+from .related import get_related_products, rebuild_related_products
+from .ml_models.recommender import HybridRecommender, get_recommender
+from .search import search_backend, search_products
+from .startup import measure_startup, startup_budget
+from .views import with_product_stats
+from .stats import build_user_stats, rebuild_product_stats, rebuild_user_stats, record_interaction
+
+
+class CatalogFixtureMixin:
+    """Catálogo realista: várias categorias, usuários e interações por produto"""
+
+    PRODUCTS_PER_CATEGORY = 15
+    CATEGORIES = ['Eletrônicos', 'Livros', 'Casa', 'Roupas']
+    USERS = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cliente', password='senha-teste-123')
+        others = [
+            User.objects.create_user(f'usuario{i}', password='senha-teste-123')
+            for i in range(cls.USERS - 1)
+        ]
+
+        products = []
+        for category in cls.CATEGORIES:
+            for i in range(cls.PRODUCTS_PER_CATEGORY):
+                products.append(Product(
+                    name=f'{category} {i}',
+                    description=f'Descrição do produto {i} da categoria {category}',
+                    category=category,
+                    price=Decimal('10.00') + i,
+                ))
+        Product.objects.bulk_create(products)
+        cls.products = list(Product.objects.order_by('id'))
+
+        interactions = []
+        for index, product in enumerate(cls.products):
+            for user in [cls.user] + others:
+                interactions.append(UserInteraction(user=user, product=product, interaction_type='view'))
+                if index % 3 == 0:
+                    interactions.append(UserInteraction(
+                        user=user, product=product, interaction_type='rating', rating=(index % 5) + 1,
+                    ))
+                if index % 4 == 0:
+                    interactions.append(UserInteraction(user=user, product=product, interaction_type='wishlist'))
+        UserInteraction.objects.bulk_create(interactions)
+        rebuild_product_stats()
+        rebuild_related_products()
+        rebuild_user_stats()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+
+class QueryBudgetTests(CatalogFixtureMixin, TestCase):
+    """
+    Orçamento fixo de queries por view. Um N+1 (query por produto da página)
+    estoura o orçamento e quebra o build em vez de virar latência em produção.
+    """
+
+    def assertQueryBudget(self, budget, url, data=None):
+        # Sessão e usuário autenticado contam 2 queries em todas as views (e a
+        # versão do catálogo mais 1 nas listagens)
+        with self.assertNumQueries(budget):
+            response = self.client.get(url, data or {})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_product_explorer_budget(self):
+        response = self.assertQueryBudget(7, reverse('recommendations:product_explorer'))
+        self.assertEqual(len(response.context['products']), 12)
+        self.assertEqual(len(response.context['popular_products']), 8)
+
+    def test_product_explorer_search_and_popular_sort_budget(self):
+        self.assertQueryBudget(7, reverse('recommendations:product_explorer'), {
+            'search': 'Livros', 'sort': 'popular',
+        })
+
+    def test_product_explorer_next_page_budget(self):
+        url = reverse('recommendations:product_explorer')
+        first = self.client.get(url, {'sort': 'price_low'})
+        # Total, populares e categorias ficam em cache: só a versão do catálogo e a página nova vão ao banco
+        self.assertQueryBudget(4, url, {
+            'sort': 'price_low', 'cursor': first.context['page_obj'].next_cursor,
+        })
+
+    def test_product_explorer_stats_are_annotated(self):
+        response = self.client.get(reverse('recommendations:product_explorer'))
+        product = response.context['products'][0]
+        self.assertEqual(product.view_count, self.USERS)
+
+    def test_product_detail_budget(self):
+        product = self.products[0]
+        response = self.assertQueryBudget(4, reverse('recommendations:product_detail', args=[product.id]))
+        self.assertEqual(response.context['view_count'], self.USERS)
+        self.assertEqual(response.context['wishlist_count'], self.USERS)
+        self.assertEqual(len(response.context['same_category_products']), 4)
+
+    def test_category_products_budget(self):
+        response = self.assertQueryBudget(6, reverse('recommendations:category_products', args=['Livros']))
+        self.assertEqual(response.context['total_products'], self.PRODUCTS_PER_CATEGORY)
+        self.assertEqual(response.context['total_views'], self.PRODUCTS_PER_CATEGORY * self.USERS)
+
+    def test_user_dashboard_budget(self):
+        response = self.assertQueryBudget(4, reverse('recommendations:user_dashboard'))
+        self.assertEqual(response.context['total_views'], len(self.products))
+        self.assertEqual(len(response.context['recent_interactions']), 10)
+        self.assertEqual(len(response.context['most_viewed_products']), 4)
+        self.assertEqual(len(response.context['category_stats']), len(self.CATEGORIES))
+
+    def test_get_recommendations_budget(self):
+        # ETag, versão do catálogo, ranking por popularidade (fallback, sem query
+        # por produto) e payloads dos produtos recomendados
+        response = self.assertQueryBudget(6, reverse('recommendations:get_recommendations'))
+        self.assertEqual(len(response.json()['recommendations']), 10)
+
+    def test_get_recommendations_ajax_budget(self):
+        response = self.assertQueryBudget(6, reverse('recommendations:get_recommendations_ajax'))
+        self.assertEqual(len(response.json()['recommendations']), 12)
+
+    def test_get_product_data_budget(self):
+        product = self.products[0]
+        # Versão (updated_at) e payload do produto
+        response = self.assertQueryBudget(4, reverse('recommendations:get_product_data', args=[product.id]))
+        self.assertEqual(response.json()['product']['id'], product.id)
+
+    def test_product_stats_api_budget(self):
+        product = self.products[0]
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('recommendations:product_stats_api', args=[product.id]))
+        data = response.json()
+        self.assertEqual(data['view_count'], self.USERS)
+        self.assertEqual(data['rating_count'], self.USERS)
+
+
+class CatalogFragmentCacheTests(CatalogFixtureMixin, TestCase):
+
+    def test_repeated_explorer_request_renders_from_cache(self):
+        url = reverse('recommendations:product_explorer')
+        self.client.get(url, {'sort': 'price_low'})
+        # Sessão, usuário e versão do catálogo: total, populares, categorias e página vêm do cache
+        with self.assertNumQueries(3):
+            response = self.client.get(url, {'sort': 'price_low'})
+        self.assertContains(response, 'Eletrônicos 0')
+        self.assertContains(response, f'Todos ({len(self.products)})')
+
+    def test_repeated_category_request_renders_from_cache(self):
+        url = reverse('recommendations:category_products', args=['Livros'])
+        self.client.get(url)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, 'Livros 14')
+
+    def test_product_change_bumps_catalog_version(self):
+        url = reverse('recommendations:product_explorer')
+        self.client.get(url)
+        version = get_catalog_version()
+
+        product = self.products[-1]
+        product.name = 'Produto Renomeado'
+        product.save()
+
+        self.assertGreater(get_catalog_version(), version)
+        self.assertContains(self.client.get(url), 'Produto Renomeado')
+
+    def test_catalog_version_is_shared_through_the_database(self):
+        self.products[0].save()
+        version = get_catalog_version()
+        self.assertGreater(version, 1)
+        # Um worker com o cache local vazio (outro processo) vê a mesma versão
+        cache.clear()
+        self.assertEqual(get_catalog_version(), version)
+        self.assertEqual(CatalogVersion.objects.get().version, version)
+
+    def test_stats_refresh_bumps_catalog_version(self):
+        version = get_catalog_version()
+        rebuild_product_stats()
+        self.assertGreater(get_catalog_version(), version)
+
+
+class ProductPayloadCacheTests(CatalogFixtureMixin, TestCase):
+
+    def test_product_data_served_from_cached_fragment(self):
+        product = self.products[0]
+        url = reverse('recommendations:get_product_data', args=[product.id])
+        first = self.client.get(url).json()
+        # Sessão, usuário e o updated_at do produto: o payload vem pronto do cache
+        with self.assertNumQueries(3):
+            second = self.client.get(url).json()
+        self.assertEqual(first, second)
+        self.assertEqual(second['product']['name'], product.name)
+        self.assertEqual(second['product']['price'], str(product.price))
+
+    def test_fragment_invalidated_by_updated_at(self):
+        product = self.products[0]
+        url = reverse('recommendations:get_product_data', args=[product.id])
+        self.client.get(url)
+
+        product.name = 'Nome Atualizado'
+        product.save()
+        self.assertEqual(self.client.get(url).json()['product']['name'], 'Nome Atualizado')
+
+    def test_recommendations_keep_ranking_order(self):
+        ranked = list(reversed(self.products[:5]))
+        url = reverse('recommendations:get_recommendations_ajax')
+        with mock.patch.object(views.recommender, 'recommend_for_user', return_value=ranked):
+            self.client.get(url)
+            data = self.client.get(url).json()
+
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual([item['id'] for item in data['recommendations']], [p.id for p in ranked])
+        self.assertEqual(data['recommendations'][0]['image_url'], '/static/images/default-product.jpg')
+
+    def test_missing_product_returns_error(self):
+        response = self.client.get(reverse('recommendations:get_product_data', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['status'], 'error')
+
+
+class ConditionalGetTests(CatalogFixtureMixin, TestCase):
+
+    def test_recommendations_not_modified_skips_recommender(self):
+        url = reverse('recommendations:get_recommendations_ajax')
+        with mock.patch.object(views.recommender, 'recommend_for_user', return_value=self.products[:3]) as recommend:
+            first = self.client.get(url)
+            etag = first['ETag']
+            second = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second['ETag'], etag)
+        self.assertEqual(recommend.call_count, 1)
+
+    def test_recommendations_etag_changes_with_new_interaction(self):
+        url = reverse('recommendations:get_recommendations_ajax')
+        with mock.patch.object(views.recommender, 'recommend_for_user', return_value=self.products[:3]):
+            etag = self.client.get(url)['ETag']
+            UserInteraction.objects.create(user=self.user, product=self.products[1], interaction_type='view')
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_recommendations_etag_uses_persisted_model_version(self):
+        url = reverse('recommendations:get_recommendations_ajax')
+        with mock.patch.object(views.recommender, 'recommend_for_user', return_value=self.products[:3]), \
+                mock.patch.object(views.recommender, 'current_version', side_effect=['v1', 'v2']):
+            etag = self.client.get(url)['ETag']
+            # Outro worker treinou e gravou um modelo novo
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_trained_model_is_shared_between_workers(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(RECOMMENDER_MODEL_PATH=directory):
+            trainer, worker = HybridRecommender(), HybridRecommender()
+            self.assertEqual(worker.current_version(), 'untrained')
+            trainer.train(Product.objects.all(), UserInteraction.objects.select_related('user', 'product'))
+
+            self.assertEqual(worker.current_version(), trainer.model_version)
+            self.assertTrue(worker.is_trained)
+            self.assertEqual(worker.user_ids, trainer.user_ids)
+
+    def test_product_stats_not_modified_until_stats_change(self):
+        product = self.products[0]
+        url = reverse('recommendations:product_stats_api', args=[product.id])
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        ProductStats.objects.filter(product=product).update(view_count=100)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['view_count'], 100)
+
+    def test_product_stats_unknown_product_is_404_without_etag(self):
+        response = self.client.get(reverse('recommendations:product_stats_api', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+
+# Eventos gravados antes da resposta, para conferir as estatísticas logo em seguida
+SYNC_INGESTION = {'DURABILITY': 'sync', 'FLUSH_THREAD': False}
+
+
+@override_settings(INTERACTION_INGESTION=SYNC_INGESTION)
+class ProductStatsTests(CatalogFixtureMixin, TestCase):
+
+    def record(self, product, interaction_type, rating=None):
+        data = {'product_id': product.id, 'interaction_type': interaction_type}
+        if rating is not None:
+            data['rating'] = rating
+        response = self.client.post(reverse('recommendations:record_interaction_api'), data)
+        self.assertEqual(response.json()['status'], 'success')
+
+    def test_interactions_update_stats_incrementally(self):
+        product = self.products[1]
+        self.record(product, 'view')
+        self.record(product, 'wishlist')
+        self.record(product, 'rating', 4)
+
+        stats = ProductStats.objects.get(product=product)
+        self.assertEqual(stats.view_count, self.USERS + 1)
+        self.assertEqual(stats.wishlist_count, 1)
+        self.assertEqual(stats.rating_count, 1)
+        self.assertEqual(stats.rating_sum, 4)
+        self.assertIsNotNone(stats.last_interaction_at)
+
+    def test_rating_update_replaces_previous_rating(self):
+        product = self.products[1]
+        self.record(product, 'rating', 2)
+        self.record(product, 'rating', 5)
+
+        stats = ProductStats.objects.get(product=product)
+        self.assertEqual(stats.rating_count, 1)
+        self.assertEqual(stats.rating_sum, 5)
+
+    def test_rebuild_matches_incremental_updates(self):
+        product = self.products[2]
+        self.record(product, 'view')
+        self.record(product, 'rating', 3)
+        incremental = ProductStats.objects.get(product=product)
+
+        ProductStats.objects.all().delete()
+        rebuild_product_stats()
+        rebuilt = ProductStats.objects.get(product=product)
+
+        for field in ['view_count', 'wishlist_count', 'rating_sum', 'rating_count']:
+            self.assertEqual(getattr(rebuilt, field), getattr(incremental, field))
+
+
+@override_settings(INTERACTION_INGESTION=SYNC_INGESTION)
+class UserStatsTests(CatalogFixtureMixin, TestCase):
+
+    FIELDS = [
+        'total_views', 'wishlist_count', 'ratings_count', 'total_interactions',
+        'category_counts', 'top_products', 'recent_interactions',
+    ]
+
+    def record(self, product, interaction_type, rating=None):
+        data = {'product_id': product.id, 'interaction_type': interaction_type}
+        if rating is not None:
+            data['rating'] = rating
+        response = self.client.post(reverse('recommendations:record_interaction_api'), data)
+        self.assertEqual(response.json()['status'], 'success')
+
+    def test_interactions_update_user_stats_incrementally(self):
+        product = self.products[1]
+        before = UserStats.objects.get(user=self.user)
+        self.record(product, 'view')
+        self.record(product, 'view')
+        self.record(product, 'wishlist')
+
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.total_views, before.total_views + 2)
+        self.assertEqual(stats.wishlist_count, before.wishlist_count + 1)
+        self.assertEqual(stats.total_interactions, before.total_interactions + 3)
+        self.assertEqual(stats.top_products[0]['id'], product.id)
+        self.assertEqual(stats.top_products[0]['view_count'], 3)
+        self.assertEqual(stats.recent_interactions[0]['interaction_type'], 'wishlist')
+
+    def test_rebuild_matches_incremental_updates(self):
+        product = self.products[2]
+        self.record(product, 'view')
+        self.record(product, 'rating', 2)
+        self.record(product, 'rating', 5)
+        self.record(self.products[5], 'wishlist')
+        incremental = UserStats.objects.get(user=self.user)
+        views = set(UserProductViews.objects.filter(user=self.user).values_list('product_id', 'view_count'))
+        self.assertIn((product.id, 2), views)
+
+        rebuilt = build_user_stats(self.user)
+        for field in self.FIELDS:
+            self.assertEqual(getattr(rebuilt, field), getattr(incremental, field), field)
+        self.assertEqual(
+            set(UserProductViews.objects.filter(user=self.user).values_list('product_id', 'view_count')), views
+        )
+
+    def test_dashboard_builds_missing_stats(self):
+        UserStats.objects.all().delete()
+        response = self.client.get(reverse('recommendations:user_dashboard'))
+        self.assertEqual(response.context['total_views'], len(self.products))
+        self.assertTrue(UserStats.objects.filter(user=self.user).exists())
+
+
+@override_settings(INTERACTION_INGESTION={
+    'DURABILITY': 'buffered', 'BATCH_SIZE': 50, 'MAX_BUFFER_SIZE': 100,
+    'MAX_EVENTS_PER_REQUEST': 60, 'FLUSH_INTERVAL': 60, 'FLUSH_THREAD': False,
+})
+class InteractionIngestionTests(CatalogFixtureMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        reset_buffer()
+        self.addCleanup(reset_buffer)
+
+    def post_events(self, events):
+        return self.client.post(
+            reverse('recommendations:record_interactions_bulk_api'),
+            {'events': events},
+            content_type='application/json',
+        )
+
+    def test_events_are_buffered_until_batch_size(self):
+        product = self.products[1]
+        response = self.post_events([{'product_id': product.id, 'interaction_type': 'view'}] * 10)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['accepted'], 10)
+        self.assertEqual(len(get_buffer()), 10)
+        self.assertEqual(ProductStats.objects.get(product=product).view_count, self.USERS)
+
+        # Atingir BATCH_SIZE grava tudo de uma vez
+        self.post_events([{'product_id': product.id, 'interaction_type': 'view'}] * 40)
+        self.assertEqual(len(get_buffer()), 0)
+        self.assertEqual(ProductStats.objects.get(product=product).view_count, self.USERS + 50)
+        self.assertEqual(UserProductViews.objects.get(user=self.user, product=product).view_count, 51)
+
+    def test_flush_writes_batch_with_few_queries(self):
+        events = [
+            {'product_id': product.id, 'interaction_type': 'view'}
+            for product in self.products[:40]
+        ]
+        self.post_events(events)
+        before = UserInteraction.objects.count()
+        # Produtos, usuários, INSERT, linhas de ProductStats, UPDATE agrupado, visualizações por
+        # categoria, UserStats (lock + save), UserProductViews (leitura + UPDATE
+        # agrupado) e os savepoints da transação
+        with self.assertNumQueries(12):
+            self.assertEqual(get_buffer().flush(), 40)
+        self.assertEqual(UserInteraction.objects.count(), before + 40)
+
+    def test_full_buffer_applies_backpressure(self):
+        product = self.products[1]
+        events = [{'product_id': product.id, 'interaction_type': 'click'}] * 40
+        with self.settings(INTERACTION_INGESTION={
+            'BATCH_SIZE': 1000, 'MAX_BUFFER_SIZE': 100, 'FLUSH_INTERVAL': 60, 'FLUSH_THREAD': False,
+        }):
+            self.assertEqual(self.post_events(events).status_code, 202)
+            self.assertEqual(self.post_events(events).status_code, 202)
+            response = self.post_events(events)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '60')
+            # O lote rejeitado não entra pela metade
+            self.assertEqual(len(get_buffer()), 80)
+
+    def test_invalid_events_are_rejected_individually(self):
+        response = self.post_events([
+            {'product_id': self.products[0].id, 'interaction_type': 'view'},
+            {'product_id': 'abc'},
+            {'product_id': self.products[0].id, 'interaction_type': 'desconhecido'},
+            {'product_id': self.products[0].id, 'interaction_type': 'rating', 'rating': 5},
+        ])
+        data = response.json()
+        self.assertEqual(data['accepted'], 2)
+        self.assertEqual([item['index'] for item in data['rejected']], [1, 2])
+        # Avaliações não passam pelo buffer
+        rating = UserInteraction.objects.get(user=self.user, product=self.products[0], interaction_type='rating')
+        self.assertEqual(rating.rating, 5)
+
+    def test_too_many_events_per_request(self):
+        response = self.post_events([{'product_id': self.products[0].id}] * 61)
+        self.assertEqual(response.status_code, 413)
+
+    def test_unknown_products_are_rejected(self):
+        response = self.post_events([{'product_id': 999999, 'interaction_type': 'view'}])
+        self.assertEqual(response.json()['rejected'][0]['status'], 404)
+        self.assertEqual(len(get_buffer()), 0)
+
+        response = self.client.post(
+            reverse('recommendations:record_interaction_api'),
+            {'product_id': 999999, 'interaction_type': 'view'},
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_events_of_deleted_users_are_dropped_on_flush(self):
+        other = User.objects.create_user('removido', password='x')
+        self.client.force_login(other)
+        self.post_events([{'product_id': self.products[0].id, 'interaction_type': 'view'}])
+        other.delete()
+        before = UserInteraction.objects.count()
+        self.assertEqual(get_buffer().flush(), 0)
+        self.assertEqual(UserInteraction.objects.count(), before)
+
+    def test_rows_refused_by_database_do_not_block_the_buffer(self):
+        events = [{'product_id': product.id, 'interaction_type': 'view'} for product in self.products[:10]]
+        self.post_events(events)
+        poison = self.products[3].id
+        write = ingestion.write_interactions
+
+        def refuse_poison(chunk):
+            if any(event.product_id == poison for event in chunk):
+                raise IntegrityError('FOREIGN KEY constraint failed')
+            return write(chunk)
+
+        with mock.patch.object(ingestion, 'write_interactions', side_effect=refuse_poison), \
+                self.assertLogs('recommendations.ingestion', 'ERROR'):
+            self.assertEqual(get_buffer().flush(), 9)
+        self.assertEqual(len(get_buffer()), 0)
+        self.assertEqual([event.product_id for event in get_buffer().dead_letters], [poison])
+
+    def test_transient_errors_requeue_the_batch(self):
+        self.post_events([{'product_id': self.products[0].id, 'interaction_type': 'view'}] * 5)
+        with mock.patch.object(ingestion, 'write_interactions', side_effect=OperationalError('database is locked')), \
+                self.assertLogs('recommendations.ingestion', 'ERROR'):
+            self.assertEqual(get_buffer().flush(), 0)
+        self.assertEqual(len(get_buffer()), 5)
+        self.assertEqual(get_buffer().flush(), 5)
+
+
+class KeysetPaginationTests(CatalogFixtureMixin, TestCase):
+
+    def walk(self, sort_by, per_page=7):
+        queryset = with_product_stats(Product.objects.all())
+        pages = []
+        page = KeysetPaginator(queryset, sort_by, per_page=per_page).get_page()
+        pages.append(page)
+        while page.has_next():
+            page = KeysetPaginator(queryset, sort_by, per_page=per_page).get_page(page.next_cursor)
+            pages.append(page)
+        return pages
+
+    def test_forward_walk_matches_full_ordering(self):
+        queryset = with_product_stats(Product.objects.all())
+        for sort_by, keys in SORT_KEYS.items():
+            ordering = [f'-{field}' if descending else field for field, descending in keys]
+            expected = list(queryset.order_by(*ordering).values_list('id', flat=True))
+            walked = [product.id for page in self.walk(sort_by) for product in page]
+            self.assertEqual(walked, expected, sort_by)
+
+    def test_previous_cursor_returns_previous_page(self):
+        pages = self.walk('price_high')
+        queryset = with_product_stats(Product.objects.all())
+        for index in range(len(pages) - 1, 0, -1):
+            previous = KeysetPaginator(queryset, 'price_high', per_page=7).get_page(pages[index].previous_cursor)
+            self.assertEqual(
+                [product.id for product in previous],
+                [product.id for product in pages[index - 1]],
+            )
+        self.assertFalse(pages[0].has_previous())
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        paginator = KeysetPaginator(Product.objects.all(), 'newest', per_page=5)
+        page = paginator.get_page('cursor-adulterado')
+        self.assertEqual(page[0], Product.objects.order_by('-id').first())
+        self.assertFalse(page.has_previous())
+
+
+class ProductSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.headphone = Product.objects.create(
+            name='Fone Bluetooth', description='Cancelamento de ruído', category='Áudio', price=199,
+        )
+        cls.speaker = Product.objects.create(
+            name='Caixa de Som', description='Som potente com bluetooth integrado', category='Áudio', price=299,
+        )
+        cls.book = Product.objects.create(
+            name='Livro de Receitas', description='Receitas rápidas', category='Livros', price=49,
+        )
+
+    def search(self, query):
+        return list(search_products(Product.objects.all(), query).order_by('-search_rank', '-id'))
+
+    def test_uses_indexed_backend_on_sqlite(self):
+        self.assertEqual(search_backend(), 'fts5')
+
+    def test_results_ranked_by_relevance(self):
+        # Termo no nome pesa mais que na descrição
+        self.assertEqual(self.search('bluetooth'), [self.headphone, self.speaker])
+
+    def test_prefix_and_accent_insensitive(self):
+        self.assertEqual(self.search('receit'), [self.book])
+        self.assertEqual(self.search('ruido'), [self.headphone])
+
+    def test_index_follows_product_changes(self):
+        self.book.name = 'Livro de Bluetooth'
+        self.book.save()
+        self.assertIn(self.book, self.search('bluetooth'))
+
+        self.speaker.delete()
+        self.assertNotIn(self.speaker, self.search('bluetooth'))
+
+        created = Product.objects.create(name='Teclado', description='Mecânico', category='Periféricos', price=10)
+        self.assertEqual(self.search('teclado mecanico'), [created])
+
+
+class CategoryStatsTests(CatalogFixtureMixin, TestCase):
+
+    def snapshot(self):
+        return {
+            row.name: (row.product_count, row.price_sum, row.total_views)
+            for row in CategoryStats.objects.all()
+        }
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        rebuild_category_stats()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_rebuild_materializes_categories(self):
+        stats = CategoryStats.objects.get(name='Livros')
+        self.assertEqual(stats.product_count, self.PRODUCTS_PER_CATEGORY)
+        self.assertEqual(stats.total_views, self.PRODUCTS_PER_CATEGORY * self.USERS)
+        self.assertEqual(stats.average_price, Decimal('17.00'))
+
+    def test_product_changes_update_incrementally(self):
+        product = Product.objects.create(name='Novo', description='', category='Jardim', price='30.00')
+        self.assertEqual(CategoryStats.objects.get(name='Jardim').product_count, 1)
+
+        moved = self.products[0]
+        moved.category = 'Jardim'
+        moved.price = Decimal('50.00')
+        moved.save()
+        self.assertEqual(CategoryStats.objects.get(name='Jardim').total_views, self.USERS)
+
+        product.price = Decimal('35.00')
+        product.save()
+        self.products[1].delete()
+        self.assertMatchesRebuild()
+
+    def test_views_update_category_totals(self):
+        product = self.products[0]
+        record_interaction(self.user, product, 'view')
+        record_interaction(self.user, product, 'wishlist')
+        self.assertEqual(
+            CategoryStats.objects.get(name=product.category).total_views,
+            self.PRODUCTS_PER_CATEGORY * self.USERS + 1,
+        )
+        self.assertMatchesRebuild()
+
+
+class RelatedProductsTests(CatalogFixtureMixin, TestCase):
+
+    def related_ids(self, product):
+        product = Product.objects.select_related('related_list').get(id=product.id)
+        return [item['id'] for item in product.related_list.items]
+
+    def test_list_mixes_same_category_and_similar_products(self):
+        product = Product.objects.create(
+            name='Livros 99 Casa', description='Estante', category='Livros', price=Decimal('20.00'),
+        )
+        rebuild_related_products([product.id])
+        items = RelatedProducts.objects.get(product=product).items
+        categories = {item['category'] for item in items}
+        self.assertIn('Livros', categories)
+        self.assertIn('Casa', categories)
+        self.assertNotIn(product.id, [item['id'] for item in items])
+
+    def test_rotation_returns_items_from_stored_list(self):
+        product = self.products[0]
+        stored = self.related_ids(product)
+        product = Product.objects.select_related('related_list').get(id=product.id)
+        with self.assertNumQueries(0):
+            related = get_related_products(product, count=4)
+        self.assertEqual(len(related), 4)
+        self.assertTrue({item['id'] for item in related} <= set(stored))
+
+    def lists_showing(self, product):
+        return {
+            related.product_id for related in RelatedProducts.objects.all()
+            if product.id in [item['id'] for item in related.items]
+        }
+
+    def test_catalog_changes_invalidate_only_affected_lists(self):
+        product = self.products[0]
+        other = self.products[self.PRODUCTS_PER_CATEGORY - 1]
+        showing = self.lists_showing(other)
+        self.assertIn(product.id, showing)
+        kept = set(RelatedProducts.objects.values_list('product_id', flat=True)) - showing - {other.id}
+        self.assertTrue(kept)
+
+        other.name = 'Nome novo'
+        other.save()
+        remaining = set(RelatedProducts.objects.values_list('product_id', flat=True))
+        self.assertEqual(remaining, kept)
+
+        # Lista refeita no próximo acesso, já com o nome atualizado
+        product = Product.objects.select_related('related_list').get(id=product.id)
+        names = {item['name'] for item in get_related_products(product, count=100)}
+        self.assertIn('Nome novo', names)
+
+        rebuild_related_products()
+        showing = self.lists_showing(other)
+        other.delete()
+        remaining = set(RelatedProducts.objects.values_list('product_id', flat=True))
+        self.assertFalse(remaining & showing)
+        self.assertEqual(len(remaining), len(self.products) - 1 - len(showing))
+        product = Product.objects.select_related('related_list').get(id=product.id)
+        ids = {item['id'] for item in get_related_products(product, count=100)}
+        self.assertNotIn(other.id, ids)
+
+    def test_description_update_keeps_unrelated_lists(self):
+        product = self.products[0]
+        showing = self.lists_showing(product)
+        product.description = 'Descrição gerada'
+        product.save(update_fields=['description', 'updated_at'])
+        self.assertEqual(RelatedProducts.objects.count(), len(self.products) - 1 - len(showing - {product.id}))
+        self.assertFalse(RelatedProducts.objects.filter(product_id__in=showing).exists())
+
+    def test_category_change_invalidates_new_category_lists(self):
+        product = self.products[0]
+        product.category = 'Casa'
+        product.save()
+        self.assertFalse(RelatedProducts.objects.filter(product__category='Casa').exists())
+        self.assertTrue(RelatedProducts.objects.filter(product__category='Roupas').exists())
+
+    def test_stats_only_save_keeps_lists(self):
+        product = self.products[0]
+        product.save(update_fields=['features'])
+        self.assertTrue(RelatedProducts.objects.filter(product=product).exists())
+
+
+class DatabaseRoutingTests(TestCase):
+
+    def test_sqlite_connection_pragmas(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('PRAGMAs específicos do SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            # NORMAL só com WAL ligado (SQLITE_WAL=1); senão fica o padrão FULL
+            self.assertEqual(cursor.fetchone()[0], 1 if settings.SQLITE_WAL else 2)
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertGreater(cursor.fetchone()[0], 0)
+
+    def test_without_replica_everything_goes_to_primary(self):
+        router = PrimaryReplicaRouter()
+        self.assertIsNone(router.db_for_read(Product))
+        self.assertEqual(router.db_for_write(Product), 'default')
+
+    def test_reads_go_to_replica_outside_transactions(self):
+        router = PrimaryReplicaRouter()
+        with mock.patch('recommendations.db_router.replica_enabled', return_value=True):
+            # O TestCase roda dentro de uma transação: simula o autocommit da view
+            with mock.patch.object(connection, 'in_atomic_block', False):
+                self.assertEqual(router.db_for_read(Product), 'replica')
+                self.assertEqual(router.db_for_write(Product), 'default')
+                self.assertFalse(router.allow_migrate('replica', 'recommendations'))
+
+            with transaction.atomic():
+                # Dentro de uma transação a leitura enxerga as próprias escritas
+                self.assertEqual(router.db_for_read(Product), 'default')
+
+    def test_sessions_auth_and_catalog_version_are_read_from_primary(self):
+        router = PrimaryReplicaRouter()
+        with mock.patch('recommendations.db_router.replica_enabled', return_value=True), \
+                mock.patch.object(connection, 'in_atomic_block', False):
+            for model in (Session, User, Permission, ContentType, CatalogVersion):
+                self.assertEqual(router.db_for_read(model), 'default', model)
+
+
+class QueryPlanTests(CatalogFixtureMixin, TestCase):
+
+    def test_main_view_queries_use_indexes(self):
+        offenders = find_full_scans(self.user.id, self.products[0].id)
+        self.assertEqual(offenders, {}, '\n\n'.join(
+            f'{name}:\n{sql}\n{plan}' for name, queries in offenders.items() for sql, plan in queries
+        ))
+
+    def test_plans_come_from_the_real_code_paths(self):
+        interactions = UserInteraction.objects.count()
+        checked = {name for name, _, _ in query_plans(self.user.id, self.products[0].id)}
+        self.assertTrue({
+            'views.product_detail', 'stats.record_interaction.rating', 'stats.build_user_stats',
+            'stats.rebuild_product_stats', 'etags.recommendations_etag',
+        } <= checked, checked)
+        # Os caminhos rodam numa transação desfeita
+        self.assertEqual(UserInteraction.objects.count(), interactions)
+
+    def test_full_scan_in_real_query_is_reported(self):
+        def unindexed_etag(user_id, model_version, variant):
+            return UserInteraction.objects.filter(interaction_type='view').count()
+
+        with mock.patch('recommendations.etags.recommendations_etag', unindexed_etag):
+            offenders = find_full_scans(self.user.id, self.products[0].id)
+        self.assertEqual(list(offenders), ['etags.recommendations_etag'])
+
+
+class QueryCountMiddlewareTests(CatalogFixtureMixin, TestCase):
+
+    def test_query_count_headers(self):
+        response = self.client.get(reverse('recommendations:product_explorer'))
+        self.assertEqual(response['X-DB-Query-Count'], '7')
+        self.assertGreaterEqual(float(response['X-DB-Query-Time']), 0)
+
+
+def fake_completion_transport(latency=0.0, content='Descrição gerada'):
+    """Transport httpx que responde como a API de chat, após `latency` segundos"""
+    async def handler(request):
+        await asyncio.sleep(latency)
+        return httpx.Response(200, json={'choices': [{'message': {'content': content}}]})
+    return httpx.MockTransport(handler)
+
+
+def completion_body(content='Descrição gerada'):
+    return {'choices': [{'message': {'content': content}}]}
+
+
+class StandInAPIServer:
+    """
+    Servidor HTTP local que faz o papel da API de chat nos testes.
+
+    `responses` é uma lista de (status, headers, corpo) devolvidos em ordem (o
+    último se repete). Um corpo em lista é enviado em streaming como a API faz
+    com stream=True: um evento SSE por trecho, a cada `stream_delay` segundos.
+    Guarda o endereço do cliente de cada requisição, para conferir o
+    reaproveitamento de conexões.
+    """
+
+    def __init__(self, responses, stream_delay=0.0):
+        self.responses = list(responses)
+        self.requests = []
+        server = self
+        stream_delay = stream_delay
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                server.requests.append((self.client_address, json.loads(self.rfile.read(length) or b'{}')))
+                index = min(len(server.requests), len(server.responses)) - 1
+                status, headers, body = server.responses[index]
+                if isinstance(body, list):
+                    return self.stream(status, headers, body)
+                payload = (body if isinstance(body, str) else json.dumps(body)).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def stream(self, status, headers, texts):
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                events = [
+                    'data: ' + json.dumps({'choices': [{'delta': {'content': text}}]}) + '\n\n'
+                    for text in texts
+                ] + ['data: [DONE]\n\n']
+                for event in events:
+                    chunk = event.encode()
+                    self.wfile.write(f'{len(chunk):x}\r\n'.encode() + chunk + b'\r\n')
+                    self.wfile.flush()
+                    time.sleep(stream_delay)
+                self.wfile.write(b'0\r\n\r\n')
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.httpd.server_port}/chat/completions'
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@override_settings(AI_RETRY_BACKOFF=0, AI_MAX_RETRIES=2, AI_CONNECT_TIMEOUT=1, AI_READ_TIMEOUT=5)
+class AIGeneratorHTTPTests(TestCase):
+
+    def generator_for(self, server):
+        generator = AIGenerator()
+        generator.api_key = 'chave-de-teste'
+        generator.api_url = server.url
+        return generator
+
+    def test_retries_server_errors_and_rate_limits(self):
+        responses = [
+            (503, {}, 'indisponível'),
+            (429, {'Retry-After': '0'}, 'limite'),
+            (200, {}, completion_body('Texto final')),
+        ]
+        with StandInAPIServer(responses) as server:
+            description = self.generator_for(server)._call_deepseek_api('prompt')
+        self.assertEqual(description, 'Texto final')
+        self.assertEqual(len(server.requests), 3)
+
+    def test_gives_up_after_max_retries(self):
+        with StandInAPIServer([(500, {}, 'erro')]) as server:
+            generator = self.generator_for(server)
+            with mock.patch.object(generator, '_creative_fallback_description_from_prompt', return_value='fallback'):
+                self.assertEqual(generator._call_deepseek_api('prompt'), 'fallback')
+        # Tentativa original + AI_MAX_RETRIES
+        self.assertEqual(len(server.requests), 3)
+
+    def test_client_errors_are_not_retried(self):
+        with StandInAPIServer([(400, {}, 'requisição inválida')]) as server:
+            generator = self.generator_for(server)
+            with mock.patch.object(generator, '_creative_fallback_description_from_prompt', return_value='fallback'):
+                self.assertEqual(generator._call_deepseek_api('prompt'), 'fallback')
+        self.assertEqual(len(server.requests), 1)
+
+    def test_connections_are_reused(self):
+        with StandInAPIServer([(200, {}, completion_body())]) as server:
+            generator = self.generator_for(server)
+            for _ in range(5):
+                self.assertEqual(generator._call_deepseek_api('prompt'), 'Descrição gerada')
+        # Keep-alive: as 5 chamadas saem da mesma conexão
+        self.assertEqual(len({address for address, _ in server.requests}), 1)
+
+    def test_read_timeouts_are_not_retried(self):
+        generator = AIGenerator()
+        self.assertEqual(generator._session().get_adapter('https://api').max_retries.read, 0)
+
+    def test_retry_after_is_capped(self):
+        responses = [(503, {'Retry-After': '3600'}, 'indisponível'), (200, {}, completion_body('Texto final'))]
+        with StandInAPIServer(responses) as server:
+            generator = self.generator_for(server)
+            generator.RETRY_BACKOFF_MAX = 0
+            start = time.monotonic()
+            self.assertEqual(generator._call_deepseek_api('prompt'), 'Texto final')
+        self.assertLess(time.monotonic() - start, 5)
+
+    def test_async_client_retries_server_errors_and_rate_limits(self):
+        responses = [
+            (503, {}, 'indisponível'),
+            (429, {'Retry-After': '3600'}, 'limite'),
+            (200, {}, completion_body('Texto final')),
+        ]
+        with StandInAPIServer(responses) as server:
+            generator = self.generator_for(server)
+            generator.RETRY_BACKOFF_MAX = 0
+            self.assertEqual(asyncio.run(generator._acall_deepseek_api('prompt')), 'Texto final')
+        self.assertEqual(len(server.requests), 3)
+
+    def test_async_client_gives_up_after_max_retries(self):
+        with StandInAPIServer([(500, {}, 'erro')]) as server:
+            generator = self.generator_for(server)
+            with mock.patch.object(generator, '_creative_fallback_description_from_prompt', return_value='fallback'):
+                self.assertEqual(asyncio.run(generator._acall_deepseek_api('prompt')), 'fallback')
+        self.assertEqual(len(server.requests), 3)
+
+
+@override_settings(
+    AI_GENERATION_CACHE={'ENABLED': True, 'ALIAS': 'default'},
+    AI_RETRY_BACKOFF=0, AI_MAX_RETRIES=0,
+)
+class GenerationCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def generator_for(self, server):
+        generator = AIGenerator()
+        generator.api_key = 'chave-de-teste'
+        generator.api_url = server.url
+        return generator
+
+    def test_repeated_inputs_hit_the_cache(self):
+        with StandInAPIServer([(200, {}, completion_body('Descrição única'))]) as server:
+            generator = self.generator_for(server)
+            first = generator.generate_product_description('Fone Bluetooth', 'Áudio', '199.9', 'Sem fio')
+            # Entradas equivalentes depois de normalizadas
+            second = generator.generate_product_description(' fone  bluetooth ', 'áudio', '199.90', 'sem fio')
+            generator.generate_product_description('Fone Bluetooth', 'Áudio', '249.90', 'Sem fio')
+
+        self.assertEqual(first, 'Descrição única')
+        self.assertEqual(second, first)
+        self.assertEqual(len(server.requests), 2)
+
+    def test_async_and_sync_share_the_cache(self):
+        with StandInAPIServer([(200, {}, completion_body('Leve, Resistente'))]) as server:
+            generator = self.generator_for(server)
+            generator.generate_product_features('Mochila', 'Casa')
+
+            features = asyncio.run(generator.agenerate_product_features('Mochila', 'Casa'))
+            self.assertEqual(features, 'Leve, Resistente')
+        self.assertEqual(len(server.requests), 1)
+
+    def test_fallbacks_are_not_cached(self):
+        responses = [(500, {}, 'erro'), (200, {}, completion_body('Agora funcionou'))]
+        with StandInAPIServer(responses) as server:
+            generator = self.generator_for(server)
+            generator.generate_product_description('Fone', 'Áudio', '100')
+            self.assertEqual(generator.generate_product_description('Fone', 'Áudio', '100'), 'Agora funcionou')
+        self.assertEqual(len(server.requests), 2)
+
+    @override_settings(AI_GENERATION_CACHE={'ENABLED': False, 'ALIAS': 'default'})
+    def test_disabled_by_default(self):
+        with StandInAPIServer([(200, {}, completion_body())]) as server:
+            generator = self.generator_for(server)
+            generator.generate_product_description('Fone', 'Áudio', '100')
+            generator.generate_product_description('Fone', 'Áudio', '100')
+        self.assertEqual(len(server.requests), 2)
+
+
+class StreamingDescriptionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cliente', password='senha-teste-123')
+
+    async def stream_events(self, server):
+        """Faz o POST na view de streaming e retorna [(segundos até o evento, evento, dados)]"""
+        await self.async_client.aforce_login(self.user)
+        events = []
+        with mock.patch.object(views.ai_generator, 'api_key', 'chave-de-teste'), \
+                mock.patch.object(views.ai_generator, 'api_url', server.url), \
+                mock.patch.object(views.ai_generator, 'max_retries', 0):
+            start = time.perf_counter()
+            response = await self.async_client.post(
+                reverse('recommendations:generate_description_stream'),
+                json.dumps({'product_name': 'Fone', 'category': 'Áudio', 'price': '100'}),
+                content_type='application/json',
+            )
+            self.assertEqual(response['Content-Type'], 'text/event-stream')
+            async for chunk in response.streaming_content:
+                for raw in chunk.decode().strip().split('\n\n'):
+                    lines = dict(line.split(': ', 1) for line in raw.split('\n'))
+                    events.append((time.perf_counter() - start, lines['event'], json.loads(lines['data'])))
+        return events
+
+    async def test_tokens_are_forwarded_as_they_arrive(self):
+        texts = ['Som ', 'limpo ', 'e ', 'graves ', 'potentes.']
+        with StandInAPIServer([(200, {}, texts)], stream_delay=0.2) as server:
+            events = await self.stream_events(server)
+
+        tokens = [data['text'] for _, event, data in events if event == 'token']
+        self.assertEqual(tokens, texts)
+        self.assertEqual(events[-1][1], 'done')
+        self.assertEqual(events[-1][2]['description'], 'Som limpo e graves potentes.')
+        # O primeiro trecho chega bem antes do texto completo
+        self.assertLess(events[0][0], 0.5)
+        self.assertGreater(events[-1][0], 0.8)
+        self.assertTrue(server.requests[0][1]['stream'])
+
+    async def test_api_error_streams_fallback_description(self):
+        with StandInAPIServer([(500, {}, 'erro')]) as server:
+            events = await self.stream_events(server)
+
+        self.assertEqual([event for _, event, _ in events], ['token', 'done'])
+        self.assertIn('Fone', events[-1][2]['description'])
+
+
+class CombinedGenerationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cliente', password='senha-teste-123')
+
+    async def run_wizard(self, server):
+        await self.async_client.aforce_login(self.user)
+        with mock.patch.object(views.ai_generator, 'api_key', 'chave-de-teste'), \
+                mock.patch.object(views.ai_generator, 'api_url', server.url), \
+                mock.patch.object(views.ai_generator, 'max_retries', 0):
+            response = await self.async_client.post(
+                reverse('recommendations:ai_product_wizard'),
+                json.dumps({'product_name': 'Mochila', 'category': 'Casa', 'price': '99', 'base_features': 'Azul'}),
+                content_type='application/json',
+            )
+        return response.json()
+
+    async def test_description_and_features_come_from_one_call(self):
+        content = json.dumps({'description': 'Mochila para o dia a dia.', 'features': ['Resistente', 'Leve']})
+        with StandInAPIServer([(200, {}, completion_body(content))]) as server:
+            data = await self.run_wizard(server)
+
+        self.assertEqual(data['description'], 'Mochila para o dia a dia.')
+        self.assertEqual(data['enhanced_features'], 'Resistente, Leve')
+        self.assertEqual(data['features'], 'Azul, Resistente, Leve')
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(server.requests[0][1]['response_format'], {'type': 'json_object'})
+
+    async def test_invalid_json_falls_back_to_separate_calls(self):
+        responses = [
+            (200, {}, completion_body('{"description": "Sem features"}')),
+            (200, {}, completion_body('Texto gerado')),
+        ]
+        with StandInAPIServer(responses) as server:
+            data = await self.run_wizard(server)
+
+        self.assertEqual(data['description'], 'Texto gerado')
+        self.assertEqual(data['enhanced_features'], 'Texto gerado')
+        # Chamada combinada + descrição e features em paralelo
+        self.assertEqual(len(server.requests), 3)
+        self.assertNotIn('response_format', server.requests[1][1])
+
+
+INSTANT_FAKE = {'LATENCY_MEDIAN': 0, 'TOKENS_PER_SECOND': 1e6, 'OUTPUT_TOKENS': 20, 'SEED': 7}
+
+
+class AIProviderTests(TestCase):
+
+    @override_settings(AI_PROVIDER='openai', OPENAI_COMPATIBLE_API_URL='http://localhost:8001/v1/chat/completions',
+                       OPENAI_COMPATIBLE_API_KEY='', OPENAI_COMPATIBLE_MODEL='llama3')
+    def test_provider_comes_from_settings(self):
+        generator = AIGenerator()
+        self.assertEqual(generator.provider.name, 'openai')
+        self.assertEqual((generator.api_url, generator.model), ('http://localhost:8001/v1/chat/completions', 'llama3'))
+        # Servidores locais compatíveis dispensam a chave
+        self.assertTrue(generator._is_configured())
+        self.assertNotIn('Authorization', generator._api_request('prompt')[0])
+
+        with self.assertRaises(ImproperlyConfigured):
+            get_provider('inexistente')
+
+    def test_fake_provider_is_deterministic(self):
+        payload = {'messages': [{'role': 'user', 'content': 'Descreva o produto'}]}
+        first, second = FakeProvider({'SEED': 3}), FakeProvider({'SEED': 3})
+        runs = [[(c.latency, c.content) for c in map(p.complete, [payload] * 5)] for p in (first, second)]
+        self.assertEqual(runs[0], runs[1])
+        # Latências sorteadas, texto dependente só do prompt
+        self.assertGreater(len({latency for latency, _ in runs[0]}), 1)
+        self.assertEqual(len({content for _, content in runs[0]}), 1)
+
+    def test_generator_runs_offline_against_fake_provider(self):
+        provider = FakeProvider(INSTANT_FAKE)
+        generator = AIGenerator(provider=provider)
+        self.assertTrue(generator.generate_product_description('Fone', 'Áudio', '100'))
+
+        async def run():
+            return [part async for part in generator.astream_product_description('Fone', 'Áudio', '100')]
+
+        parts = asyncio.run(run())
+        self.assertEqual(len(parts), 20)
+        self.assertEqual(provider.calls, 2)
+
+    def test_fake_provider_error_injection(self):
+        provider = FakeProvider({**INSTANT_FAKE, 'ERROR_RATE': 1})
+        generator = AIGenerator(provider=provider)
+        with mock.patch.object(generator, '_creative_fallback_description_from_prompt', return_value='fallback'):
+            self.assertEqual(generator.generate_product_description('Fone', 'Áudio', '100'), 'fallback')
+        self.assertEqual(provider.errors, 1)
+
+    def test_load_test_command_reports_throughput_and_restores_descriptions(self):
+        Product.objects.bulk_create([
+            Product(name=f'Produto {i}', description='Original', category='Casa', price=Decimal('10.00'))
+            for i in range(4)
+        ])
+        out = StringIO()
+        call_command(
+            'load_test_ai', requests=10, concurrency=5, bulk_products=4, rate=1000,
+            latency=0, tokens_per_second=1e6, stdout=out,
+        )
+
+        output = out.getvalue()
+        self.assertIn('API de descrição (concorrência 5): 10 em', output)
+        self.assertIn('Geração em lote', output)
+        self.assertIn('p99', output)
+        self.assertFalse(Product.objects.exclude(description='Original').exists())
+        self.assertFalse(DescriptionGenerationJob.objects.exists())
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class CircuitBreakerTests(TestCase):
+    CONFIG = {
+        'WINDOW_SECONDS': 60, 'MINIMUM_CALLS': 4, 'FAILURE_RATE_THRESHOLD': 0.5,
+        'SLOW_CALL_DURATION': 5, 'SLOW_CALL_RATE_THRESHOLD': 0.75,
+        'OPEN_SECONDS': 30, 'HALF_OPEN_MAX_CALLS': 2,
+    }
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(self.CONFIG, clock=self.clock)
+
+    def test_opens_on_failure_rate_and_recovers_through_half_open(self):
+        for record in (self.breaker.record_success, self.breaker.record_failure) * 2:
+            record(0.1)
+        self.assertEqual(self.breaker.snapshot()['state'], 'open')
+        self.assertIsNone(self.breaker.allow_request())
+
+        self.clock.now += 30
+        # Meio-aberto: só HALF_OPEN_MAX_CALLS chamadas de teste passam
+        permits = [self.breaker.allow_request() for _ in range(3)]
+        self.assertIsNone(permits[2])
+        self.breaker.record_success(0.1, permits[0])
+        self.breaker.record_success(0.1, permits[1])
+        snapshot = self.breaker.snapshot()
+        self.assertEqual((snapshot['state'], snapshot['calls'], snapshot['rejected']), ('closed', 0, 2))
+
+    def test_failed_trial_call_reopens(self):
+        for _ in range(4):
+            self.breaker.record_failure(0.1)
+        self.clock.now += 30
+        permit = self.breaker.allow_request()
+        self.assertTrue(permit.trial)
+        self.breaker.record_failure(0.1, permit)
+        self.assertEqual(self.breaker.snapshot()['state'], 'open')
+        self.assertEqual(self.breaker.snapshot()['retry_in'], 30)
+
+    def test_cancelled_trial_call_releases_its_slot(self):
+        for _ in range(4):
+            self.breaker.record_failure(0.1)
+        self.clock.now += 30
+        generator = AIGenerator(provider=FakeProvider({**INSTANT_FAKE, 'LATENCY_MEDIAN': 10, 'LATENCY_SIGMA': 0}))
+        generator.breaker = self.breaker
+
+        async def cancelled_stream():
+            stream = generator.astream_product_description('Fone', 'Áudio', '100')
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(stream.__anext__(), 0.05)
+
+        async def cancelled_call():
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(generator._arequest_completion('prompt'), 0.05)
+
+        for cancelled in (cancelled_stream, cancelled_call):
+            asyncio.run(cancelled())
+            self.assertEqual(self.breaker.half_open_in_flight, 0)
+        # As vagas de teste voltaram: o circuito ainda pode fechar
+        self.assertEqual([self.breaker.allow_request() is not None for _ in range(3)], [True, True, False])
+
+    def test_only_calls_that_reserved_a_trial_count_in_half_open(self):
+        started_closed = self.breaker.allow_request()
+        for _ in range(4):
+            self.breaker.record_failure(0.1)
+        self.clock.now += 30
+        trial = self.breaker.allow_request()
+        self.assertFalse(started_closed.trial)
+
+        # Termina no meio-aberto sem ter reservado vaga: nem fecha nem reabre
+        self.breaker.record_failure(0.1, started_closed)
+        self.breaker.release(started_closed)
+        self.assertEqual(self.breaker.snapshot()['state'], 'half_open')
+        self.assertEqual(self.breaker.half_open_in_flight, 1)
+
+        # Vaga de um meio-aberto anterior também não conta
+        self.breaker.record_failure(0.1, trial)
+        self.clock.now += 30
+        self.breaker.record_success(0.1, trial)
+        self.breaker.release(trial)
+        self.assertEqual(self.breaker.snapshot()['state'], 'half_open')
+        self.assertEqual(self.breaker.half_open_successes, 0)
+
+    def test_slow_calls_open_and_old_calls_leave_the_window(self):
+        for _ in range(3):
+            self.breaker.record_success(6)
+        self.clock.now += 61
+        self.breaker.record_success(6)
+        # As 3 primeiras saíram da janela: ainda abaixo de MINIMUM_CALLS
+        self.assertEqual(self.breaker.snapshot()['state'], 'closed')
+        for _ in range(3):
+            self.breaker.record_success(6)
+        self.assertEqual(self.breaker.snapshot()['state'], 'open')
+
+    def test_open_circuit_serves_fallback_without_calling_provider(self):
+        provider = FakeProvider({**INSTANT_FAKE, 'ERROR_RATE': 1})
+        generator = AIGenerator(provider=provider)
+        generator.breaker = CircuitBreaker({**self.CONFIG, 'MINIMUM_CALLS': 2})
+        with mock.patch.object(generator, '_creative_fallback_description_from_prompt', return_value='fallback'):
+            descriptions = [generator.generate_product_description('Fone', 'Áudio', '100') for _ in range(5)]
+
+            async def run():
+                return await generator.agenerate_product_description('Fone', 'Áudio', '100')
+
+            descriptions.append(asyncio.run(run()))
+        self.assertEqual(descriptions, ['fallback'] * 6)
+        self.assertEqual(provider.calls, 2)
+        self.assertEqual(generator.breaker.snapshot()['rejected'], 4)
+
+    def test_state_is_shown_on_ai_status(self):
+        user = User.objects.create_user('cliente', password='senha-teste-123')
+        self.client.force_login(user)
+        for _ in range(4):
+            self.breaker.record_failure(0.1)
+        with mock.patch.object(views.ai_generator, 'breaker', self.breaker):
+            response = self.client.get(reverse('recommendations:ai_status'))
+        self.assertContains(response, 'Circuit Breaker')
+        self.assertContains(response, 'Aberto')
+        self.assertContains(response, 'nova tentativa em 30s')
+
+
+class StartupImportTests(TestCase):
+
+    def test_startup_skips_ml_stack_and_fits_budget(self):
+        report = measure_startup()
+        self.assertEqual(report['heavy'], [])
+        self.assertLess(report['total'], startup_budget())
+
+    def test_singletons_are_created_on_first_use(self):
+        self.assertIs(get_recommender(), get_recommender())
+        self.assertIs(get_ai_generator(), get_ai_generator())
+        # As views usam as mesmas instâncias
+        self.assertEqual(views.recommender.model_version, get_recommender().model_version)
+        self.assertIs(views.ai_generator.breaker, get_ai_generator().breaker)
+
+
+@override_settings(AI_MAX_RETRIES=0)
+class AsyncAIGeneratorTests(TestCase):
+
+    def setUp(self):
+        self.generator = AIGenerator()
+        self.generator.api_key = 'chave-de-teste'
+
+    def test_concurrent_calls_do_not_block_each_other(self):
+        async def run():
+            transport = fake_completion_transport(latency=0.2)
+            with mock.patch.object(self.generator, '_async_client', lambda: httpx.AsyncClient(transport=transport)):
+                return await asyncio.gather(*[
+                    self.generator.agenerate_product_description('Fone', 'Áudio', '100')
+                    for _ in range(50)
+                ])
+
+        start = time.perf_counter()
+        descriptions = asyncio.run(run())
+        elapsed = time.perf_counter() - start
+
+        self.assertEqual(descriptions, ['Descrição gerada'] * 50)
+        # 50 chamadas de 0,2 s em série levariam 10 s
+        self.assertLess(elapsed, 2)
+
+    def test_async_client_is_closed_after_each_call(self):
+        clients = []
+
+        def client_factory():
+            clients.append(httpx.AsyncClient(transport=fake_completion_transport()))
+            return clients[-1]
+
+        with mock.patch.object(self.generator, '_async_client', client_factory):
+            for _ in range(3):
+                # Um event loop novo por chamada, como o async_to_sync sob WSGI
+                asyncio.run(self.generator.agenerate_product_description('Fone', 'Áudio', '100'))
+
+        self.assertEqual(len(clients), 3)
+        self.assertTrue(all(client.is_closed for client in clients))
+
+    def test_api_error_falls_back_to_creative_description(self):
+        async def run():
+            transport = httpx.MockTransport(lambda request: httpx.Response(500, text='erro'))
+            with mock.patch.object(self.generator, '_async_client', lambda: httpx.AsyncClient(transport=transport)):
+                return await self.generator.agenerate_product_features('Fone', 'Áudio')
+
+        self.assertTrue(asyncio.run(run()))
+
+
+class AsyncViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cliente', password='senha-teste-123')
+
+    async def test_ai_product_wizard_runs_async(self):
+        await self.async_client.aforce_login(self.user)
+        transport = fake_completion_transport(content='Resistente, Leve')
+
+        with mock.patch.object(views.ai_generator, 'api_key', 'chave-de-teste'), \
+                mock.patch.object(views.ai_generator, '_async_client', lambda: httpx.AsyncClient(transport=transport)):
+            response = await self.async_client.post(
+                reverse('recommendations:ai_product_wizard'),
+                json.dumps({'product_name': 'Mochila', 'category': 'Casa', 'price': '99'}),
+                content_type='application/json',
+            )
+
+        data = response.json()
+        self.assertEqual(data['status'], 'success')
+        self.assertEqual(data['description'], 'Resistente, Leve')
+        self.assertEqual(data['features'], 'Resistente, Leve')
+        # O middleware roda em modo async e conta as queries feitas nas
+        # threads do sync_to_async (sessão e usuário do login_required)
+        self.assertGreater(int(response['X-DB-Query-Count']), 0)
+
+
+class FakeDescriptionGenerator:
+    """Gerador de descrições em memória: registra as chamadas e pode falhar por produto"""
+
+    def __init__(self, fail_for=(), on_call=None):
+        self.calls = []
+        self.fail_for = set(fail_for)
+        self.on_call = on_call
+
+    def request_product_description(self, product_name, category, price, features=None):
+        self.calls.append(product_name)
+        if self.on_call:
+            self.on_call(len(self.calls))
+        if product_name in self.fail_for:
+            raise RuntimeError('falha simulada')
+        return f'Descrição de {product_name}'
+
+
+class BulkDescriptionGenerationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cliente', password='senha-teste-123')
+        Product.objects.bulk_create(
+            [Product(name=f'Produto {i}', description='', category='Casa', price=Decimal('10.00')) for i in range(12)] +
+            [Product(name='Já descrito', description='Texto', category='Casa', price=Decimal('10.00'))]
+        )
+
+    def engine(self, job, generator, **options):
+        options = {'workers': 4, 'rate_per_second': 1000, 'burst': 1000, 'chunk_size': 5, **options}
+        return BulkDescriptionGenerator(job, generator, **options)
+
+    def test_generates_descriptions_in_bulk_updates(self):
+        job = DescriptionGenerationJob.objects.create()
+        with CaptureQueriesContext(connection) as queries:
+            self.engine(job, FakeDescriptionGenerator()).run()
+
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.total, job.processed, job.succeeded), (12, 12, 12))
+        self.assertFalse(Product.objects.filter(description='').exists())
+        self.assertEqual(Product.objects.get(name='Produto 3').description, 'Descrição de Produto 3')
+        # Um UPDATE por lote de 5 produtos
+        product_updates = [q for q in queries if q['sql'].startswith('UPDATE "recommendations_product"')]
+        self.assertEqual(len(product_updates), 3)
+
+    def test_interrupted_run_resumes_from_checkpoint(self):
+        job = DescriptionGenerationJob.objects.create()
+        engine = None
+
+        def stop_after_four(calls):
+            if calls == 4:
+                engine.stop()
+
+        engine = self.engine(job, FakeDescriptionGenerator(on_call=stop_after_four), workers=1)
+        engine.run()
+        self.assertEqual(job.status, 'interrupted')
+        self.assertEqual(job.processed, 4)
+        self.assertEqual(Product.objects.filter(description='').count(), 8)
+
+        generator = FakeDescriptionGenerator()
+        self.engine(DescriptionGenerationJob.objects.get(pk=job.pk), generator).run()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.processed, 12)
+        # Nenhum produto do primeiro trecho é gerado de novo
+        self.assertEqual(len(generator.calls), 8)
+        self.assertNotIn('Produto 0', generator.calls)
+
+    def test_failures_are_counted_and_skipped(self):
+        job = DescriptionGenerationJob.objects.create()
+        self.engine(job, FakeDescriptionGenerator(fail_for={'Produto 2'})).run()
+
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.succeeded, job.failed), (11, 1))
+        self.assertEqual(Product.objects.get(name='Produto 2').description, '')
+
+    def test_fallback_text_is_never_saved(self):
+        generator = AIGenerator(provider=FakeProvider(INSTANT_FAKE))
+        job = DescriptionGenerationJob.objects.create()
+        with mock.patch.object(generator, '_request_completion', side_effect=RuntimeError('API fora do ar')):
+            self.engine(job, generator, batch_size=1).run()
+        self.assertEqual((job.status, job.succeeded, job.failed), ('completed', 0, 12))
+        self.assertEqual(Product.objects.filter(description='').count(), 12)
+
+        job = DescriptionGenerationJob.objects.create()
+        with mock.patch.object(generator, '_is_configured', return_value=False):
+            self.engine(job, generator, batch_size=5).run()
+        self.assertEqual((job.status, job.processed), ('failed', 0))
+        self.assertIn('API key', job.error)
+        self.assertEqual(Product.objects.filter(description='').count(), 12)
+
+    def test_open_circuit_pauses_without_advancing_checkpoint(self):
+        generator = AIGenerator(provider=FakeProvider(INSTANT_FAKE))
+        for batch_size in (1, 5):
+            job = DescriptionGenerationJob.objects.create()
+            with mock.patch.object(generator.breaker, 'allow_request', return_value=None):
+                self.engine(job, generator, batch_size=batch_size).run()
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.processed, job.failed, job.last_product_id), ('interrupted', 0, 0, 0))
+            self.assertIn('Circuit breaker', job.error)
+
+        # Com o circuito fechado de novo o job continua e gera tudo
+        self.engine(job, generator, batch_size=5).run()
+        self.assertEqual((job.status, job.succeeded), ('completed', 12))
+
+    def test_token_bucket_limits_rate(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        start = time.perf_counter()
+        for _ in range(11):
+            bucket.acquire()
+        # 1 ficha inicial + 10 a 50/s
+        self.assertGreaterEqual(time.perf_counter() - start, 0.18)
+
+    def test_batched_prompts_describe_several_products_per_call(self):
+        provider = FakeProvider(INSTANT_FAKE)
+        job = DescriptionGenerationJob.objects.create()
+        self.engine(job, AIGenerator(provider=provider), batch_size=5).run()
+
+        self.assertEqual((job.status, job.succeeded), ('completed', 12))
+        self.assertFalse(Product.objects.filter(description='').exists())
+        # Lotes de 5 dentro dos trechos de 5 produtos: 3 chamadas para 12 produtos
+        self.assertEqual(provider.calls, 3)
+
+    @override_settings(AI_RETRY_BACKOFF=0, AI_MAX_RETRIES=0)
+    def test_batch_retries_only_missing_products(self):
+        products = [
+            {'id': product_id, 'name': f'Produto {product_id}', 'category': 'Casa', 'price': '10.00'}
+            for product_id in (1, 2, 3)
+        ]
+        responses = [
+            (200, {}, completion_body(json.dumps({'descriptions': {'1': 'Texto 1', '2': ''}}))),
+            (200, {}, completion_body(json.dumps({'descriptions': {'2': 'Texto 2'}}))),
+        ]
+        with StandInAPIServer(responses) as server:
+            generator = AIGenerator()
+            generator.api_key = 'chave-de-teste'
+            generator.api_url = server.url
+            descriptions = generator.generate_product_descriptions_batch(products)
+
+        self.assertEqual(descriptions, {1: 'Texto 1', 2: 'Texto 2'})
+        prompts = [body['messages'][-1]['content'] for _, body in server.requests]
+        self.assertEqual(len(prompts), 2)
+        self.assertIn('"id":"1"', prompts[0])
+        self.assertNotIn('"id":"1"', prompts[1])
+        self.assertIn('"id":"3"', prompts[1])
+        self.assertEqual(server.requests[0][1]['response_format'], {'type': 'json_object'})
+
+    def test_status_api_reports_progress(self):
+        self.client.force_login(self.user)
+        job = DescriptionGenerationJob.objects.create(status='running', total=10, processed=4)
+        data = self.client.get(reverse('recommendations:bulk_generation_status', args=[job.pk])).json()
+        self.assertEqual(data['job']['progress'], 40)
+
+        response = self.client.get(reverse('recommendations:bulk_generate_descriptions'))
+        self.assertContains(response, 'produtos sem descrição')
+
+
+class PopulateSampleDataTests(TestCase):
+    def test_generates_skewed_catalog_in_batches(self):
+        call_command(
+            'populate_sample_data', products=30, users=10, interactions=2000,
+            batch_size=500, seed=1, stdout=StringIO(),
+        )
+
+        self.assertEqual(Product.objects.count(), 30)
+        self.assertEqual(User.objects.filter(username__startswith='amostra_').count(), 10)
+        self.assertEqual(UserInteraction.objects.count(), 2000)
+        self.assertEqual(Product.objects.values('category').distinct().count(), 6)
+
+        # Lei de potência: os 3 produtos mais populares (10%) concentram boa parte das interações
+        counts = sorted(
+            UserInteraction.objects.values('product').annotate(total=Count('id')).values_list('total', flat=True),
+            reverse=True,
+        )
+        self.assertGreater(sum(counts[:3]), 2000 * 0.3)
+
+        ratings = UserInteraction.objects.filter(interaction_type='rating')
+        self.assertTrue(ratings.exists())
+        self.assertFalse(ratings.filter(rating__isnull=True).exists())
+        self.assertFalse(ratings.exclude(rating__range=(1, 5)).exists())
+        self.assertEqual(ratings.count(), ratings.values('user', 'product').distinct().count())
+
+        self.assertEqual(ProductStats.objects.count(), len(counts))
+        self.assertEqual(sum(ProductStats.objects.values_list('view_count', flat=True)),
+                         UserInteraction.objects.filter(interaction_type='view').count())
+
+
+class BulkImportExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('cliente', password='senha-teste-123')
+        self.product = Product.objects.create(
+            name='Cafeteira', description='Cafeteira elétrica', category='Casa', price=Decimal('199.90'),
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def path(self, name, content=None):
+        path = os.path.join(self.directory.name, name)
+        if content is not None:
+            with open(path, 'w', encoding='utf-8') as stream:
+                stream.write(content)
+        return path
+
+    def test_catalog_csv_round_trip_upserts_by_id(self):
+        path = self.path('catalogo.csv')
+        call_command('export_catalog', path, stdout=StringIO())
+        with open(path, encoding='utf-8') as stream:
+            exported = stream.read()
+        self.assertIn('Cafeteira elétrica', exported)
+
+        # Produto existente alterado, um novo e uma linha inválida
+        content = exported.replace('199.90', '149.90') + (
+            ',Luminária,,Casa,89.90,,"{""cor"": ""preta""}"\n'
+            ',Sem preço,,Casa,,,\n'
+        )
+        out = StringIO()
+        call_command('import_catalog', self.path('catalogo.csv', content), batch_size=1, stdout=out)
+
+        self.assertIn('Linha 4 ignorada: price inválido', out.getvalue())
+        self.assertEqual(Product.objects.count(), 2)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.price, Decimal('149.90'))
+        self.assertEqual(Product.objects.get(name='Luminária').features, {'cor': 'preta'})
+        self.assertEqual(CategoryStats.objects.get(name='Casa').product_count, 2)
+
+    def test_interactions_jsonl_import_and_export(self):
+        record_interaction(self.user, self.product, 'rating', rating=2)
+        rows = [
+            {'user_id': self.user.pk, 'product_id': self.product.pk, 'interaction_type': 'view',
+             'timestamp': '2025-01-10T12:00:00+00:00'},
+            # Substitui a avaliação existente (uma por usuário/produto)
+            {'user_id': self.user.pk, 'product_id': self.product.pk, 'interaction_type': 'rating', 'rating': 5},
+            {'user_id': self.user.pk, 'product_id': 999999, 'interaction_type': 'view'},
+            {'user_id': self.user.pk, 'product_id': self.product.pk, 'interaction_type': 'rating', 'rating': 9},
+        ]
+        content = '\n'.join(json.dumps(row) for row in rows) + '\nnão é json\n'
+        out = StringIO()
+        call_command('import_interactions', self.path('historico.jsonl', content), stdout=out)
+
+        self.assertIn('Linha 4 ignorada: Avaliação deve ser entre 1 e 5', out.getvalue())
+        self.assertIn('Linha 5 ignorada', out.getvalue())
+        self.assertIn('2 interações importadas', out.getvalue())
+        ratings = UserInteraction.objects.filter(interaction_type='rating')
+        self.assertEqual(ratings.get().rating, 5)
+        self.assertEqual(UserInteraction.objects.count(), 2)
+        stats = ProductStats.objects.get(product=self.product)
+        self.assertEqual((stats.view_count, stats.rating_sum, stats.rating_count), (1, 5, 1))
+
+        # Exportar e importar de novo não duplica (upsert pelo id)
+        path = self.path('exportado.csv')
+        call_command('export_interactions', path, stdout=StringIO())
+        call_command('import_interactions', path, stdout=StringIO())
+        self.assertEqual(UserInteraction.objects.count(), 2)
+        view = UserInteraction.objects.get(interaction_type='view')
+        self.assertEqual(view.timestamp.isoformat(), '2025-01-10T12:00:00+00:00')
+
+    def test_interactions_import_rebuilds_only_touched_stats(self):
+        other = User.objects.create_user('outro', password='senha-teste-123')
+        untouched = User.objects.create_user('intocado', password='senha-teste-123')
+        view, _ = record_interaction(self.user, self.product, 'view')
+        record_interaction(untouched, self.product, 'wishlist')
+        UserStats.objects.filter(user=untouched).update(total_interactions=99)
+
+        # A linha existente passa de self.user para other; uma nova com id explícito
+        rows = [
+            {'id': view.pk, 'user_id': other.pk, 'product_id': self.product.pk, 'interaction_type': 'view'},
+            {'id': 5000, 'user_id': other.pk, 'product_id': self.product.pk, 'interaction_type': 'click'},
+        ]
+        content = '\n'.join(json.dumps(row) for row in rows) + '\n'
+        call_command('import_interactions', self.path('historico.jsonl', content), stdout=StringIO())
+
+        self.assertEqual(UserStats.objects.get(user=self.user).total_views, 0)
+        self.assertEqual(UserStats.objects.get(user=other).total_interactions, 2)
+        self.assertEqual(UserStats.objects.get(user=untouched).total_interactions, 99)
+        # A sequência da pk segue o maior id importado
+        interaction, _ = record_interaction(self.user, self.product, 'view')
+        self.assertGreater(interaction.pk, 5000)
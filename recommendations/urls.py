@@ -18,6 +18,7 @@ urlpatterns = [
     
     # APIs de interação
     path('api/record-interaction/', views.record_interaction_api, name='record_interaction_api'),
+    path('api/record-interactions/', views.record_interactions_bulk_api, name='record_interactions_bulk_api'),
     path('api/get-recommendations/', views.get_recommendations_ajax, name='get_recommendations_ajax'),
     path('api/recommendations/', views.get_recommendations, name='get_recommendations'),
     path('api/product/<int:product_id>/stats/', views.product_stats_api, name='product_stats_api'),
@@ -42,6 +43,7 @@ urlpatterns = [
     
     # APIs de IA Generativa
     path('api/generate-description/', views.generate_description_api, name='generate_description_api'),
+    path('api/generate-description/stream/', views.generate_description_stream, name='generate_description_stream'),
     path('api/test-ai-connection/', views.test_ai_connection, name='test_ai_connection'),
     path('api/generate-features/', views.generate_product_features, name='generate_product_features'),
     path('api/ai-product-wizard/', views.ai_product_wizard, name='ai_product_wizard'),
@@ -52,6 +54,8 @@ urlpatterns = [
     # Páginas de IA adicionais
     path('ai-product-wizard/', views.ai_product_wizard, name='ai_product_wizard_page'),
     path('bulk-generate-descriptions/', views.bulk_generate_descriptions, name='bulk_generate_descriptions'),
+    path('api/bulk-generation/<int:job_id>/', views.bulk_generation_status, name='bulk_generation_status'),
+    path('api/bulk-generation/<int:job_id>/stop/', views.bulk_generation_stop, name='bulk_generation_stop'),
     
     # Redirects para IA
     path('ai/', RedirectView.as_view(url='/ai-status/')),
@@ -1,20 +1,68 @@
 import json
-from django.http import JsonResponse
+import logging
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils import timezone
-from django.db.models import Count, Q
-from django.core.paginator import Paginator
-from django.conf import settings
+from django.db.models import FloatField, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
 from django.db import models
+from django.utils.functional import SimpleLazyObject
 
-from .models import Product, UserInteraction, Recommendation
-from .ml_models.recommender import recommender
-from .ai_generator import AIGenerator
+from . import bulk_generation, etags
+from .bulk_generation import job_payload, request_stop, start_background_job
+from .categories import category_summary
+from .catalog_cache import cached_catalog_data, cached_categories, fragment_timeout, get_catalog_version
+from .ingestion import BUFFERED_TYPES, BufferFull, get_buffer, ingest_events, ingestion_settings
+from .models import DescriptionGenerationJob, Product, ProductStats, UserInteraction, Recommendation
+from .pagination import SORT_KEYS, KeysetPaginator
+from .payloads import json_fragments_response, payload_list, payload_object
+from .related import get_related_products
+from .search import search_products
+from .stats import dashboard_data, get_product_stats, get_user_stats, record_interaction
+from .ml_models.recommender import get_recommender
+from .ai_generator import get_ai_generator
 
-# ✅ Crie a instância aqui mesmo
-ai_generator = AIGenerator()
+# Criados no primeiro uso: importar as views não carrega pandas/scikit-learn nem configura a IA
+recommender = SimpleLazyObject(get_recommender)
+ai_generator = SimpleLazyObject(get_ai_generator)
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def _ingestion_status(interaction_type=None):
+    """202 quando os eventos ficaram no buffer (gravação posterior), 200 quando já foram gravados"""
+    if (interaction_type and interaction_type not in BUFFERED_TYPES) or get_buffer().durability == 'sync':
+        return 200
+    return 202
+
+
+def _buffer_full_response(error):
+    """Backpressure: buffer de ingestão cheio, o cliente deve tentar de novo"""
+    logger.warning('Buffer de interações cheio, rejeitando requisição')
+    response = JsonResponse({'status': 'error', 'message': str(error)}, status=503)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def with_product_stats(queryset):
+    """Anota view_count e average_rating lidos de ProductStats (um LEFT JOIN pela PK, sem GROUP BY)"""
+    return queryset.annotate(
+        view_count=Coalesce('stats__view_count', Value(0)),
+        average_rating=Coalesce(
+            Round(
+                Cast('stats__rating_sum', FloatField()) / NullIf('stats__rating_count', Value(0)),
+                1
+            ),
+            Value(0.0),
+            output_field=FloatField(),
+        ),
+    )
 
 # ============================================================================
 # VIEWS PRINCIPAIS
@@ -74,28 +122,39 @@ def train_recommender(request):
         'stats': stats
     })
 
+async def _recommendations_response(request, variant, top_n):
+    """
+    Recomendações do usuário como payloads `variant`, com ETag forte.
+    If-None-Match válido responde 304 sem rodar o recomendador.
+    """
+    user = await request.auser()
+    
+    def user_etag():
+        # Versão do modelo gravado em disco: o ETag é o mesmo em qualquer worker
+        return etags.recommendations_etag(user.id, recommender.current_version(), variant)
+    
+    etag = await sync_to_async(user_etag)()
+    response = etags.not_modified(request, etag)
+    if response is not None:
+        return response
+    
+    products = Product.objects.all()
+    # O recomendador é síncrono (ORM + pandas): roda numa thread
+    recommendations = await sync_to_async(recommender.recommend_for_user)(user, products, top_n=top_n)
+    
+    # Payloads pré-serializados em cache, concatenados na ordem do ranking
+    recommended_data = await sync_to_async(payload_list)(
+        variant, [(p.id, p.updated_at) for p in recommendations]
+    )
+    
+    response = json_fragments_response(status='success', recommendations=recommended_data)
+    return etags.set_etag(response, etag)
+
 @login_required
-def get_recommendations(request):
-    """View para obter recomendações para o usuário logado"""
+async def get_recommendations(request):
+    """View para obter recomendações para o usuário logado (async)"""
     try:
-        user = request.user
-        products = Product.objects.all()
-        recommendations = recommender.recommend_for_user(user, products, top_n=10)
-        
-        recommended_data = [
-            {
-                'id': p.id, 
-                'name': p.name, 
-                'category': p.category,
-                'price': str(p.price),
-                'image_url': p.image_url
-            } for p in recommendations
-        ]
-        
-        return JsonResponse({
-            'status': 'success', 
-            'recommendations': recommended_data
-        })
+        return await _recommendations_response(request, 'card', top_n=10)
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)})
 
@@ -107,6 +166,8 @@ def user_recommendations(request):
 @login_required
 def model_status(request):
     """Mostra o status atual do modelo"""
+    # Reflete também um treino feito em outro worker
+    recommender.current_version()
     status_info = {
         'is_trained': recommender.is_trained,
         'training_time': getattr(recommender, 'last_trained', 'Nunca'),
@@ -132,135 +193,54 @@ def model_status(request):
 def product_explorer(request):
     """Página para explorar todos os produtos - VERSÃO COM FILTROS EM PRODUTOS POPULARES"""
     try:
-        print("🎯 INICIANDO PRODUCT_EXPLORER - Buscando produtos...")
-        
-        # ✅ BUSCA TODOS OS PRODUTOS
-        all_products = Product.objects.all()
-        print(f"📦 PRODUTOS NO BANCO: {all_products.count()}")
+        # ✅ BUSCA TODOS OS PRODUTOS (com estatísticas anotadas em uma única query)
+        all_products = with_product_stats(Product.objects.all())
         
-        # ✅ APLICA FILTRO DE BUSCA
+        # ✅ APLICA FILTRO DE BUSCA (índice textual, ranqueado por relevância)
         search_query = request.GET.get('search', '')
         if search_query:
-            print(f"🔍 APLICANDO FILTRO DE BUSCA: '{search_query}'")
-            all_products = all_products.filter(
-                models.Q(name__icontains=search_query) |
-                models.Q(description__icontains=search_query) |
-                models.Q(category__icontains=search_query)
-            )
-            print(f"📊 PRODUTOS APÓS BUSCA: {all_products.count()}")
+            all_products = search_products(all_products, search_query)
         
-        # ✅ APLICA ORDENAÇÃO
-        sort_by = request.GET.get('sort', 'newest')
-        print(f"🔄 APLICANDO ORDENAÇÃO: {sort_by}")
+        # ✅ APLICA ORDENAÇÃO (com busca, o padrão é a relevância)
+        sort_by = request.GET.get('sort', 'relevance' if search_query else 'newest')
         
-        if sort_by == 'price_low':
-            all_products = all_products.order_by('price')
-            print("💰 ORDENADO POR: Menor preço")
-        elif sort_by == 'price_high':
-            all_products = all_products.order_by('-price')
-            print("💰 ORDENADO POR: Maior preço")
-        elif sort_by == 'name':
-            all_products = all_products.order_by('name')
-            print("🔤 ORDENADO POR: Nome A-Z")
-        elif sort_by == 'popular':
-            # Ordena por número de visualizações usando annotation
-            all_products = all_products.annotate(
-                view_count=Count('userinteraction', filter=Q(userinteraction__interaction_type='view'))
-            ).order_by('-view_count', '-id')
-            print("🔥 ORDENADO POR: Mais populares")
-        else:  # newest (padrão)
-            all_products = all_products.order_by('-id')
-            print("📅 ORDENADO POR: Mais recentes")
+        if sort_by == 'relevance' and search_query:
+            all_products = all_products.order_by('-search_rank', '-id')
+        elif sort_by not in SORT_KEYS:
+            sort_by = 'newest'
         
-        print(f"✅ PRODUTOS FINAIS: {all_products.count()}")
+        # Tudo abaixo é preguiçoso: só vai ao banco se o fragmento do template não estiver em cache
         
         # ✅ PRODUTOS POPULARES COM OS MESMOS FILTROS
-        try:
-            # Aplica os mesmos filtros aos produtos populares
-            popular_products_base = Product.objects.all()
-            
-            # Aplica busca nos produtos populares também
-            if search_query:
-                popular_products_base = popular_products_base.filter(
-                    models.Q(name__icontains=search_query) |
-                    models.Q(description__icontains=search_query) |
-                    models.Q(category__icontains=search_query)
-                )
-            
-            # Sempre ordena produtos populares por visualizações (independente da ordenação principal)
-            popular_products = popular_products_base.annotate(
-                view_count=Count('userinteraction', filter=Q(userinteraction__interaction_type='view'))
-            ).order_by('-view_count', '-id')[:8]
-            
-            print(f"🔥 PRODUTOS POPULARES (COM FILTROS): {popular_products.count()}")
-            
-        except Exception as e:
-            print(f"⚠️ ERRO EM PRODUTOS POPULARES: {e}")
-            popular_products = all_products[:8]  # Fallback
+        # Sempre ordena produtos populares por visualizações (independente da ordenação principal)
+        popular_products = all_products.order_by('-view_count', '-id')[:8]
         
-        # ✅ CATEGORIAS DISPONÍVEIS
-        categories = Product.objects.values_list('category', flat=True).distinct()
-        print(f"📂 CATEGORIAS ENCONTRADAS: {len(categories)}")
+        # Versão do catálogo lida uma vez: chaves de cache, fragmentos e contagem
+        catalog_version = get_catalog_version()
         
-        # ✅ TENTA CARREGAR RECOMENDAÇÕES DO USUÁRIO
-        user_recommendations = None
-        if request.user.is_authenticated:
-            try:
-                user_recommendations = get_user_recommendations(request.user.id)
-                if user_recommendations and len(user_recommendations) > 0:
-                    user_recommendations = user_recommendations[:6]
-                    print(f"🎯 RECOMENDAÇÕES DO USUÁRIO: {len(user_recommendations)}")
-                else:
-                    print("ℹ️ Nenhuma recomendação disponível para o usuário")
-            except Exception as e:
-                print(f"❌ ERRO AO CARREGAR RECOMENDAÇÕES: {e}")
-                user_recommendations = None
+        # ✅ CATEGORIAS DISPONÍVEIS
+        categories = cached_categories(catalog_version)
         
-        # ✅ PAGINAÇÃO
-        paginator = Paginator(all_products, 12)  # 12 produtos por página
-        page_number = request.GET.get('page')
-        products_page = paginator.get_page(page_number)
+        # As recomendações do usuário são carregadas pela página via /api/get-recommendations/
         
-        # ✅ ADICIONA ESTATÍSTICAS AOS PRODUTOS PARA O TEMPLATE
-        products_with_stats = []
-        for product in products_page:
-            # Calcular estatísticas em tempo real para cada produto
-            view_count = product.userinteraction_set.filter(interaction_type='view').count()
-            ratings = product.userinteraction_set.filter(
-                interaction_type='rating'
-            ).exclude(rating__isnull=True).values_list('rating', flat=True)
-            average_rating = sum(ratings) / len(ratings) if ratings else 0.0
-            
-            # Adicionar atributos dinâmicos ao produto
-            product.view_count = view_count
-            product.average_rating = round(average_rating, 1)
-            products_with_stats.append(product)
-        
-        # ✅ ADICIONA ESTATÍSTICAS AOS PRODUTOS POPULARES TAMBÉM
-        popular_with_stats = []
-        for product in popular_products:
-            view_count = product.userinteraction_set.filter(interaction_type='view').count()
-            ratings = product.userinteraction_set.filter(
-                interaction_type='rating'
-            ).exclude(rating__isnull=True).values_list('rating', flat=True)
-            average_rating = sum(ratings) / len(ratings) if ratings else 0.0
-            
-            product.view_count = view_count
-            product.average_rating = round(average_rating, 1)
-            popular_with_stats.append(product)
+        # ✅ PAGINAÇÃO POR CURSOR (view_count e average_rating já vêm anotados)
+        cursor = request.GET.get('cursor', '')
+        paginator = KeysetPaginator(all_products, sort_by, per_page=12, count_version=catalog_version)  # 12 produtos por página
+        products_page = SimpleLazyObject(lambda: paginator.get_page(cursor))
         
         context = {
             'products': products_page,
             'page_obj': products_page,
-            'popular_products': popular_with_stats,  # ✅ Agora com estatísticas
+            'popular_products': popular_products,  # ✅ Agora com estatísticas
             'categories': categories,
-            'user_recommendations': user_recommendations,
-            'total_products': all_products.count(),
+            'total_products': lambda: paginator.count,
             'search_query': search_query,
             'sort_by': sort_by,
+            'cursor': cursor,
+            'catalog_version': catalog_version,
+            'fragment_timeout': fragment_timeout(),
         }
         
-        print(f"✅ CONTEXTO ENVIADO: {len(products_page)} produtos, {len(popular_with_stats)} populares")
         return render(request, 'recommendations/product_explorer.html', context)
         
     except Exception as e:
@@ -274,8 +254,7 @@ def product_explorer(request):
         return render(request, 'recommendations/product_explorer.html', {
             'products': all_products,
             'popular_products': all_products[:8],
-            'categories': Product.objects.values_list('category', flat=True).distinct(),
-            'user_recommendations': None,
+            'categories': cached_categories(),
             'total_products': Product.objects.count(),
             'error': f'Erro ao carregar produtos: {str(e)}'
         })
@@ -305,53 +284,28 @@ def product_detail(request, product_id):
         
         # ✅ Buscar produto principal
         try:
-            product = Product.objects.get(id=product_id)
+            product = Product.objects.select_related('stats', 'related_list').get(id=product_id)
             print(f"✅ PRODUTO ENCONTRADO: {product.name} (ID: {product.id})")
         except Product.DoesNotExist:
             print(f"❌ PRODUTO NÃO ENCONTRADO: {product_id}")
             messages.error(request, "Produto não encontrado.")
             return redirect('/')
         
-        # ✅ PRODUTOS RELACIONADOS - COM VALIDAÇÃO ROBUSTA
-        same_category_products = []
-        if product.category and product.category.strip():
-            try:
-                # Busca produtos da mesma categoria
-                category_products = Product.objects.filter(
-                    category=product.category
-                ).exclude(id=product.id).order_by('?')[:8]  # Pega mais para filtrar depois
-                
-                # ✅ FILTRA APENAS PRODUTOS VÁLIDOS
-                valid_related_products = []
-                for related_product in category_products:
-                    if (related_product and 
-                        related_product.id and 
-                        related_product.id > 0 and 
-                        related_product != product):
-                        valid_related_products.append(related_product)
-                
-                # Limita a 4 produtos válidos
-                same_category_products = valid_related_products[:4]
-                print(f"✅ PRODUTOS RELACIONADOS: {len(same_category_products)} válidos encontrados")
-                
-            except Exception as e:
-                print(f"⚠️ ERRO AO BUSCAR PRODUTOS RELACIONADOS: {e}")
-                same_category_products = []  # Lista vazia em caso de erro
+        # ✅ PRODUTOS RELACIONADOS - lista pré-calculada (já carregada junto com o produto)
+        try:
+            same_category_products = get_related_products(product, count=4)
+            print(f"✅ PRODUTOS RELACIONADOS: {len(same_category_products)} encontrados")
+        except Exception as e:
+            print(f"⚠️ ERRO AO BUSCAR PRODUTOS RELACIONADOS: {e}")
+            same_category_products = []  # Lista vazia em caso de erro
         
         # ✅ Características
         features_list = []
         if product.features and isinstance(product.features, str):
             features_list = [feature.strip() for feature in product.features.split(',') if feature.strip()]
         
-        # ✅ Estatísticas
-        view_count = product.userinteraction_set.filter(interaction_type='view').count()
-        wishlist_count = product.userinteraction_set.filter(interaction_type='wishlist').count()
-        
-        ratings = product.userinteraction_set.filter(
-            interaction_type='rating'
-        ).exclude(rating__isnull=True).values_list('rating', flat=True)
-        
-        average_rating = sum(ratings) / len(ratings) if ratings else 0.0
+        # ✅ Estatísticas (já carregadas junto com o produto)
+        stats = get_product_stats(product)
         
         # ✅ Avaliação do usuário atual
         user_rating = None
@@ -371,9 +325,9 @@ def product_detail(request, product_id):
             'product': product,
             'same_category_products': same_category_products,  # ✅ AGORA SÓ PRODUTOS VÁLIDOS
             'features_list': features_list,
-            'view_count': view_count,
-            'wishlist_count': wishlist_count,
-            'average_rating': round(average_rating, 1),
+            'view_count': stats.view_count,
+            'wishlist_count': stats.wishlist_count,
+            'average_rating': stats.average_rating,
             'user_rating': user_rating,
         }
         
@@ -389,79 +343,80 @@ def product_detail(request, product_id):
 def category_products(request, category_name):
     """Página para filtrar produtos por categoria"""
     try:
-        print(f"🔍 Buscando produtos da categoria: '{category_name}'")
-        
-        # Filtra produtos pela categoria (busca case-insensitive e parcial)
-        category_products = Product.objects.filter(
-            models.Q(category__iexact=category_name) |
-            models.Q(category__icontains=category_name)
-        ).distinct()
+        search_query = request.GET.get('search', '')
         
-        print(f"📊 Produtos encontrados na query: {category_products.count()}")
+        def summarize():
+            """
+            Categorias que casam com o nome (case-insensitive e parcial), com totais já
+            materializados em CategoryStats: sem DISTINCT/AVG/SUM sobre os produtos.
+            Com busca os totais dependem do filtro textual: uma única agregação.
+            """
+            summary = category_summary(category_name)
+            show_all = not summary['names']
+            if show_all:
+                summary = category_summary('')
+            if search_query:
+                products = Product.objects.all() if show_all else Product.objects.filter(
+                    category__in=summary['names']
+                )
+                summary.update(search_products(products, search_query).aggregate(
+                    total=models.Count('id'),
+                    avg_price=models.Avg('price'),
+                    total_views=models.Sum('stats__view_count'),
+                ))
+            return {**summary, 'show_all': show_all}
+        
+        # Resumo em cache por versão do catálogo (não repete as leituras a cada visita)
+        catalog_version = get_catalog_version()
+        summary = cached_catalog_data(
+            'category-summary', [category_name, search_query], summarize, version=catalog_version
+        )
         
         # Se não encontrar nada, mostrar todos os produtos como fallback
-        if category_products.count() == 0:
+        show_all_message = summary['show_all']
+        if show_all_message:
             print("⚠️ Nenhum produto encontrado na categoria, mostrando todos os produtos")
             category_products = Product.objects.all()
-            show_all_message = True
         else:
-            show_all_message = False
+            category_products = Product.objects.filter(category__in=summary['names'])
         
         # Aplica busca se existir
-        search_query = request.GET.get('search', '')
         if search_query:
-            category_products = category_products.filter(
-                models.Q(name__icontains=search_query) |
-                models.Q(description__icontains=search_query)
-            )
-        
-        # Aplica ordenação
-        sort_by = request.GET.get('sort', 'newest')
-        if sort_by == 'price_low':
-            category_products = category_products.order_by('price')
-        elif sort_by == 'price_high':
-            category_products = category_products.order_by('-price')
-        elif sort_by == 'name':
-            category_products = category_products.order_by('name')
-        elif sort_by == 'popular':
-            category_products = category_products.annotate(
-                view_count=models.Count('userinteraction')
-            ).order_by('-view_count')
-        else:  # newest
-            category_products = category_products.order_by('-id')
-        
-        # Paginação
-        paginator = Paginator(category_products, 12)
-        page_number = request.GET.get('page')
-        products_page = paginator.get_page(page_number)
-        
-        # Estatísticas
-        total_products = category_products.count()
-        
-        # Calcular visualizações totais
-        if category_products.exists():
-            total_views = UserInteraction.objects.filter(
-                product__in=category_products,
-                interaction_type='view'
-            ).count()
-            average_price = category_products.aggregate(avg_price=models.Avg('price'))['avg_price'] or 0
-        else:
-            total_views = 0
-            average_price = 0
+            category_products = search_products(category_products, search_query)
+        
+        total_products = summary['total']
+        average_price = summary['avg_price'] or 0
+        total_views = summary['total_views'] or 0
+        
+        # Aplica ordenação (com busca, o padrão é a relevância)
+        sort_by = request.GET.get('sort', 'relevance' if search_query else 'newest')
+        if sort_by == 'relevance' and search_query:
+            category_products = category_products.order_by('-search_rank', '-id')
+        elif sort_by not in SORT_KEYS:
+            sort_by = 'newest'
+        
+        # Paginação por cursor (reaproveita o total já calculado em vez de um novo COUNT);
+        # a página só é buscada se o fragmento do template não estiver em cache
+        cursor = request.GET.get('cursor', '')
+        paginator = KeysetPaginator(with_product_stats(category_products), sort_by, per_page=12)
+        paginator.count = total_products
+        products_page = SimpleLazyObject(lambda: paginator.get_page(cursor))
         
         context = {
             'products': products_page,
             'category_name': category_name,
-            'categories': Product.objects.values_list('category', flat=True).distinct(),
+            'categories': cached_categories(catalog_version),
             'total_products': total_products,
             'total_views': total_views,
             'average_price': average_price,
             'search_query': search_query,
             'sort_by': sort_by,
             'show_all_message': show_all_message,
+            'cursor': cursor,
+            'catalog_version': catalog_version,
+            'fragment_timeout': fragment_timeout(),
         }
         
-        print(f"✅ Contexto enviado: {products_page.paginator.count} produtos")
         return render(request, 'recommendations/category_products.html', context)
         
     except Exception as e:
@@ -469,18 +424,14 @@ def category_products(request, category_name):
         import traceback
         traceback.print_exc()
         
-        # Fallback seguro - mostrar apenas produtos da categoria manualmente
-        all_products = Product.objects.all()
-        category_products_fallback = []
-        for product in all_products:
-            if product.category and category_name.lower() in product.category.lower():
-                category_products_fallback.append(product)
+        # Fallback seguro - primeira página da categoria direto no banco (sem estatísticas)
+        category_products_fallback = list(Product.objects.filter(category__icontains=category_name)[:12])
         
         # Se não encontrar nenhum, mostrar todos
         if not category_products_fallback:
-            category_products_fallback = all_products[:12]
+            category_products_fallback = list(Product.objects.all()[:12])
         
-        all_categories = Product.objects.values_list('category', flat=True).distinct()
+        all_categories = cached_categories()
         
         return render(request, 'recommendations/category_products.html', {
             'products': category_products_fallback,
@@ -498,53 +449,34 @@ def category_products(request, category_name):
 
 @login_required
 def record_interaction_api(request):
-    """API para registrar interações do usuário (AJAX) - VERSÃO COM MAIS LOGS"""
+    """
+    API para registrar uma interação do usuário (AJAX).
+
+    Avaliações são gravadas na hora; visualizações, cliques etc. entram no
+    buffer de ingestão em lote (ver recommendations/ingestion.py).
+    """
     if request.method == 'POST' and request.user.is_authenticated:
         try:
-            product_id = request.POST.get('product_id')
-            interaction_type = request.POST.get('interaction_type', 'view')
-            rating = request.POST.get('rating')
-            
-            print(f"🔍 REGISTRANDO INTERAÇÃO - Produto: {product_id}, Tipo: {interaction_type}, Rating: {rating}")
-            
-            product = get_object_or_404(Product, id=product_id)
-            
-            # Dados para a interação
-            interaction_data = {
-                'user': request.user,
-                'product': product,
-                'interaction_type': interaction_type,
-                'timestamp': timezone.now()
-            }
-            
-            # Adiciona rating se fornecido
-            if rating and interaction_type == 'rating':
-                interaction_data['rating'] = int(rating)
-                print(f"⭐ REGISTRANDO AVALIAÇÃO: {rating} estrelas para {product.name}")
-            
-            # Para avaliações, usar update_or_create
-            if interaction_type == 'rating':
-                interaction, created = UserInteraction.objects.update_or_create(
-                    user=request.user,
-                    product=product,
-                    interaction_type='rating',
-                    defaults=interaction_data
-                )
-                action = "criada" if created else "atualizada"
-                print(f"✅ AVALIAÇÃO {action}: {rating} estrelas para {product.name}")
-                
-            else:
-                interaction = UserInteraction.objects.create(**interaction_data)
-                print(f"✅ INTERAÇÃO criada: {interaction_type} para {product.name}")
+            result = ingest_events(request.user, [request.POST])
+            if result['rejected']:
+                rejected = result['rejected'][0]
+                return JsonResponse({
+                    'status': 'error',
+                    'message': rejected['message']
+                }, status=rejected['status'])
             
+            interaction_type = request.POST.get('interaction_type') or 'view'
+            logger.debug('Interação %s registrada: produto %s, usuário %s',
+                         interaction_type, request.POST.get('product_id'), request.user.pk)
             return JsonResponse({
                 'status': 'success',
-                'message': f'Interação {interaction_type} registrada para {product.name}',
-                'interaction_id': interaction.id
-            })
+                'message': f'Interação {interaction_type} registrada'
+            }, status=_ingestion_status(interaction_type))
             
+        except BufferFull as e:
+            return _buffer_full_response(e)
         except Exception as e:
-            print(f"❌ ERRO AO REGISTRAR INTERAÇÃO: {e}")
+            logger.exception('Erro ao registrar interação')
             return JsonResponse({
                 'status': 'error',
                 'message': str(e)
@@ -553,31 +485,53 @@ def record_interaction_api(request):
     return JsonResponse({'status': 'error', 'message': 'Método não permitido'})
 
 @login_required
-def get_recommendations_ajax(request):
-    """API para obter recomendações atualizadas (AJAX)"""
+def record_interactions_bulk_api(request):
+    """
+    API para registrar várias interações de uma vez (AJAX).
+
+    Corpo JSON: {"events": [{"product_id": 1, "interaction_type": "view",
+    "timestamp": "2024-01-01T12:00:00Z"}, ...]}. Eventos inválidos são
+    devolvidos em "rejected" sem impedir os demais.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+    
     try:
-        products = Product.objects.all()
-        recommendations = recommender.recommend_for_user(
-            request.user, 
-            products, 
-            top_n=12
-        )
-        
-        recommended_data = [
-            {
-                'id': p.id,
-                'name': p.name,
-                'category': p.category,
-                'price': str(p.price),
-                'description': p.description[:100] + '...' if len(p.description) > 100 else p.description,
-                'image_url': p.image_url or '/static/images/default-product.jpg'
-            } for p in recommendations
-        ]
-        
+        events = json.loads(request.body or b'{}').get('events')
+    except (ValueError, AttributeError):
+        return JsonResponse({'status': 'error', 'message': 'JSON inválido'}, status=400)
+    
+    if not isinstance(events, list) or not events:
+        return JsonResponse({'status': 'error', 'message': 'Informe a lista "events"'}, status=400)
+    
+    max_events = ingestion_settings()['MAX_EVENTS_PER_REQUEST']
+    if len(events) > max_events:
         return JsonResponse({
-            'status': 'success',
-            'recommendations': recommended_data
-        })
+            'status': 'error',
+            'message': f'Máximo de {max_events} eventos por requisição'
+        }, status=413)
+    
+    try:
+        result = ingest_events(request.user, events)
+    except BufferFull as e:
+        return _buffer_full_response(e)
+    except Exception as e:
+        logger.exception('Erro ao registrar lote de interações')
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+    
+    logger.debug('Lote de interações: %d aceitas, %d rejeitadas (usuário %s)',
+                 result['accepted'], len(result['rejected']), request.user.pk)
+    return JsonResponse({
+        'status': 'success',
+        'accepted': result['accepted'],
+        'rejected': result['rejected'],
+    }, status=_ingestion_status())
+
+@login_required
+async def get_recommendations_ajax(request):
+    """API para obter recomendações atualizadas (AJAX, async)"""
+    try:
+        return await _recommendations_response(request, 'summary', top_n=12)
         
     except Exception as e:
         return JsonResponse({
@@ -588,26 +542,38 @@ def get_recommendations_ajax(request):
 @login_required
 def product_stats_api(request, product_id):
     """API para obter estatísticas atualizadas do produto"""
+    # Uma única leitura serve para o ETag e para a resposta (fora do try: produto
+    # inexistente é 404, não um 200 com erro)
+    row = etags.product_stats_row(product_id)
+    if row is None:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Produto não encontrado'
+        }, status=404)
+    
     try:
-        product = get_object_or_404(Product, id=product_id)
-        
-        # Calcular estatísticas em tempo real
-        view_count = product.userinteraction_set.filter(interaction_type='view').count()
-        wishlist_count = product.userinteraction_set.filter(interaction_type='wishlist').count()
-        
-        ratings = product.userinteraction_set.filter(
-            interaction_type='rating'
-        ).exclude(rating__isnull=True).values_list('rating', flat=True)
-        
-        average_rating = sum(ratings) / len(ratings) if ratings else 0.0
+        etag = etags.product_stats_etag(product_id, row)
+        response = etags.not_modified(request, etag)
+        if response is not None:
+            return response
+        
+        _, view_count, wishlist_count, rating_sum, rating_count, _ = row
+        stats = ProductStats(
+            product_id=product_id,
+            view_count=view_count or 0,
+            wishlist_count=wishlist_count or 0,
+            rating_sum=rating_sum or 0,
+            rating_count=rating_count or 0,
+        )
         
-        return JsonResponse({
+        response = JsonResponse({
             'status': 'success',
-            'view_count': view_count,
-            'wishlist_count': wishlist_count,
-            'average_rating': round(average_rating, 1),
-            'rating_count': len(ratings)
+            'view_count': stats.view_count,
+            'wishlist_count': stats.wishlist_count,
+            'average_rating': stats.average_rating,
+            'rating_count': stats.rating_count
         })
+        return etags.set_etag(response, etag)
         
     except Exception as e:
         return JsonResponse({
@@ -626,86 +592,31 @@ def user_dashboard(request):
         user = request.user
         print(f"🔍 CARREGANDO DASHBOARD PARA: {user.username}")
         
-        # Buscar TODAS as interações do usuário
-        user_interactions = UserInteraction.objects.filter(user=user)
-        print(f"🔍 TOTAL DE INTERAÇÕES NO BANCO: {user_interactions.count()}")
-        
-        # Contar por tipo de forma explícita
-        total_views = user_interactions.filter(interaction_type='view').count()
-        wishlist_count = user_interactions.filter(interaction_type='wishlist').count()
-        ratings_count = user_interactions.filter(interaction_type='rating').count()
-        total_interactions = user_interactions.count()
-        
-        print(f"🔍 ESTATÍSTICAS - Views: {total_views}, Wishlist: {wishlist_count}, Ratings: {ratings_count}, Total: {total_interactions}")
-        
-        # Interações recentes - USAR TIMESTAMP
-        recent_interactions = user_interactions.select_related('product').order_by('-timestamp')[:10]
-        print(f"🔍 INTERAÇÕES RECENTES: {recent_interactions.count()}")
-        
-        # Produtos mais visualizados
-        most_viewed_products = Product.objects.filter(
-            userinteraction__user=user,
-            userinteraction__interaction_type='view'
-        ).annotate(
-            view_count=Count('userinteraction')
-        ).order_by('-view_count')[:4]
-        
-        print(f"🔍 PRODUTOS MAIS VISTOS: {most_viewed_products.count()}")
-        
-        # Estatísticas por categoria
-        category_stats = []
-        try:
-            # Buscar categorias com as quais o usuário interagiu
-            category_stats = user_interactions.values(
-                'product__category'
-            ).annotate(
-                view_count=Count('id', filter=models.Q(interaction_type='view')),
-                wishlist_count=Count('id', filter=models.Q(interaction_type='wishlist')),
-                rating_count=Count('id', filter=models.Q(interaction_type='rating')),
-            ).exclude(product__category__isnull=True).exclude(product__category='')
-            
-            # Formatar para o template
-            formatted_stats = []
-            for stat in category_stats:
-                if stat['product__category']:
-                    formatted_stats.append({
-                        'category': stat['product__category'],
-                        'view_count': stat['view_count'] or 0,
-                        'wishlist_count': stat['wishlist_count'] or 0,
-                        'rating_count': stat['rating_count'] or 0,
-                    })
-            
-            category_stats = formatted_stats
-            print(f"🔍 ESTATÍSTICAS POR CATEGORIA: {len(category_stats)}")
-            
-        except Exception as e:
-            print(f"❌ Erro em category_stats: {e}")
-            category_stats = []
+        # Estatísticas pré-calculadas do usuário (uma linha, atualizada a cada interação)
+        dashboard = dashboard_data(get_user_stats(user))
         
         # Status do modelo
         try:
             # Verificar se existem recomendações para o usuário
-            user_recommendations = Recommendation.objects.filter(user=user)
-            model_trained = user_recommendations.exists()
-            print(f"🔍 RECOMENDAÇÕES ENCONTRADAS: {user_recommendations.count()}")
+            user_recommendations = list(Recommendation.objects.filter(user=user))
+            model_trained = bool(user_recommendations)
         except Exception as e:
             print(f"❌ Erro ao verificar recomendações: {e}")
             user_recommendations = None
             model_trained = False
         
         context = {
-            'total_views': total_views,
-            'wishlist_count': wishlist_count,
-            'ratings_count': ratings_count,
-            'total_interactions': total_interactions,
-            'recent_interactions': recent_interactions,
-            'most_viewed_products': most_viewed_products,
-            'category_stats': category_stats[:5],
+            'total_views': dashboard['total_views'],
+            'wishlist_count': dashboard['wishlist_count'],
+            'ratings_count': dashboard['ratings_count'],
+            'total_interactions': dashboard['total_interactions'],
+            'recent_interactions': dashboard['recent_interactions'],
+            'most_viewed_products': dashboard['most_viewed_products'],
+            'category_stats': dashboard['category_stats'][:5],
             'user_recommendations': user_recommendations,
             'model_trained': model_trained,
         }
         
-        print(f"✅ DASHBOARD PRONTO - Enviando contexto com {total_interactions} interações")
         return render(request, 'recommendations/user_dashboard.html', context)
         
     except Exception as e:
@@ -737,15 +648,12 @@ def rate_product(request, product_id):
             print(f"🔍 TENTANDO REGISTRAR AVALIAÇÃO - Produto: {product.name}, Rating: {rating}, Usuário: {request.user}")
             
             if rating and 1 <= int(rating) <= 5:
-                # Cria ou atualiza a avaliação - CORRIGIDO
-                interaction, created = UserInteraction.objects.update_or_create(
-                    user=request.user,
-                    product=product,
-                    interaction_type='rating',
-                    defaults={
-                        'rating': int(rating),
-                        'timestamp': timezone.now()
-                    }
+                # Cria ou atualiza a avaliação (e as estatísticas do produto)
+                interaction, created = record_interaction(
+                    request.user,
+                    product,
+                    'rating',
+                    rating=int(rating)
                 )
                 
                 action = "criada" if created else "atualizada"
@@ -784,11 +692,7 @@ def test_interaction(request, product_id):
     product = get_object_or_404(Product, id=product_id)
     
     # Criar uma interação de teste
-    interaction = UserInteraction.objects.create(
-        user=request.user,
-        product=product,
-        interaction_type='view'
-    )
+    interaction, _ = record_interaction(request.user, product, 'view')
     
     messages.success(request, f'✅ Interação de teste criada para {product.name}! ID: {interaction.id}')
     return redirect('debug_interactions')
@@ -802,10 +706,11 @@ def ai_status(request):
     """Página para verificar o status da IA"""
     context = {
         'api_configured': ai_generator._is_configured(),
-        'api_key': settings.DEEPSEEK_API_KEY,
-        'api_key_preview': f"{settings.DEEPSEEK_API_KEY[:10]}..." if settings.DEEPSEEK_API_KEY else "Não configurada",
+        'api_key': ai_generator.api_key,
+        'api_key_preview': f"{ai_generator.api_key[:10]}..." if ai_generator.api_key else "Não configurada",
         'model': ai_generator.model,
-        'provider': getattr(settings, 'AI_PROVIDER', 'deepseek')
+        'provider': ai_generator.provider.name,
+        'circuit_breaker': ai_generator.breaker.snapshot(),
     }
     
     return render(request, 'recommendations/ai_status.html', context)
@@ -815,7 +720,7 @@ def generate_description_page(request):
     """Página para gerar descrições com IA - VERSÃO COMPLETA"""
     # Obter produtos para seleção
     products = Product.objects.all().order_by('name')[:50]
-    categories = Product.objects.values_list('category', flat=True).distinct()
+    categories = cached_categories()
     
     # Estatísticas da IA
     ai_configured = ai_generator._is_configured()
@@ -828,7 +733,7 @@ def generate_description_page(request):
         'ai_configured': ai_configured,
         'api_status': api_status,
         'model': ai_generator.model,
-        'provider': getattr(settings, 'AI_PROVIDER', 'deepseek')
+        'provider': ai_generator.provider.name
     }
     return render(request, 'recommendations/generate_description.html', context)
 
@@ -864,7 +769,7 @@ def test_ai(request):
         'title': 'Testar IA Generativa',
         'sample_products': sample_products,
         'ai_configured': ai_configured,
-        'api_key_preview': f"{settings.DEEPSEEK_API_KEY[:8]}..." if settings.DEEPSEEK_API_KEY else "Não configurada",
+        'api_key_preview': f"{ai_generator.api_key[:8]}..." if ai_generator.api_key else "Não configurada",
         'model': ai_generator.model,
         'max_tokens': ai_generator.max_tokens,
         'temperature': ai_generator.temperature
@@ -872,8 +777,8 @@ def test_ai(request):
     return render(request, 'recommendations/test_ai.html', context)
 
 @login_required
-def generate_description_api(request):
-    """API para gerar descrição de produto com IA - VERSÃO FINAL"""
+async def generate_description_api(request):
+    """API para gerar descrição de produto com IA - VERSÃO FINAL (async)"""
     print("🎯 API generate_description_api CHAMADA")
     
     if request.method == 'POST':
@@ -913,7 +818,7 @@ def generate_description_api(request):
             print("🤖 Gerando descrição com IA...")
             
             # Gerar descrição com IA
-            description = ai_generator.generate_product_description(
+            description = await ai_generator.agenerate_product_description(
                 product_name=product_name,
                 category=category,
                 price=price,
@@ -944,13 +849,65 @@ def generate_description_api(request):
     print("❌ Método não permitido")
     return JsonResponse({'status': 'error', 'message': 'Método não permitido'})
 
+def _sse_event(event, data):
+    """Evento Server-Sent Events com dados em JSON"""
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+@login_required
+async def generate_description_stream(request):
+    """
+    Versão em streaming de generate_description_api: envia a descrição em
+    pedaços conforme a IA gera (Server-Sent Events), em vez de esperar o texto todo.
+    
+    Eventos: "token" ({"text": ...}) a cada pedaço, "done" ({"description": ...})
+    no final e "error" ({"message": ...}).
+    """
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+    
+    try:
+        data = json.loads(request.body or b'{}')
+    except json.JSONDecodeError:
+        return JsonResponse({'status': 'error', 'message': 'Dados JSON inválidos'}, status=400)
+    
+    product_name = (data.get('product_name') or '').strip()
+    category = (data.get('category') or '').strip()
+    price = data.get('price', '0')
+    features = (data.get('features') or '').strip()
+    
+    if not product_name:
+        return JsonResponse({'status': 'error', 'message': 'Nome do produto é obrigatório'}, status=400)
+    
+    if not ai_generator._is_configured():
+        return JsonResponse({
+            'status': 'error',
+            'message': 'IA não configurada. Configure DEEPSEEK_API_KEY no arquivo .env'
+        })
+    
+    async def events():
+        parts = []
+        try:
+            async for text in ai_generator.astream_product_description(product_name, category, price, features):
+                parts.append(text)
+                yield _sse_event('token', {'text': text})
+            yield _sse_event('done', {'description': ''.join(parts).strip(), 'product_name': product_name})
+        except Exception as e:
+            print(f"❌ Erro no streaming da descrição: {e}")
+            yield _sse_event('error', {'message': str(e)})
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Desliga o buffer de proxies (nginx) para os eventos chegarem na hora
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
-def test_ai_connection(request):
-    """Testar conexão com a API de IA - VERSÃO CORRIGIDA"""
+async def test_ai_connection(request):
+    """Testar conexão com a API de IA - VERSÃO CORRIGIDA (async)"""
     if request.method == 'POST':
         try:
             # Teste simples
-            test_response = ai_generator._call_deepseek_api("Responda apenas 'OK' se estiver funcionando.")
+            test_response = await ai_generator._acall_deepseek_api("Responda apenas 'OK' se estiver funcionando.")
             
             return JsonResponse({
                 'status': 'success',
@@ -970,8 +927,8 @@ def test_ai_connection(request):
     return JsonResponse({'status': 'error', 'message': 'Método não permitido'})
 
 @login_required
-def generate_product_features(request):
-    """View para gerar características de produto com IA - VERSÃO CORRIGIDA"""
+async def generate_product_features(request):
+    """View para gerar características de produto com IA - VERSÃO CORRIGIDA (async)"""
     if request.method == 'POST':
         try:
             # Verificar se há corpo na requisição
@@ -1000,7 +957,7 @@ def generate_product_features(request):
                     'message': 'IA não configurada'
                 })
             
-            features = ai_generator.generate_product_features(
+            features = await ai_generator.agenerate_product_features(
                 product_name=product_name,
                 category=category
             )
@@ -1026,8 +983,8 @@ def generate_product_features(request):
 
 
 @login_required
-def ai_product_wizard(request):
-    """Assistente completo para criação de produtos com IA - VERSÃO CORRIGIDA"""
+async def ai_product_wizard(request):
+    """Assistente completo para criação de produtos com IA - VERSÃO CORRIGIDA (async)"""
     if request.method == 'POST':
         try:
             # Verificar se há corpo na requisição
@@ -1058,18 +1015,14 @@ def ai_product_wizard(request):
                     'message': 'IA não configurada'
                 })
             
-            description = ai_generator.generate_product_description(
+            # Descrição e características numa chamada só (ou as duas em paralelo, se falhar)
+            description, enhanced_features = await ai_generator.agenerate_product_content(
                 product_name=product_name,
                 category=category,
                 price=price,
                 features=base_features
             )
             
-            enhanced_features = ai_generator.generate_product_features(
-                product_name=product_name,
-                category=category
-            )
-            
             # Combinar features
             all_features = base_features
             if base_features and enhanced_features:
@@ -1102,20 +1055,14 @@ def ai_product_wizard(request):
 def get_product_data(request, product_id):
     """API para obter dados de um produto específico - VERSÃO CORRIGIDA"""
     try:
-        product = get_object_or_404(Product, id=product_id)
+        product = payload_object('detail', product_id)
+        if product is None:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Produto não encontrado'
+            }, status=404)
         
-        return JsonResponse({
-            'status': 'success',
-            'product': {
-                'id': product.id,
-                'name': product.name,
-                'category': product.category,
-                'price': str(product.price),
-                'features': product.features or '',
-                'current_description': product.description or '',
-                'image_url': product.image_url or ''
-            }
-        })
+        return json_fragments_response(status='success', product=product)
         
     except Exception as e:
         print(f"❌ Erro ao carregar produto: {e}")
@@ -1126,47 +1073,31 @@ def get_product_data(request, product_id):
 
 @login_required
 def bulk_generate_descriptions(request):
-    """Gerar descrições em lote para produtos sem descrição - VERSÃO CORRIGIDA"""
+    """
+    Geração de descrições em lote: o POST inicia (ou continua) o job em segundo
+    plano e a página acompanha o progresso pela API de status.
+    """
     if request.method == 'POST':
         try:
-            products_to_update = Product.objects.filter(
-                Q(description__isnull=True) | 
-                Q(description='')
-            )[:2]  # Apenas 2 para teste
-            
-            results = []
+            try:
+                data = json.loads(request.body or b'{}')
+            except json.JSONDecodeError:
+                data = {}
+            limit = data.get('limit') or request.POST.get('limit')
+            limit = int(limit) if limit else None
+            if limit is not None and limit <= 0:
+                raise ValueError('limit deve ser positivo')
             
-            for product in products_to_update:
-                try:
-                    description = ai_generator.generate_product_description(
-                        product_name=product.name,
-                        category=product.category,
-                        price=str(product.price),
-                        features=product.features
-                    )
-                    
-                    product.description = description
-                    product.save()
-                    
-                    results.append({
-                        'product': product.name,
-                        'status': 'success',
-                        'description_preview': description[:100] + '...'
-                    })
-                    
-                except Exception as e:
-                    results.append({
-                        'product': product.name,
-                        'status': 'error',
-                        'error': str(e)
-                    })
+            job = start_background_job(ai_generator, user=request.user, limit=limit)
             
             return JsonResponse({
                 'status': 'success',
-                'message': f'Processados {len(results)} produtos',
-                'results': results
+                'message': f'Geração em lote #{job.pk} em execução',
+                'job': job_payload(job)
             })
             
+        except ValueError as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
         except Exception as e:
             print(f"❌ Erro no processamento em lote: {e}")
             return JsonResponse({
@@ -1175,16 +1106,36 @@ def bulk_generate_descriptions(request):
             })
     
     # GET - mostrar página
-    products_needing_description = Product.objects.filter(
-        Q(description__isnull=True) | 
-        Q(description='')
-    ).count()
+    products_needing_description = bulk_generation.products_needing_description().count()
+    latest_job = DescriptionGenerationJob.objects.first()
     
     return render(request, 'recommendations/bulk_generate_descriptions.html', {
         'products_count': products_needing_description,
-        'ai_configured': ai_generator._is_configured()
+        'ai_configured': ai_generator._is_configured(),
+        'job': latest_job,
+        'generation_settings': bulk_generation.generation_settings(),
     })
 
+@login_required
+def bulk_generation_status(request, job_id):
+    """API com o progresso de uma geração em lote"""
+    job = DescriptionGenerationJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({'status': 'error', 'message': 'Geração não encontrada'}, status=404)
+    return JsonResponse({'status': 'success', 'job': job_payload(job)})
+
+@login_required
+def bulk_generation_stop(request, job_id):
+    """API para interromper uma geração em lote (o lote atual é gravado antes de parar)"""
+    if request.method != 'POST':
+        return JsonResponse({'status': 'error', 'message': 'Método não permitido'}, status=405)
+    job = DescriptionGenerationJob.objects.filter(pk=job_id).first()
+    if job is None:
+        return JsonResponse({'status': 'error', 'message': 'Geração não encontrada'}, status=404)
+    request_stop(job)
+    job.refresh_from_db()
+    return JsonResponse({'status': 'success', 'job': job_payload(job)})
+
 @login_required
 def update_product_description(request, product_id):
     """API para atualizar a descrição de um produto - VERSÃO CORRIGIDA"""
@@ -1211,12 +1162,7 @@ def update_product_description(request, product_id):
             product.save()
             
             # Registrar interação de geração de descrição
-            UserInteraction.objects.create(
-                user=request.user,
-                product=product,
-                interaction_type='ai_description_generated',
-                timestamp=timezone.now()
-            )
+            record_interaction(request.user, product, 'ai_description_generated')
             
             print("✅ Descrição atualizada com sucesso!")
             
@@ -29,11 +29,82 @@ DEEPSEEK_API_KEY = os.getenv('DEEPSEEK_API_KEY', '')
 DEEPSEEK_API_URL = 'https://api.deepseek.com/chat/completions'
 DEEPSEEK_MODEL = os.getenv('AI_MODEL', 'deepseek-chat')
 
+# Endpoint compatível com a OpenAI (OpenAI, vLLM, Ollama, LM Studio...)
+OPENAI_COMPATIBLE_API_URL = os.getenv('OPENAI_COMPATIBLE_API_URL', '')
+OPENAI_COMPATIBLE_API_KEY = os.getenv('OPENAI_COMPATIBLE_API_KEY', '')
+OPENAI_COMPATIBLE_MODEL = os.getenv('OPENAI_COMPATIBLE_MODEL', 'gpt-4o-mini')
+
 # Configurações gerais de IA
+# Provedor: deepseek | openai | fake (modelo local sem rede, para testes de carga)
 AI_PROVIDER = os.getenv('AI_PROVIDER', 'deepseek')
 AI_MAX_TOKENS = int(os.getenv('AI_MAX_TOKENS', '500'))
 AI_TEMPERATURE = float(os.getenv('AI_TEMPERATURE', '0.8'))
 
+# Cliente HTTP da API de IA: sessão com keep-alive e retentativas
+AI_HTTP_POOL_SIZE = int(os.getenv('AI_HTTP_POOL_SIZE', '10'))        # conexões mantidas por host
+AI_CONNECT_TIMEOUT = float(os.getenv('AI_CONNECT_TIMEOUT', '5'))     # segundos para conectar
+AI_READ_TIMEOUT = float(os.getenv('AI_READ_TIMEOUT', '60'))          # segundos esperando a resposta
+AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', '3'))               # retentativas em 429/5xx e falhas de conexão
+AI_RETRY_BACKOFF = float(os.getenv('AI_RETRY_BACKOFF', '0.5'))       # base do backoff exponencial (s)
+
+# Provedor fake (recommendations/ai_providers.py): latência, ritmo e erros simulados
+AI_FAKE_PROVIDER = {
+    'LATENCY_MEDIAN': float(os.getenv('AI_FAKE_LATENCY_MEDIAN', '0.5')),    # s até o primeiro token
+    'LATENCY_SIGMA': float(os.getenv('AI_FAKE_LATENCY_SIGMA', '0.6')),      # cauda da log-normal
+    'TOKENS_PER_SECOND': float(os.getenv('AI_FAKE_TOKENS_PER_SECOND', '50')),
+    'ERROR_RATE': float(os.getenv('AI_FAKE_ERROR_RATE', '0')),              # fração de respostas 503
+}
+
+# Assistente de produto: descrição e características numa única chamada (resposta em JSON).
+# Se a resposta não for um JSON válido, as duas gerações separadas rodam em paralelo.
+AI_COMBINED_GENERATION = os.getenv('AI_COMBINED_GENERATION', 'True').lower() == 'true'
+
+# Circuit breaker das chamadas à IA (recommendations/circuit_breaker.py): com o provedor
+# falhando ou lento, responde na hora com o fallback em vez de esperar o timeout.
+AI_CIRCUIT_BREAKER = {
+    'ENABLED': os.getenv('AI_CIRCUIT_BREAKER', 'True').lower() == 'true',
+    'WINDOW_SECONDS': int(os.getenv('AI_BREAKER_WINDOW_SECONDS', '60')),          # janela das taxas
+    'MINIMUM_CALLS': int(os.getenv('AI_BREAKER_MINIMUM_CALLS', '10')),            # chamadas antes de avaliar
+    'FAILURE_RATE_THRESHOLD': float(os.getenv('AI_BREAKER_FAILURE_RATE', '0.5')),
+    'SLOW_CALL_DURATION': float(os.getenv('AI_BREAKER_SLOW_CALL_SECONDS', '15')),
+    'SLOW_CALL_RATE_THRESHOLD': float(os.getenv('AI_BREAKER_SLOW_CALL_RATE', '0.8')),
+    'OPEN_SECONDS': int(os.getenv('AI_BREAKER_OPEN_SECONDS', '30')),              # aberto antes de testar de novo
+    'HALF_OPEN_MAX_CALLS': int(os.getenv('AI_BREAKER_HALF_OPEN_CALLS', '3')),     # chamadas de teste
+}
+
+# Cache dos textos gerados pela IA (recommendations/generation_cache.py).
+# Opt-in: com ele ligado, as mesmas entradas repetem o estilo e não chamam a API de novo.
+AI_GENERATION_CACHE = {
+    'ENABLED': os.getenv('AI_GENERATION_CACHE', 'False').lower() == 'true',
+    'ALIAS': 'ai_generation',
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Em disco: sobrevive a reinícios; MAX_ENTRIES limita o tamanho (remove 1/CULL_FREQUENCY ao encher)
+    'ai_generation': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('AI_GENERATION_CACHE_DIR', str(BASE_DIR / '.cache' / 'ai_generation')),
+        'TIMEOUT': int(os.getenv('AI_GENERATION_CACHE_TIMEOUT', str(7 * 24 * 3600))),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('AI_GENERATION_CACHE_MAX_ENTRIES', '5000')),
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
+# Geração de descrições em lote (recommendations/bulk_generation.py).
+# Mantenha AI_HTTP_POOL_SIZE >= WORKERS para todas as threads terem conexão.
+BULK_DESCRIPTION_GENERATION = {
+    'WORKERS': int(os.getenv('BULK_GENERATION_WORKERS', '8')),
+    'RATE_PER_SECOND': float(os.getenv('BULK_GENERATION_RATE', '5')),   # chamadas à API por segundo
+    'BURST': int(os.getenv('BULK_GENERATION_BURST', '5')),
+    'CHUNK_SIZE': int(os.getenv('BULK_GENERATION_CHUNK_SIZE', '50')),   # produtos por bulk_update/checkpoint
+    'BATCH_SIZE': int(os.getenv('BULK_GENERATION_BATCH_SIZE', '10')),   # produtos por chamada à API
+}
+
 
 SECRET_KEY = 'django-insecure-sua-chave-secreta-aqui-12345'
 DEBUG = True
@@ -62,10 +133,40 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'recommendations.middleware.QueryCountMiddleware',
 ]
 
+# Requisições com mais queries que este limite geram um warning no log
+QUERY_COUNT_WARNING_THRESHOLD = int(os.getenv('QUERY_COUNT_WARNING_THRESHOLD', '30'))
+
+# Tempo (s) que o total de itens das listagens fica em cache na paginação por cursor
+CATALOG_COUNT_CACHE_TIMEOUT = int(os.getenv('CATALOG_COUNT_CACHE_TIMEOUT', '60'))
+
+# Tempo (s) dos fragmentos das listagens em cache (invalidados antes pela versão do catálogo)
+CATALOG_FRAGMENT_CACHE_TIMEOUT = int(os.getenv('CATALOG_FRAGMENT_CACHE_TIMEOUT', '300'))
+
+# Tempo (s) dos payloads JSON de produtos em cache (a chave muda com o updated_at do produto)
+PRODUCT_PAYLOAD_CACHE_TIMEOUT = int(os.getenv('PRODUCT_PAYLOAD_CACHE_TIMEOUT', '3600'))
+
+# Ingestão de interações (visualizações, cliques...) em lote
+# DURABILITY:
+#   'buffered' - confirma ao enfileirar; grava em lote por tamanho ou tempo
+#                (eventos ainda na fila se perdem se o processo morrer)
+#   'sync'     - grava os eventos da requisição (em lote) antes de responder
+INTERACTION_INGESTION = {
+    'DURABILITY': os.getenv('INTERACTION_DURABILITY', 'buffered'),
+    'BATCH_SIZE': int(os.getenv('INTERACTION_BATCH_SIZE', '500')),
+    'FLUSH_INTERVAL': float(os.getenv('INTERACTION_FLUSH_INTERVAL', '2.0')),
+    'MAX_BUFFER_SIZE': int(os.getenv('INTERACTION_MAX_BUFFER_SIZE', '10000')),
+    'MAX_EVENTS_PER_REQUEST': int(os.getenv('INTERACTION_MAX_EVENTS_PER_REQUEST', '500')),
+}
+
 ROOT_URLCONF = 'smart_recommendations.urls'
 
+# Orçamento (s) do tempo de importação na inicialização: django.setup() + URLconf
+# (comando startup_import_time e testes). pandas/scikit-learn ficam fora: carregam no primeiro uso.
+STARTUP_IMPORT_BUDGET = float(os.getenv('STARTUP_IMPORT_BUDGET', '1.5'))
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -84,13 +185,60 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'smart_recommendations.wsgi.application'
 
+# SQLite ajustado para leitura concorrente com escritas de interações:
+#   WAL             - leitores não bloqueiam (nem são bloqueados por) o escritor
+#   synchronous     - NORMAL é seguro com WAL e evita um fsync por commit
+#   mmap_size       - leituras via memória mapeada (bytes)
+#   busy_timeout    - espera pelo lock de escrita em vez de falhar com "database is locked" (ms)
+# O journal_mode=WAL fica gravado no arquivo do banco (e cria os arquivos -wal e
+# -shm ao lado dele), por isso só é ligado explicitamente com SQLITE_WAL=1 no
+# ambiente do servidor, nunca no db.sqlite3 versionado.
+SQLITE_WAL = os.getenv('SQLITE_WAL', '0') == '1'
+SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', '5000'))
+SQLITE_READ_PRAGMAS = (
+    f'PRAGMA mmap_size={SQLITE_MMAP_SIZE};'
+    f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT};'
+)
+SQLITE_WAL_PRAGMAS = 'PRAGMA journal_mode=WAL;PRAGMA synchronous=NORMAL;' if SQLITE_WAL else ''
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Conexões persistentes (segundos); 0 fecha a cada requisição
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_WAL_PRAGMAS + SQLITE_READ_PRAGMAS,
+            # Transações pegam o lock de escrita no BEGIN: sem deadlock ao promover leitura em escrita
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Réplica de leitura opcional (ver recommendations/db_router.py): DB_REPLICA_NAME
+# deve apontar para uma cópia de fato replicada do banco (por exemplo, mantida
+# por uma ferramenta de replicação do SQLite em outro disco ou máquina). Apontar
+# para o próprio db.sqlite3 em modo só leitura NÃO é uma réplica: os dados, o
+# disco e o lock são os mesmos, só as conexões de leitura ficam separadas.
+#   DB_REPLICA_NAME=/caminho/replica/db.sqlite3
+if os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.getenv('DB_REPLICA_NAME'),
+        'CONN_MAX_AGE': DATABASES['default']['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_READ_PRAGMAS,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    }
+
+DATABASE_ROUTERS = ['recommendations.db_router.PrimaryReplicaRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',